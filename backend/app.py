@@ -1,4 +1,5 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Request, request, send_from_directory
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 import os
 # type: ignore
@@ -6,10 +7,10 @@ from werkzeug.utils import secure_filename
 from src.search.similar_products import ProductSearchEngine
 from src.search.image_search import ImageSearchEngine
 from src.comparison.price_compare import PriceComparisonEngine
-from dotenv import load_dotenv
 import re
 from datetime import datetime
-from src.api.amazon_api import amazon_api, AmazonAPI
+from src.api.amazon_api import amazon_api
+from src.api.paapi_batcher import PAAPIBatcher
 from src.api.rakuten_api import rakuten_api
 from src.api.yahoo_api import yahoo_api
 from src.tools.batch_keyword_generator import BatchKeywordGenerator
@@ -19,10 +20,49 @@ from src.services.stock_monitor import StockMonitor
 from src.services.profit_calculator import ProfitCalculator
 from src.services.shipping_calculator import ShippingCalculator
 from src.api.us_amazon_api import us_amazon_api
+from src.cache.ttl_cache import TTLCache
+from src.config.logging_config import configure_logging
+from src.config.settings import AMAZON_PARTNER_TAG
+from src.utils import json_utils
+from src.utils.helpers import is_asin, is_jan_code, keyword_product_info, sniff_image_type
+from src.search.ranking import top_k_indices, VECTORIZE_THRESHOLD
 import uuid
 import time
+import logging
+import heapq
+import collections
+import functools
+import hashlib
+import io
+import itertools
+import operator
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+class InMemoryUploadRequest(Request):
+    """
+    アップロードファイルを一時ファイルに書き出さず、メモリ上に保持するリクエスト
+    (サイズは MAX_CONTENT_LENGTH で制限される)
+    """
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return io.BytesIO()
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    request.json / jsonify を orjson で処理する JSON プロバイダ
+    """
+    def dumps(self, obj, **kwargs):
+        return json_utils.dumps(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return json_utils.loads(s)
 
 app = Flask(__name__)
+app.request_class = InMemoryUploadRequest
+app.json = OrjsonProvider(app)
 # Configure CORS properly with specific settings
 CORS(app, resources={r"/api/*": {"origins": "http://localhost:3000", 
                                 "allow_headers": ["Content-Type", "Authorization"],
@@ -41,39 +81,279 @@ if not os.path.exists(UPLOAD_FOLDER):
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max upload
 
+# Keep a copy of uploaded images on disk (served from /api/uploads) only when enabled
+SAVE_UPLOADS = os.getenv('SAVE_UPLOADS', '0') == '1'
+
 # Allowed file extensions
 ALLOWED_EXTENSIONS = {'txt', 'csv'}
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-# Initialize search engines and API clients
-product_search = ProductSearchEngine()
-image_search = ImageSearchEngine()
-price_comparison = PriceComparisonEngine()
+# Search engines and services are created on first use so that workers
+# only pay for what the endpoints they serve actually need
+@functools.cache
+def get_product_search():
+    return ProductSearchEngine()
+
+@functools.cache
+def get_image_search():
+    return ImageSearchEngine()
+
+@functools.cache
+def get_price_comparison():
+    return PriceComparisonEngine()
 
-# Initialize listing management services
-listing_manager = ListingManager()
-profit_calculator = ProfitCalculator()
-shipping_calculator = ShippingCalculator()
-stock_monitor = StockMonitor(listing_manager)
-stock_monitor.start_monitoring()  # Start automatic monitoring
+@functools.cache
+def get_listing_manager():
+    return ListingManager()
 
-# Load environment variables
-load_dotenv()
+@functools.cache
+def get_profit_calculator():
+    return ProfitCalculator()
 
-# Amazon PA-API configuration
-amazon_partner_tag = os.getenv('AMAZON_PARTNER_TAG')
-amazon_access_key = os.getenv('AMAZON_ACCESS_KEY')
-amazon_secret_key = os.getenv('AMAZON_SECRET_KEY')
-amazon_host = "webservices.amazon.co.jp"
-amazon_region = "ap-northeast-1"
+@functools.cache
+def get_shipping_calculator():
+    return ShippingCalculator()
 
-# Initialize the BatchKeywordGenerator
-batch_keyword_generator = BatchKeywordGenerator()
+@functools.cache
+def get_stock_monitor():
+    return StockMonitor(get_listing_manager())
+
+@functools.cache
+def get_batch_keyword_generator():
+    return BatchKeywordGenerator()
+
+@functools.cache
+def get_paapi_batcher():
+    return PAAPIBatcher(amazon_api)
+
+def start_stock_monitor():
+    """
+    在庫の自動監視を開始する（RUN_STOCK_MONITOR=0 で無効、例えば専用プロセスで動かす場合）
+
+    Called by the server entrypoints (gunicorn post_worker_init, run.py), not on
+    import, so tools that only import the app don't start monitoring. The file
+    lock keeps it to a single worker.
+    """
+    if os.getenv('RUN_STOCK_MONITOR', '1') == '1':
+        get_stock_monitor().start_monitoring(lock_path=os.getenv('STOCK_MONITOR_LOCK', 'data/stock_monitor.lock'))
 
 # Add a dictionary to track batch search statuses
 batch_search_status = {}
+# batch_id -> itertools.count; next() is atomic, so workers update progress without a lock
+_batch_progress_counters = {}
+
+# Completed batch statuses are kept for an hour; (expiry_time, batch_id) min-heap
+BATCH_STATUS_TTL = 3600
+_status_expiry_heap = []
+_status_expiry_lock = threading.Lock()
+
+# JANコードの検索結果（見つからなかった型番も短時間覚えておき、再問い合わせを避ける）
+jan_code_lookup_cache = TTLCache(maxsize=10000, ttl=24 * 60 * 60)
+jan_code_miss_cache = TTLCache(maxsize=10000, ttl=60 * 60)
+
+# PA-API / US Amazon の商品情報（ASIN単位、見つかったものだけ保持）
+paapi_item_cache = TTLCache(maxsize=5000, ttl=60 * 60)
+
+def _lookup_jan_code(model_number):
+    """
+    perplexity_client.get_jan_code の結果をプロセス内でキャッシュして返す
+
+    Returns:
+        tuple: (JANコード or None, キャッシュヒットかどうか)
+    """
+    cache_key = str(model_number).strip().casefold()
+    jan_code = jan_code_lookup_cache.get(cache_key)
+    if jan_code is not None:
+        return jan_code, True
+    if jan_code_miss_cache.get(cache_key):
+        return None, True
+    
+    jan_code = perplexity_client.get_jan_code(model_number)
+    if jan_code:
+        jan_code_lookup_cache.set(cache_key, jan_code)
+    else:
+        jan_code_miss_cache.set(cache_key, True)
+    return jan_code, False
+
+def _cached_jan_code(model_number):
+    """
+    キャッシュ付きでJANコードを取得（見つからない場合はNone）
+    """
+    return _lookup_jan_code(model_number)[0]
+
+def _cached_asin_lookup(region, asin, fetch):
+    """
+    ASINで商品情報を取得し、見つかった結果を paapi_item_cache に保持する
+
+    Returns:
+        tuple: (商品情報 or None, キャッシュヒットかどうか)
+    """
+    cache_key = (region, asin)
+    product = paapi_item_cache.get(cache_key)
+    if product is not None:
+        return product, True
+    product = fetch(asin)
+    if product:
+        paapi_item_cache.set(cache_key, product)
+    return product, False
+
+# Number of detailed batch items processed concurrently
+DETAILED_BATCH_MAX_WORKERS = int(os.getenv('DETAILED_BATCH_MAX_WORKERS', '20'))
+
+def _json_body():
+    """
+    リクエストボディを orjson で直接パースする（ボディが空なら空の辞書）
+
+    request.json と違い、パース後にボディのバイト列をリクエストに保持しない
+    """
+    body = request.get_data(cache=False)
+    return json_utils.loads(body) if body else {}
+
+def ojson(obj, status=200):
+    """
+    orjson でシリアライズしたJSONレスポンスを返す
+    """
+    return app.response_class(json_utils.dumps(obj), status=status, mimetype='application/json')
+
+def ojson_bytes(body, status=200):
+    """
+    シリアライズ済みのJSONバイト列からレスポンスを作る
+    """
+    # Response objects are mutated per request (CORS headers etc.), so only the body is shared
+    return app.response_class(body, status=status, mimetype='application/json')
+
+# よく返す固定のバリデーションエラー（本文は起動時に一度だけシリアライズ）
+_ERR_SEARCH_QUERY_REQUIRED = json_utils.dumps({"error": "Search query is required"})
+_ERR_INVALID_PRODUCT_INFO_LIST = json_utils.dumps({"error": "Invalid product info list"})
+_ERR_NO_IMAGE = json_utils.dumps({"error": "No image or image URL provided"})
+_ERR_NO_MODEL_NUMBERS = json_utils.dumps({"error": "No model numbers provided"})
+_ERR_NO_VALID_MODEL_NUMBERS = json_utils.dumps({"error": "No valid model numbers provided"})
+_ERR_PRODUCT_INFO_REQUIRED = json_utils.dumps({"error": "Product info is required"})
+_ERR_MODEL_NUMBER_REQUIRED = json_utils.dumps({"error": "Model number is required"})
+_ERR_LISTING_IDS_AND_STATUS_REQUIRED = json_utils.dumps({"error": "listing_ids and status are required"})
+_ERR_LISTING_IDS_REQUIRED = json_utils.dumps({"error": "listing_ids are required"})
+_ERR_ASIN_REQUIRED = json_utils.dumps({"error": "ASIN is required"})
+_ERR_REQUEST_BODY_REQUIRED = json_utils.dumps({"error": "Request body is required"})
+_ERR_ITEM_IDS_REQUIRED = json_utils.dumps({"error": "ItemIds is required"})
+_ERR_ITEM_IDS_EMPTY = json_utils.dumps({"error": "ItemIds cannot be empty"})
+
+# Short-lived response caches for repeated searches
+search_response_cache = TTLCache(maxsize=2048, ttl=300)
+image_search_response_cache = TTLCache(maxsize=512, ttl=300)
+# Serialized GET /api/listings bodies keyed by ETag (the ETag changes with every listing write)
+listings_response_cache = TTLCache(maxsize=64, ttl=300)
+# Serialized GET /api/blacklist bodies keyed by ETag
+blacklist_response_cache = TTLCache(maxsize=8, ttl=300)
+
+# Background pool for persisting uploaded files off the request thread
+upload_executor = ThreadPoolExecutor(max_workers=2)
+
+def _write_upload(file_path, data):
+    """
+    アップロードされたファイルを保存
+    """
+    try:
+        with open(file_path, 'wb') as f:
+            f.write(data)
+    except OSError as e:
+        logger.warning("Error saving upload %s: %s", file_path, e)
+
+def _upload_buffer(file_storage):
+    """
+    アップロードファイルの内容をコピーせずに参照する（メモリ上のアップロードは memoryview）
+    """
+    stream = file_storage.stream
+    if isinstance(stream, io.BytesIO):
+        return stream.getbuffer()
+    return stream.read()
+
+# Shared pool for fanning out independent lookups inside a single request
+search_executor = ThreadPoolExecutor(max_workers=int(os.getenv('SEARCH_MAX_WORKERS', '16')))
+
+# 価格文字列から通貨記号・区切り文字を取り除くための変換テーブル
+_PRICE_STRIP = str.maketrans('', '', '¥, \t\n')
+_DIGIT_RE = re.compile(r'\d+')
+
+def _coerce_price(value):
+    """
+    価格を整数に変換（変換できない場合は0）
+    """
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        match = _DIGIT_RE.search(value.translate(_PRICE_STRIP))
+        return int(match.group()) if match else 0
+    try:
+        return int(value)
+    except (TypeError, ValueError) as e:
+        logger.warning("Error converting price to integer: %s", e)
+        return 0
+
+def _with_int_price(product):
+    """
+    商品辞書の price を整数に揃える
+    """
+    if isinstance(product, dict) and 'price' in product:
+        product['price'] = _coerce_price(product['price'])
+    return product
+
+def _identity(product):
+    return product
+
+def _object_to_dict(product):
+    """
+    to_dict を持たない商品オブジェクトを __dict__ または dict() で辞書に変換
+    """
+    product_dict = getattr(product, '__dict__', None)
+    if product_dict is not None:
+        # Copy so callers can update the result without touching the object
+        return dict(product_dict)
+    try:
+        return dict(product)
+    except (TypeError, ValueError):
+        logger.warning("Could not convert %s to dictionary. Using empty dict.", type(product))
+        return {}
+
+# 型ごとの辞書変換関数（型ごとに一度だけ解決する）
+_TO_DICT_BY_TYPE = {dict: _identity}
+
+def _product_to_dict(product):
+    """
+    ProductDetail などの商品オブジェクトを辞書に変換（to_dict がなければ __dict__ / dict() で変換）
+    """
+    cls = type(product)
+    convert = _TO_DICT_BY_TYPE.get(cls)
+    if convert is None:
+        to_dict = getattr(cls, 'to_dict', None)
+        convert = to_dict if callable(to_dict) else _object_to_dict
+        _TO_DICT_BY_TYPE[cls] = convert
+    return convert(product)
+
+def _serialize_products(products, jan_code=None):
+    """
+    商品リストを辞書に変換し、JANコードで見つかった場合はメタデータを付与
+    """
+    product_dicts = [_product_to_dict(product) for product in products]
+    if jan_code:
+        for product_dict in product_dicts:
+            additional_info = product_dict.get('additional_info')
+            if not additional_info:
+                additional_info = product_dict['additional_info'] = {}
+            additional_info['searched_by_jan'] = True
+            additional_info['jan_code'] = jan_code
+    return product_dicts
+
+def _rank_key(product):
+    """
+    価格（昇順、価格なしは最後）とランキング（降順）による並び替えキー
+    """
+    price = product.get('price')
+    return (
+        float('inf') if not price else price,
+        -(product.get('ranking', 0) or 0)  # Higher ranking is better
+    )
 
 def select_cheapest_highest_ranked_products(products, max_products=10):
     """
@@ -82,17 +362,17 @@ def select_cheapest_highest_ranked_products(products, max_products=10):
     if not products:
         return []
         
-    # Sort by price (ascending) and then by ranking (descending) if available
-    sorted_products = sorted(
-        products,
-        key=lambda p: (
-            float('inf') if not p.get('price') or p.get('price') == 0 else p.get('price'),
-            -1 * (p.get('ranking', 0) or 0)  # Higher ranking is better
-        )
-    )
+    # 大量の商品はNumPyでまとめて選択する
+    if len(products) >= VECTORIZE_THRESHOLD:
+        try:
+            prices = [p.get('price') or 0 for p in products]
+            rankings = [p.get('ranking', 0) or 0 for p in products]
+            return [products[i] for i in top_k_indices(prices, rankings, max_products)]
+        except (TypeError, ValueError) as e:
+            logger.debug("Falling back to heap selection: %s", e)
     
-    # Return the top N products
-    return sorted_products[:max_products]
+    # 上位N件だけが必要なので全件ソートせずにヒープで選択する
+    return heapq.nsmallest(max_products, products, key=_rank_key)
 
 def search_amazon_products(keywords, limit=5):
     """
@@ -102,7 +382,7 @@ def search_amazon_products(keywords, limit=5):
         # Use the AmazonAPI class to search for products
         return amazon_api._search_amazon_products(keywords, limit)
     except Exception as e:
-        print(f"Error in Amazon search: {e}")
+        logger.exception("Error in Amazon search")
         return []
 
 def search_rakuten(keywords, limit=5):
@@ -128,6 +408,21 @@ def get_item_value(result, key, default_value):
         return result['Item'].get(key, default_value)
     return result.get(key, default_value)
 
+@functools.lru_cache(maxsize=8192)
+def _normalize_rakuten_image(image_url):
+    """
+    楽天の画像URLをHTTPS化し、サムネイルには大きめのサイズ指定を付ける
+    """
+    # Ensure the URL uses HTTPS
+    if image_url.startswith('http:'):
+        image_url = image_url.replace('http:', 'https:')
+    
+    # Add size parameter for better quality if using thumbnail.image.rakuten.co.jp
+    if 'thumbnail.image.rakuten.co.jp' in image_url and '_ex=' not in image_url:
+        image_url = f"{image_url}{'&' if '?' in image_url else '?'}_ex=300x300"
+    
+    return image_url
+
 def get_item_image_url(result):
     """
     Helper function to get the image URL from a Rakuten API result item
@@ -136,37 +431,14 @@ def get_item_image_url(result):
     if 'Item' in result:
         item = result['Item']
     
-    # Try to get medium image URL
-    if 'mediumImageUrls' in item and len(item['mediumImageUrls']) > 0:
-        first_image = item['mediumImageUrls'][0]
-        if isinstance(first_image, dict) and 'imageUrl' in first_image:
-            image_url = first_image['imageUrl']
-            if image_url:
-                # Ensure the URL uses HTTPS
-                if image_url.startswith('http:'):
-                    image_url = image_url.replace('http:', 'https:')
-                
-                # Add size parameter for better quality if using thumbnail.image.rakuten.co.jp
-                if 'thumbnail.image.rakuten.co.jp' in image_url and not '_ex=' in image_url:
-                    image_url = f"{image_url}{'&' if '?' in image_url else '?'}_ex=300x300"
-                
-                return image_url
-    
-    # Try to get small image URL
-    if 'smallImageUrls' in item and len(item['smallImageUrls']) > 0:
-        first_image = item['smallImageUrls'][0]
-        if isinstance(first_image, dict) and 'imageUrl' in first_image:
-            image_url = first_image['imageUrl']
-            if image_url:
-                # Ensure the URL uses HTTPS
-                if image_url.startswith('http:'):
-                    image_url = image_url.replace('http:', 'https:')
-                
-                # Add size parameter for better quality if using thumbnail.image.rakuten.co.jp
-                if 'thumbnail.image.rakuten.co.jp' in image_url and not '_ex=' in image_url:
-                    image_url = f"{image_url}{'&' if '?' in image_url else '?'}_ex=300x300"
-                
-                return image_url
+    # Try to get medium image URL, then small image URL
+    for key in ('mediumImageUrls', 'smallImageUrls'):
+        if key in item and len(item[key]) > 0:
+            first_image = item[key][0]
+            if isinstance(first_image, dict) and 'imageUrl' in first_image:
+                image_url = first_image['imageUrl']
+                if image_url:
+                    return _normalize_rakuten_image(image_url)
     
     # Default Rakuten logo
     return "https://thumbnail.image.rakuten.co.jp/@0_mall/rakuten/cabinet/ichiba/app/pc/img/common/logo_rakuten_320x320.png"
@@ -178,9 +450,15 @@ def search_yahoo(keywords, limit=5):
     try:
         return yahoo_api.get_product_details(keywords)
     except Exception as e:
-        print(f"Error in Yahoo search: {e}")
+        logger.exception("Error in Yahoo search")
         return []
 
+def _search_response_body(query, results):
+    """
+    {"query": ..., ...results} のJSONバイト列を組み立てる（results はシリアライズ済みのオブジェクト）
+    """
+    return b'{"query":' + json_utils.dumps(query) + b',' + results[1:]
+
 @app.route('/api/search', methods=['POST'])
 def search():
     """商品検索API"""
@@ -188,85 +466,45 @@ def search():
     query = data.get('query', '')
     
     if not query:
-        return jsonify({"error": "Search query is required"}), 400
+        return ojson_bytes(_ERR_SEARCH_QUERY_REQUIRED, 400)
+    
+    # 同じクエリの結果はキャッシュ済みのJSONを使う（query はリクエストごとに埋める）
+    cache_key = str(query).strip().lower()
+    cached_results = search_response_cache.get(cache_key)
+    if cached_results is not None:
+        return ojson_bytes(_search_response_body(query, cached_results))
     
     try:
-        # キーワード生成
-        keywords = product_search.generate_search_keywords(query)
-        
-        # 価格比較
-        price_results = price_comparison.compare_prices(query)
-        
-        # 詳細な商品情報を取得
-        detailed_products = price_comparison.get_detailed_products(query)
-        
-        # ProductDetailオブジェクトを辞書に変換
-        serializable_detailed_products = []
-        for product in detailed_products:
-            if hasattr(product, 'to_dict'):
-                # Use the to_dict method if available
-                product_dict = product.to_dict()
-                
-                # Ensure price is an integer
-                if 'price' in product_dict:
-                    try:
-                        if product_dict['price'] is None:
-                            product_dict['price'] = 0
-                        elif isinstance(product_dict['price'], str):
-                            # Remove currency symbols and commas
-                            price_str = product_dict['price'].replace('¥', '').replace(',', '').strip()
-                            # Extract only digits
-                            price_digits = ''.join(filter(str.isdigit, price_str))
-                            if price_digits:
-                                product_dict['price'] = int(price_digits)
-                            else:
-                                product_dict['price'] = 0
-                        else:
-                            # Ensure it's an integer
-                            product_dict['price'] = int(product_dict['price'])
-                    except Exception as e:
-                        print(f"Error converting price to integer: {e}")
-                        product_dict['price'] = 0
-                
-                serializable_detailed_products.append(product_dict)
-            else:
-                # すでに辞書の場合はそのまま追加
-                if isinstance(product, dict) and 'price' in product:
-                    try:
-                        if product['price'] is None:
-                            product['price'] = 0
-                        elif isinstance(product['price'], str):
-                            # Remove currency symbols and commas
-                            price_str = product['price'].replace('¥', '').replace(',', '').strip()
-                            # Extract only digits
-                            price_digits = ''.join(filter(str.isdigit, price_str))
-                            if price_digits:
-                                product['price'] = int(price_digits)
-                            else:
-                                product['price'] = 0
-                        else:
-                            # Ensure it's an integer
-                            product['price'] = int(product['price'])
-                    except Exception as e:
-                        print(f"Error converting price to integer: {e}")
-                        product['price'] = 0
-                
-                serializable_detailed_products.append(product)
+        # キーワード生成・価格比較・詳細情報取得は互いに独立しているので並列に実行
+        keywords_future = search_executor.submit(get_product_search().generate_search_keywords, query)
+        price_future = search_executor.submit(get_price_comparison().compare_prices, query)
+        detailed_future = search_executor.submit(get_price_comparison().get_detailed_products, query)
+        
+        keywords = keywords_future.result()
+        price_results = price_future.result()
+        detailed_products = detailed_future.result()
+        
+        # ProductDetailオブジェクトを辞書に変換し、価格を整数に揃える
+        serializable_detailed_products = [
+            _with_int_price(_product_to_dict(product))
+            for product in detailed_products
+        ]
         
         # ランキングと価格に基づいて最適な商品を選択
         selected_products = select_cheapest_highest_ranked_products(serializable_detailed_products)
         
-        # 結果を返す
-        return jsonify({
-            'query': query,
+        # 結果を返す（query 以外をシリアライズしてキャッシュ）
+        results = json_utils.dumps({
             'keywords': keywords,
             'price_results': price_results,
             'detailed_products': selected_products,
         })
+        search_response_cache.set(cache_key, results)
+        return ojson_bytes(_search_response_body(query, results))
         
     except Exception as e:
-        print(f"Error in search: {e}")
-        return jsonify({"error": str(e)}), 500
+        logger.exception("Error in search")
+        return ojson({"error": str(e)}, 500)
 
 @app.route('/api/search/batch', methods=['POST'])
 def batch_search():
@@ -280,29 +518,30 @@ def batch_search():
             direct_search = request.json.get('direct_search', False)  # Add direct search parameter
             
             if not product_info_list or not isinstance(product_info_list, list):
-                return jsonify({'error': 'Invalid product info list'}), 400
+                return ojson_bytes(_ERR_INVALID_PRODUCT_INFO_LIST, 400)
                 
             # 商品情報リストが大きすぎる場合はエラー
             if len(product_info_list) > 5:
-                return jsonify({'error': 'Too many items. Maximum 5 items allowed.'}), 400
+                return ojson({'error': 'Too many items. Maximum 5 items allowed.'}, 400)
                 
             # キーワード生成 (Skip AI enhancement if direct_search is True)
             if direct_search:
-                results = []
-                for product_info in product_info_list:
-                    # For direct search, first find model numbers related to the keyword
-                    model_numbers = product_search.find_model_numbers(product_info)
-                    results.append({
+                # For direct search, first find model numbers related to each keyword
+                all_model_numbers = get_product_search().batch_find_model_numbers(product_info_list)
+                results = [
+                    {
                         'product_info': product_info,
                         'keywords': model_numbers,  # Use the model numbers as keywords
                         'error': None
-                    })
-                print(f"Direct batch search with model numbers for {len(product_info_list)} keywords")
+                    }
+                    for product_info, model_numbers in zip(product_info_list, all_model_numbers)
+                ]
+                logger.debug("Direct batch search with model numbers for %d keywords", len(product_info_list))
             else:
                 try:
-                    results = product_search.batch_generate_keywords(product_info_list)
+                    results = get_product_search().batch_generate_keywords(product_info_list)
                 except Exception as e:
-                    print(f"Error in batch keyword generation: {e}")
+                    logger.exception("Error in batch keyword generation")
                     # Fallback: use original terms as keywords
                     results = []
                     for product_info in product_info_list:
@@ -312,42 +551,48 @@ def batch_search():
                             'error': None
                         })
             
-            return jsonify(results)
+            return ojson(results)
             
         # ファイルアップロードからの一括検索
         elif 'file' in request.files:
             file = request.files['file']
             if file.filename == '':
-                return jsonify({'error': 'No file selected'}), 400
+                return ojson({'error': 'No file selected'}, 400)
                 
             if file and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                file.save(file_path)
-                
-                # ファイルから商品情報を読み込む
-                product_info_list = []
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    for line in f:
-                        line = line.strip()
-                        if line:  # 空行をスキップ
-                            product_info_list.append(line)
+                # アップロードされたストリームから直接商品情報を読み込む（空行をスキップ）
+                stream = io.TextIOWrapper(file.stream, encoding='utf-8')
+                lines = (line.strip() for line in stream)
+                # 上限+1件まで読んだ時点で打ち切り、巨大なファイルを最後まで読まない
+                product_info_list = list(itertools.islice((line for line in lines if line), 1001))
                 
                 # 商品情報リストが大きすぎる場合はエラー
                 if len(product_info_list) > 1000:
-                    return jsonify({'error': 'Too many items in file. Maximum 1000 items allowed.'}), 400
+                    return ojson({'error': 'Too many items in file. Maximum 1000 items allowed.'}, 400)
+                
+                # 大文字小文字だけが異なる重複行はまとめて一度だけキーワード生成する
+                unique_inputs = {}
+                for product_info in product_info_list:
+                    unique_inputs.setdefault(product_info.casefold(), product_info)
                 
                 # キーワード生成
-                results = product_search.batch_generate_keywords(product_info_list)
+                unique_results = get_product_search().batch_generate_keywords(list(unique_inputs.values()))
+                results_by_key = dict(zip(unique_inputs, unique_results))
                 
-                return jsonify(results)
+                # 元の行の順序・表記で結果を展開
+                results = [
+                    dict(results_by_key[product_info.casefold()], product_info=product_info)
+                    for product_info in product_info_list
+                ]
+                
+                return ojson(results)
             else:
-                return jsonify({'error': 'File type not allowed. Please upload a .txt or .csv file'}), 400
+                return ojson({'error': 'File type not allowed. Please upload a .txt or .csv file'}, 400)
         else:
-            return jsonify({'error': 'No product info or file provided'}), 400
+            return ojson({'error': 'No product info or file provided'}, 400)
             
     except Exception as e:
-        print(f"Error in batch search: {e}")
+        logger.exception("Error in batch search")
 
 @app.route('/api/search/image', methods=['POST'])
 def search_by_image():
@@ -359,56 +604,66 @@ def search_by_image():
         if 'image' in request.files:
             image_file = request.files['image']
             if image_file.filename == '':
-                return jsonify({'error': 'No image selected'}), 400
+                return ojson({'error': 'No image selected'}, 400)
                 
             try:
-                # 画像を保存
-                filename = secure_filename(image_file.filename)
-                file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                image_file.save(file_path)
+                # 画像データをアップロードストリームから直接読み込み
+                filename = image_file.filename
+                image_data = image_file.stream.read()
+                
+                # 拡張子ではなくファイル先頭のシグネチャで画像か判定
+                image_type = sniff_image_type(image_data)
+                if not image_type:
+                    return ojson({'error': 'Unsupported image format'}, 400)
                 
-                # 画像データを読み込み
-                with open(file_path, 'rb') as f:
-                    image_data = f.read()
+                image_digest = hashlib.blake2b(image_data, digest_size=16).hexdigest()
+                
+                # 画像の保存は SAVE_UPLOADS=1 の場合のみ、内容のハッシュをファイル名にして
+                # 同じ画像は一度だけディスクI/O用のスレッドで書き込む
+                query_image = None
+                if SAVE_UPLOADS:
+                    saved_name = f"{image_digest}.{image_type}"
+                    file_path = os.path.join(app.config['UPLOAD_FOLDER'], saved_name)
+                    if not os.path.exists(file_path):
+                        upload_executor.submit(_write_upload, file_path, image_data)
+                    query_image = f"/api/uploads/{saved_name}"
+                
+                # 同じ画像の検索結果はキャッシュから返す
+                cached_result = image_search_response_cache.get(image_digest)
+                if cached_result is not None:
+                    return ojson(dict(cached_result, query_image=query_image))
                 
                 # 画像からモデル番号を抽出
                 try:
                     # 画像ファイル名からモデル番号を抽出する試み
-                    import re
-                    model_patterns = [
-                        r'[A-Z0-9]{2,}-[A-Z0-9]{2,}',  # ABC-123 形式
-                        r'[A-Z]{2,}[0-9]{2,}',         # ABC123 形式
-                        r'[0-9]{2,}-[A-Z0-9]{2,}'      # 12-ABC 形式
-                    ]
-                    
                     input_model = None
-                    for pattern in model_patterns:
-                        matches = re.findall(pattern, filename)
-                        if matches:
-                            input_model = matches[0]
-                            print(f"Extracted model number from filename: {input_model}")
+                    for pattern in _MODEL_PATTERNS:
+                        match = pattern.search(filename)
+                        if match:
+                            input_model = match.group()
+                            logger.debug("Extracted model number from filename: %s", input_model)
                             break
                     
                     # モデル番号を抽出（入力されたモデル番号を優先）
                     model_numbers = []
                     try:
-                        model_numbers = image_search.extract_model_numbers(image_data=image_data)
-                        print(f"Extracted model numbers: {model_numbers}")
+                        model_numbers = get_image_search().extract_model_numbers(image_data=image_data)
+                        logger.debug("Extracted model numbers: %s", model_numbers)
                     except Exception as e:
-                        print(f"Error extracting model numbers from image: {e}")
+                        logger.warning("Error extracting model numbers from image: %s", e)
                         # Continue with empty model numbers
                 except Exception as e:
-                    print(f"Error extracting model numbers: {e}")
+                    logger.warning("Error extracting model numbers: %s", e)
                     model_numbers = []
                 
                 # モデル番号が見つからない場合は画像の内容を分析
                 generic_term = None
                 if not model_numbers:
                     try:
-                        generic_term = image_search.analyze_image_content(image_data=image_data)
-                        print(f"Analyzed image content: {generic_term}")
+                        generic_term = get_image_search().analyze_image_content(image_data=image_data)
+                        logger.debug("Analyzed image content: %s", generic_term)
                     except Exception as e:
-                        print(f"Error analyzing image content: {e}")
+                        logger.warning("Error analyzing image content: %s", e)
                         # Use a more useful default term instead of "ロープ"
                         generic_term = "スマートフォン"  # Default to "smartphone" which is likely to yield results
                 
@@ -416,49 +671,53 @@ def search_by_image():
                 if model_numbers:
                     # 最も信頼度の高いモデル番号を使用
                     best_model = model_numbers[0]['model_number']
-                    print(f"Using model number for search: {best_model}")
+                    logger.debug("Using model number for search: %s", best_model)
                     
                     # 最も信頼度の高いモデル番号のみを使用
                     filtered_model_numbers = [model_numbers[0]]
                     
                     try:
                         # モデル番号で検索
-                        search_results = product_search.search(best_model)
+                        search_results = get_product_search().search(best_model)
                         
                         # 結果を返す
-                        return jsonify({
-                            'query_image': f"/api/uploads/{filename}",
+                        result = {
+                            'query_image': query_image,
                             'model_numbers': filtered_model_numbers,
                             'generic_term': generic_term,  # Add generic term to the response
                             'similar_products': [],
                             'price_comparison': search_results.get('price_comparison', []),
                             'detailed_products': search_results.get('detailed_products', [])
-                        })
+                        }
+                        image_search_response_cache.set(image_digest, result)
+                        return ojson(result)
                     except Exception as e:
-                        print(f"Error searching with model number: {e}")
+                        logger.warning("Error searching with model number: %s", e)
                         # Fall back to generic term search if model number search fails
                         generic_term = generic_term or "商品"
                 
                 # モデル番号が見つからないが、画像の内容が識別できた場合
                 if generic_term:
-                    print(f"No model number found or model number search failed. Using generic term for search: {generic_term}")
+                    logger.debug("No model number found or model number search failed. Using generic term for search: %s", generic_term)
                     
                     # 単一検索を使用して商品を検索
-                    search_results = product_search.search(generic_term)
+                    search_results = get_product_search().search(generic_term)
                     
                     # 結果を返す
-                    return jsonify({
-                        'query_image': f"/api/uploads/{filename}",
+                    result = {
+                        'query_image': query_image,
                         'model_numbers': model_numbers,
                         'generic_term': generic_term,
-                                'similar_products': [],
+                        'similar_products': [],
                         'price_comparison': search_results.get('price_comparison', []),
                         'detailed_products': search_results.get('detailed_products', [])
-                    })
+                    }
+                    image_search_response_cache.set(image_digest, result)
+                    return ojson(result)
                 
                 # 何も見つからなかった場合
-                    return jsonify({
-                        'query_image': f"/api/uploads/{filename}",
+                    return ojson({
+                        'query_image': query_image,
                         'model_numbers': [],
                     'generic_term': "商品",
                         'similar_products': [],
@@ -468,33 +727,33 @@ def search_by_image():
                     })
                 
             except Exception as e:
-                print(f"Error processing image file: {e}")
-                return jsonify({'error': f'Error processing image file: {str(e)}'}), 500
+                logger.exception("Error processing image file")
+                return ojson({'error': f'Error processing image file: {str(e)}'}, 500)
             
         # 画像URLからの検索
         elif 'image_url' in request.json:
             image_url = request.json['image_url']
             if not image_url:
-                return jsonify({'error': 'Invalid image URL'}), 400
+                return ojson({'error': 'Invalid image URL'}, 400)
                 
             try:
                 # 画像URLからモデル番号を抽出
                 model_numbers = []
                 try:
-                    model_numbers = image_search.extract_model_numbers(image_url=image_url)
-                    print(f"Extracted model numbers from URL: {model_numbers}")
+                    model_numbers = get_image_search().extract_model_numbers(image_url=image_url)
+                    logger.debug("Extracted model numbers from URL: %s", model_numbers)
                 except Exception as e:
-                    print(f"Error extracting model numbers from URL: {e}")
+                    logger.warning("Error extracting model numbers from URL: %s", e)
                     # Continue with empty model numbers
                 
                 # モデル番号が見つからない場合は画像の内容を分析
                 generic_term = None
                 if not model_numbers:
                     try:
-                        generic_term = image_search.analyze_image_content(image_url=image_url)
-                        print(f"Analyzed image content from URL: {generic_term}")
+                        generic_term = get_image_search().analyze_image_content(image_url=image_url)
+                        logger.debug("Analyzed image content from URL: %s", generic_term)
                     except Exception as e:
-                        print(f"Error analyzing image content from URL: {e}")
+                        logger.warning("Error analyzing image content from URL: %s", e)
                         # Use a more useful default term
                         generic_term = "スマートフォン"
                 
@@ -502,17 +761,17 @@ def search_by_image():
                 if model_numbers:
                     # 最も信頼度の高いモデル番号を使用
                     best_model = model_numbers[0]['model_number']
-                    print(f"Using model number for search: {best_model}")
+                    logger.debug("Using model number for search: %s", best_model)
                     
                     # 最も信頼度の高いモデル番号のみを使用
                     filtered_model_numbers = [model_numbers[0]]
                     
                     try:
                         # モデル番号で検索
-                        search_results = product_search.search(best_model)
+                        search_results = get_product_search().search(best_model)
                         
                         # 結果を返す
-                        return jsonify({
+                        return ojson({
                             'query_image': image_url,
                             'model_numbers': filtered_model_numbers,
                             'generic_term': generic_term,  # Add generic term to the response
@@ -521,19 +780,19 @@ def search_by_image():
                             'detailed_products': search_results.get('detailed_products', [])
                         })
                     except Exception as e:
-                        print(f"Error searching with model number from URL: {e}")
+                        logger.warning("Error searching with model number from URL: %s", e)
                         # Fall back to generic term search if model number search fails
                         generic_term = generic_term or "商品"
                 
                 # モデル番号が見つからないが、画像の内容が識別できた場合
                 if generic_term:
-                    print(f"No model number found or model number search failed. Using generic term for search from URL: {generic_term}")
+                    logger.debug("No model number found or model number search failed. Using generic term for search from URL: %s", generic_term)
                     
                     # 単一検索を使用して商品を検索
-                    search_results = product_search.search(generic_term)
+                    search_results = get_product_search().search(generic_term)
                     
                     # 結果を返す
-                    return jsonify({
+                    return ojson({
                         'query_image': image_url,
                         'model_numbers': model_numbers,
                         'generic_term': generic_term,
@@ -543,7 +802,7 @@ def search_by_image():
                     })
                 
                 # 何も見つからなかった場合
-                    return jsonify({
+                    return ojson({
                         'query_image': image_url,
                         'model_numbers': [],
                     'generic_term': "商品",
@@ -554,15 +813,15 @@ def search_by_image():
                     })
                 
             except Exception as e:
-                print(f"Error processing image URL: {e}")
-                return jsonify({'error': f'Error processing image URL: {str(e)}'}), 500
+                logger.exception("Error processing image URL")
+                return ojson({'error': f'Error processing image URL: {str(e)}'}, 500)
             
         else:
-            return jsonify({'error': 'No image or image URL provided'}), 400
+            return ojson_bytes(_ERR_NO_IMAGE, 400)
             
     except Exception as e:
-        print(f"Error in image search: {e}")
-        return jsonify({'error': str(e)}), 500
+        logger.exception("Error in image search")
+        return ojson({'error': str(e)}, 500)
 
 # Add a fallback route for image search without the /api prefix
 @app.route('/search/image', methods=['POST'])
@@ -572,6 +831,147 @@ def search_by_image_fallback():
     """
     return search_by_image()
 
+# 画像ファイル名から型番を抽出するパターン
+_MODEL_PATTERNS = [
+    re.compile(r'[A-Z0-9]{2,}-[A-Z0-9]{2,}'),  # ABC-123 形式
+    re.compile(r'[A-Z]{2,}[0-9]{2,}'),         # ABC123 形式
+    re.compile(r'[0-9]{2,}-[A-Z0-9]{2,}'),     # 12-ABC 形式
+]
+
+# HTML除去用のパターン
+_BR_RE = re.compile(r'<br\s*/?>', re.IGNORECASE)
+_TAG_RE = re.compile(r'<[^>]+>')
+_NL_RE = re.compile(r'\n+')
+_WS_RE = re.compile(r'\s+')
+
+@functools.lru_cache(maxsize=1024)
+def clean_html(html_text):
+    """Remove HTML tags from text (memoized: the same descriptions are compared repeatedly)"""
+    if not html_text:
+        return ""
+        
+    # Replace <br>, <br/>, <br /> with newlines
+    text = _BR_RE.sub('\n', html_text)
+    
+    # Remove all other HTML tags
+    text = _TAG_RE.sub('', text)
+    
+    # Replace multiple newlines with a single newline
+    text = _NL_RE.sub('\n', text)
+    
+    # Replace multiple spaces with a single space
+    text = _WS_RE.sub(' ', text)
+    
+    return text.strip()
+
+# 比較項目の重要度のしきい値 (high, medium)
+PRICE_DIFF_THRESHOLDS = (20, 5)        # 価格差（%）
+SHIPPING_DIFF_THRESHOLDS = (500, 100)  # 送料差（円）
+RATING_DIFF_THRESHOLDS = (1.5, 0.5)    # 評価差（点）
+
+# Perplexity の応答に含まれるJSONオブジェクト（前後の説明文を除く）
+_JSON_OBJECT_RE = re.compile(r'\{.*\}', re.DOTALL)
+
+# 商品説明中の耐荷重表記（例: 耐荷重：50kg）
+_LOAD_CAP_RE = re.compile(r'耐荷重[：:]\s*(\d+(?:kg|g|k)?)')
+
+# 型番らしい入力の判定（JANコードは is_jan_code で正規表現を使わずに判定）
+_MODEL_RE = re.compile(r'[A-Za-z0-9]+-?[A-Za-z0-9]+')
+
+def _classify_product_info(text):
+    """
+    入力が 'jan'（JANコード）、'model'（型番らしい文字列）のどちらかを返す（該当なしは None）
+    """
+    if is_jan_code(text):
+        return 'jan'
+    if _MODEL_RE.match(text):
+        return 'model'
+    return None
+
+# ノートパソコン検索の判定（英字の単語単位で照合し、"dismiss" 中の "msi" などの誤検出を防ぐ）
+_LAPTOP_BRANDS = frozenset(('hp', 'dell', 'lenovo', 'asus', 'acer', 'msi', 'fujitsu', 'toshiba', 'nec', 'vaio'))
+_LAPTOP_KEYWORDS = frozenset(('laptop', 'pc', 'notebook', 'computer'))
+_LAPTOP_JA_KEYWORD = 'パソコン'  # ノートパソコン も含む
+_LATIN_WORD_RE = re.compile(r'[a-z]+')
+
+# 耐荷重を表す additional_info のキー
+LOAD_KEYS = ('荷重', '耐荷重', '最大荷重')
+LOAD_RE = re.compile('|'.join(map(re.escape, LOAD_KEYS)))
+
+def _find_load_capacity(additional_info):
+    """
+    additional_info から最初の耐荷重の値を取得（見つからない場合は"不明"）
+    """
+    return next(
+        (str(value) for key, value in additional_info.items() if LOAD_RE.search(key)),
+        "不明"
+    )
+
+def _extract_load_capacity(get, description):
+    """
+    additional_info、なければ説明文から耐荷重を取得（見つからない場合は"不明"）
+    """
+    load_capacity = "不明"
+    additional_info = get('additional_info', {})
+    if additional_info:
+        load_capacity = _find_load_capacity(additional_info)
+    if load_capacity == "不明" and description:
+        load_capacity_match = _LOAD_CAP_RE.search(description)
+        if load_capacity_match:
+            load_capacity = load_capacity_match.group(1)
+    return load_capacity
+
+def _extract_features(get, description):
+    """
+    features（先頭3件）、なければHTMLを除去した説明文全体を取得（見つからない場合は"不明"）
+    """
+    product_features = get('features', [])
+    if product_features:
+        if isinstance(product_features, list):
+            return ", ".join(product_features[:3])
+        return str(product_features)
+    if description:
+        return clean_html(description)
+    return "不明"
+
+# 説明文などから抽出して比較する項目 (category, extractor, significance)
+_DETAIL_DIFF_SPECS = (
+    ('耐荷重', _extract_load_capacity, 'high'),  # Load capacity is usually important
+    ('特徴', _extract_features, 'medium'),
+)
+
+def _attr_getter(obj):
+    """
+    dict/オブジェクトのどちらからでも値を取得する関数を返す
+    """
+    if isinstance(obj, dict):
+        return obj.get
+    return lambda attr, default=None: getattr(obj, attr, default)
+
+def _significance(diff, thresholds):
+    """
+    差の大きさから重要度を判定
+    """
+    high, medium = thresholds
+    return 'high' if diff > high else 'medium' if diff > medium else 'low'
+
+def _diff_entry(category, value_a, value_b, thresholds, unit=''):
+    """
+    2つの数値の差から比較項目を作成（差を計算できない場合はNone）
+    """
+    try:
+        diff = abs(value_a - value_b)
+    except TypeError as e:
+        logger.warning("Error calculating %s difference: %s", category, e)
+        return None
+    
+    return {
+        'category': category,
+        'product_a_value': f"{value_a}{unit}",
+        'product_b_value': f"{value_b}{unit}",
+        'significance': _significance(diff, thresholds)
+    }
+
 @app.route('/api/compare', methods=['POST'])
 def compare_products():
     """商品比較API"""
@@ -580,78 +980,54 @@ def compare_products():
     product_b = data.get('product_b')
     
     if not product_a or not product_b:
-        return jsonify({"error": "Both products are required for comparison"}), 400
-    
-    # Helper function to safely get attribute from either dict or object
-    def get_attr(obj, attr, default=None):
-        if isinstance(obj, dict):
-            return obj.get(attr, default)
-        else:
-            return getattr(obj, attr, default)
-    
-    # Helper function to clean HTML tags from text
-    def clean_html(html_text):
-        """Remove HTML tags from text"""
-        if not html_text:
-            return ""
-            
-        import re
-        # Replace <br>, <br/>, <br /> with newlines
-        text = re.sub(r'<br\s*/?>', '\n', html_text, flags=re.IGNORECASE)
-        
-        # Remove all other HTML tags
-        text = re.sub(r'<[^>]+>', '', text)
-        
-        # Replace multiple newlines with a single newline
-        text = re.sub(r'\n+', '\n', text)
-        
-        # Replace multiple spaces with a single space
-        text = re.sub(r'\s+', ' ', text)
-        
-        return text.strip()
+        return ojson({"error": "Both products are required for comparison"}, 400)
     
     try:
         # 各商品の詳細情報を取得
-        products_a = price_comparison.get_detailed_products(product_a)
-        products_b = price_comparison.get_detailed_products(product_b)
+        products_a = get_price_comparison().get_detailed_products(product_a)
+        products_b = get_price_comparison().get_detailed_products(product_b)
         
         # Check if we found any products
         if not products_a:
-            return jsonify({"error": f"Could not find information for product: {product_a}"}), 404
+            return ojson({"error": f"Could not find information for product: {product_a}"}, 404)
         
         if not products_b:
-            return jsonify({"error": f"Could not find information for product: {product_b}"}), 404
+            return ojson({"error": f"Could not find information for product: {product_b}"}, 404)
         
         # 最初の商品を使用
         product_a_info = products_a[0]
         product_b_info = products_b[0]
         
+        # dict/オブジェクトの判定は商品ごとに一度だけ行う
+        get_a = _attr_getter(product_a_info)
+        get_b = _attr_getter(product_b_info)
+        
         # Validate that both products have the necessary data
-        price_a = get_attr(product_a_info, 'price')
-        price_b = get_attr(product_b_info, 'price')
+        price_a = get_a('price')
+        price_b = get_b('price')
         
         if price_a is None:
-            return jsonify({"error": f"Price information not available for product: {product_a}"}), 400
+            return ojson({"error": f"Price information not available for product: {product_a}"}, 400)
             
         if price_b is None:
-            return jsonify({"error": f"Price information not available for product: {product_b}"}), 400
+            return ojson({"error": f"Price information not available for product: {product_b}"}, 400)
         
         # 違いを分析（実際のアプリケーションではより詳細な分析が必要）
         differences = []
         
         # 価格の違い
         try:
-            price_diff = abs(price_a - price_b)
-            price_percentage = price_diff / max(price_a, price_b) * 100 if max(price_a, price_b) > 0 else 0
+            larger_price = max(price_a, price_b)
+            price_percentage = abs(price_a - price_b) / larger_price * 100 if larger_price > 0 else 0
             
             differences.append({
                 'category': '価格',
                 'product_a_value': f"{price_a}円",
                 'product_b_value': f"{price_b}円",
-                'significance': 'high' if price_percentage > 20 else 'medium' if price_percentage > 5 else 'low'
+                'significance': _significance(price_percentage, PRICE_DIFF_THRESHOLDS)
             })
         except (TypeError, ZeroDivisionError) as e:
-            print(f"Error calculating price difference: {e}")
+            logger.warning("Error calculating price difference: %s", e)
             # Add a placeholder for price difference
             differences.append({
                 'category': '価格',
@@ -661,124 +1037,41 @@ def compare_products():
             })
         
         # 送料の違い
-        try:
-            shipping_fee_a = get_attr(product_a_info, 'shipping_fee', 0)
-            shipping_fee_b = get_attr(product_b_info, 'shipping_fee', 0)
-            
-            if shipping_fee_a is not None and shipping_fee_b is not None:
-                shipping_diff = abs((shipping_fee_a or 0) - (shipping_fee_b or 0))
-                differences.append({
-                    'category': '送料',
-                    'product_a_value': f"{shipping_fee_a or 0}円",
-                    'product_b_value': f"{shipping_fee_b or 0}円",
-                    'significance': 'high' if shipping_diff > 500 else 'medium' if shipping_diff > 100 else 'low'
-                })
-        except Exception as e:
-            print(f"Error calculating shipping difference: {e}")
+        shipping_fee_a = get_a('shipping_fee', 0)
+        shipping_fee_b = get_b('shipping_fee', 0)
+        if shipping_fee_a is not None and shipping_fee_b is not None:
+            entry = _diff_entry('送料', shipping_fee_a or 0, shipping_fee_b or 0, SHIPPING_DIFF_THRESHOLDS, '円')
+            if entry:
+                differences.append(entry)
         
         # 評価の違い
-        try:
-            rating_a = get_attr(product_a_info, 'rating')
-            rating_b = get_attr(product_b_info, 'rating')
-            
-            if rating_a is not None and rating_b is not None:
-                rating_diff = abs((rating_a or 0) - (rating_b or 0))
-                differences.append({
-                    'category': '評価',
-                    'product_a_value': f"{rating_a or 0}点",
-                    'product_b_value': f"{rating_b or 0}点",
-                    'significance': 'high' if rating_diff > 1.5 else 'medium' if rating_diff > 0.5 else 'low'
-                })
-        except Exception as e:
-            print(f"Error calculating rating difference: {e}")
-        
-        # 耐荷重の違い (Extract from description or additional_info)
-        try:
-            # Try to find load capacity information in the product data
-            load_capacity_a = "不明"
-            load_capacity_b = "不明"
-            
-            # Check in additional_info
-            additional_info_a = get_attr(product_a_info, 'additional_info', {})
-            if additional_info_a:
-                for key, value in additional_info_a.items():
-                    if '荷重' in key or '耐荷重' in key or '最大荷重' in key:
-                        load_capacity_a = str(value)
-                        break
-            
-            additional_info_b = get_attr(product_b_info, 'additional_info', {})
-            if additional_info_b:
-                for key, value in additional_info_b.items():
-                    if '荷重' in key or '耐荷重' in key or '最大荷重' in key:
-                        load_capacity_b = str(value)
-                        break
-            
-            # Check in description
-            description_a = get_attr(product_a_info, 'description', '')
-            if load_capacity_a == "不明" and description_a:
-                import re
-                load_capacity_match = re.search(r'耐荷重[：:]\s*(\d+[kgkg]*)', description_a)
-                if load_capacity_match:
-                    load_capacity_a = load_capacity_match.group(1)
-            
-            description_b = get_attr(product_b_info, 'description', '')
-            if load_capacity_b == "不明" and description_b:
-                import re
-                load_capacity_match = re.search(r'耐荷重[：:]\s*(\d+[kgkg]*)', description_b)
-                if load_capacity_match:
-                    load_capacity_b = load_capacity_match.group(1)
-            
-            # Add to differences if at least one product has load capacity info
-            if load_capacity_a != "不明" or load_capacity_b != "不明":
-                differences.append({
-                    'category': '耐荷重',
-                    'product_a_value': load_capacity_a,
-                    'product_b_value': load_capacity_b,
-                    'significance': 'high'  # Load capacity is usually important
-                })
-        except Exception as e:
-            print(f"Error extracting load capacity: {e}")
-        
-        # 特徴の違い (Extract from features or description)
-        try:
-            # Try to find features information in the product data
-            features_a = "不明"
-            features_b = "不明"
-            
-            # Check in features field
-            product_features_a = get_attr(product_a_info, 'features', [])
-            if product_features_a:
-                if isinstance(product_features_a, list):
-                    features_a = ", ".join(product_features_a[:3])  # Take first 3 features
-                else:
-                    features_a = str(product_features_a)
-            
-            product_features_b = get_attr(product_b_info, 'features', [])
-            if product_features_b:
-                if isinstance(product_features_b, list):
-                    features_b = ", ".join(product_features_b[:3])  # Take first 3 features
-                else:
-                    features_b = str(product_features_b)
-            
-            # If no features, extract from description
-            if features_a == "不明" and description_a:
-                # Use the full description instead of truncating
-                features_a = clean_html(description_a)
-            
-            if features_b == "不明" and description_b:
-                # Use the full description instead of truncating
-                features_b = clean_html(description_b)
-            
-            # Add to differences if at least one product has features info
-            if features_a != "不明" or features_b != "不明":
-                differences.append({
-                    'category': '特徴',
-                    'product_a_value': features_a,
-                    'product_b_value': features_b,
-                    'significance': 'medium'
-                })
-        except Exception as e:
-            print(f"Error extracting features: {e}")
+        rating_a = get_a('rating')
+        rating_b = get_b('rating')
+        if rating_a is not None and rating_b is not None:
+            entry = _diff_entry('評価', rating_a or 0, rating_b or 0, RATING_DIFF_THRESHOLDS, '点')
+            if entry:
+                differences.append(entry)
+        
+        # 説明文は耐荷重と特徴の両方で使うので一度だけ取得する
+        description_a = get_a('description', '')
+        description_b = get_b('description', '')
+        
+        # 耐荷重・特徴の違い (Extract from product fields or description)
+        for category, extract, significance in _DETAIL_DIFF_SPECS:
+            try:
+                value_a = extract(get_a, description_a)
+                value_b = extract(get_b, description_b)
+                
+                # Add to differences if at least one product has the information
+                if value_a != "不明" or value_b != "不明":
+                    differences.append({
+                        'category': category,
+                        'product_a_value': value_a,
+                        'product_b_value': value_b,
+                        'significance': significance
+                    })
+            except Exception as e:
+                logger.warning("Error extracting %s: %s", category, e)
         
         # 推奨
         recommendation = ""
@@ -797,45 +1090,26 @@ def compare_products():
                 # 特徴に基づく推奨ロジックを実装
                 recommendation = "両商品は価格と評価が似ていますが、詳細な特徴を比較して選択することをお勧めします。"
         except Exception as e:
-            print(f"Error generating recommendation: {e}")
+            logger.warning("Error generating recommendation: %s", e)
             recommendation = "商品の詳細を比較して、ご自身のニーズに合った方を選択してください。"
         
-        # 商品情報を辞書に変換
-        def product_to_dict(product):
-            if isinstance(product, dict):
-                return product
-            elif hasattr(product, 'to_dict') and callable(getattr(product, 'to_dict')):
-                return product.to_dict()
-            else:
-                # If it's another type of object with __dict__
-                if hasattr(product, '__dict__'):
-                    product_dict = product.__dict__
-                else:
-                    # Last resort: try to convert to a dictionary or create an empty one
-                    try:
-                        product_dict = dict(product)
-                    except:
-                        print(f"Warning: Could not convert {type(product)} to dictionary. Using empty dict.")
-                        product_dict = {}
-            return product_dict
-        
         # 結果を返す
         result = {
-            'product_a': product_to_dict(product_a_info),
-            'product_b': product_to_dict(product_b_info),
+            'product_a': _product_to_dict(product_a_info),
+            'product_b': _product_to_dict(product_b_info),
             'differences': differences,
             'recommendation': recommendation
         }
         
-        return jsonify(result)
+        return ojson(result)
     except Exception as e:
-        print(f"Error comparing products: {e}")
-        return jsonify({"error": f"Error comparing products: {str(e)}"}), 500
+        logger.exception("Error comparing products")
+        return ojson({"error": f"Error comparing products: {str(e)}"}, 500)
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """ヘルスチェックAPI"""
-    return jsonify({"status": "ok"})
+    return ojson({"status": "ok"})
 
 @app.route('/api/uploads/<filename>')
 def uploaded_file(filename):
@@ -861,22 +1135,22 @@ def enhance_keywords():
         custom_prompt = data.get('custom_prompt', None)  # Get custom prompt if provided
         
         if not product_info_list:
-            return jsonify({'error': '商品情報が提供されていません'}), 400
+            return ojson({'error': '商品情報が提供されていません'}, 400)
             
         # Use the BatchKeywordGenerator to generate keywords
-        results = batch_keyword_generator.batch_generate(product_info_list, custom_prompt)
+        results = get_batch_keyword_generator().batch_generate(product_info_list, custom_prompt)
         
         # Extract just the keywords for the response
         enhanced_keywords = [item['keyword'] for item in results]
             
         # 結果を返す
-        return jsonify({
+        return ojson({
             'keywords': enhanced_keywords
         })
         
     except Exception as e:
-        print(f"Error in enhance_keywords: {e}")
-        return jsonify({'error': str(e)}), 500
+        logger.exception("Error in enhance_keywords")
+        return ojson({'error': str(e)}, 500)
 
 def generate_ai_keywords(model_number, custom_prompt=None):
     """
@@ -884,10 +1158,10 @@ def generate_ai_keywords(model_number, custom_prompt=None):
     """
     try:
         # Use the BatchKeywordGenerator to generate a single keyword
-        result = batch_keyword_generator.generate_keyword(model_number, custom_prompt)
+        result = get_batch_keyword_generator().generate_keyword(model_number, custom_prompt)
         return result
     except Exception as e:
-        print(f"Error in AI keyword generation: {e}")
+        logger.exception("Error in AI keyword generation")
         # Clean up the model number as a fallback
         cleaned_model = re.sub(r'^\d+\s+', '', model_number.strip())
         return cleaned_model  # Fallback to using the model number directly
@@ -898,9 +1172,111 @@ def check_batch_status(batch_id):
     バッチ検索のステータスを確認するエンドポイント
     """
     if batch_id not in batch_search_status:
-        return jsonify({'error': 'Batch ID not found'}), 404
+        return ojson({'error': 'Batch ID not found'}, 404)
+        
+    return ojson(batch_search_status[batch_id])
+
+def _resolve_detailed_batch_key(product_info, use_jan_code):
+    """
+    詳細一括検索の1件分の検索キーワード（JANコードまたは入力そのもの）を決定する
+
+    Returns:
+        tuple: (検索キーワード, JANコード, JANコード検索のエラー or None)
+    """
+    kind = _classify_product_info(str(product_info))
+    
+    # Check if it's already a JAN code (8 or 13 digits)
+    if kind == 'jan':
+        logger.debug("Input is already a JAN code: %s", product_info)
+        return product_info, product_info, None
+    
+    # If it's a model number and JAN code lookup is enabled, try to get a JAN code
+    if use_jan_code and kind == 'model':
+        try:
+            jan_code = _cached_jan_code(product_info)
+        except Exception as e:
+            # Reported on the item (and the batch) instead of searching the raw input
+            logger.warning("Error looking up JAN code for '%s': %s", product_info, e)
+            return product_info, None, str(e)
+        if jan_code:
+            # If JAN code is found, it becomes the ONLY search term
+            logger.debug("Found JAN code for %s: %s", product_info, jan_code)
+            return jan_code, jan_code, None
+        logger.debug("No JAN code found for %s, using model number directly", product_info)
+    else:
+        logger.debug("Using normal search for %s (not a model number or JAN lookup disabled)", product_info)
+    
+    # For direct search, use the exact input as the only keyword
+    return product_info, None, None
+
+def _build_detailed_batch_result(batch_id, product_info, key, jan_code, lookup_error, products_by_key, prices_by_key):
+    """
+    まとめて取得した検索結果から詳細一括検索の1件分の結果を組み立てる
+    """
+    try:
+        if lookup_error is not None:
+            raise RuntimeError(lookup_error)
+        if key not in products_by_key:
+            raise RuntimeError(f"Failed to get detailed products for '{key}'")
+        detailed_products = products_by_key[key]
+        
+        # If no products found with a looked-up JAN code, fall back to model number
+        if not detailed_products and jan_code and jan_code != product_info:
+            logger.warning("No products found with JAN code %s, falling back to model number", jan_code)
+            detailed_products = get_price_comparison().get_detailed_products_direct(product_info)
+        
+        price_results = prices_by_key.get(key)
+        if price_results is None:
+            logger.warning("Error in price comparison for '%s'", product_info)
+            price_results = []
+            batch_search_status[batch_id]['has_errors'] = True
+        
+        # Convert product objects to dictionaries with JAN code metadata
+        serializable_products = _serialize_products(detailed_products, jan_code)
+        
+        result = {
+            'product_info': product_info,
+            'keywords': [key],
+            'jan_code': jan_code,  # Add JAN code to the result
+            'price_comparison': price_results,
+            'detailed_products': serializable_products,
+            'error': None
+        }
         
-    return jsonify(batch_search_status[batch_id])
+    except Exception as e:
+        logger.exception("Error processing '%s'", product_info)
+        result = {
+            'product_info': product_info,
+            'keywords': [product_info],
+            'price_comparison': [],
+            'detailed_products': [],
+            'error': str(e)
+        }
+        batch_search_status[batch_id]['has_errors'] = True
+    
+    return result
+
+def _detailed_batch_progress(batch_id, keys):
+    """
+    キーワードごとの商品取得と価格比較の両方が終わった時点で、
+    そのキーワードを使う件数だけ処理件数を進めるコールバックを返す
+    """
+    items_per_key = collections.Counter(keys)
+    # Each key is done once both the products and the prices fetch have finished
+    pending = dict.fromkeys(items_per_key, 2)
+    lock = threading.Lock()
+    counter = _batch_progress_counters[batch_id]
+    
+    def on_done(key):
+        with lock:
+            pending[key] -= 1
+            if pending[key]:
+                return
+            for _ in range(items_per_key[key]):
+                processed = next(counter)
+            batch_search_status[batch_id]['processed'] = processed
+    
+    return on_done
 
 @app.route('/api/search/detailed-batch', methods=['POST'])
 def detailed_batch_search():
@@ -917,11 +1293,11 @@ def detailed_batch_search():
         use_jan_code = data.get('use_jan_code', True)  # Default to True like in single search
         
         if not product_info_list or not isinstance(product_info_list, list):
-            return jsonify({'error': 'Invalid product info list'}), 400
+            return ojson_bytes(_ERR_INVALID_PRODUCT_INFO_LIST, 400)
             
         # 商品情報リストが大きすぎる場合はエラー
         if len(product_info_list) > 500:
-            return jsonify({'error': 'Too many items. Maximum 500 items allowed.'}), 400
+            return ojson({'error': 'Too many items. Maximum 500 items allowed.'}, 400)
         
         # Generate a unique batch ID for status tracking
         batch_id = str(uuid.uuid4())
@@ -933,172 +1309,145 @@ def detailed_batch_search():
             'start_time': time.time(),
             'results': []
         }
-        
-        results = []
-        
-        # Process items in chunks of 20 for better performance
-        chunk_size = 20
-        for i in range(0, len(product_info_list), chunk_size):
-            chunk = product_info_list[i:i+chunk_size]
-            print(f"Processing chunk {(i//chunk_size)+1}/{(len(product_info_list)+chunk_size-1)//chunk_size} ({len(chunk)} items)")
+        _batch_progress_counters[batch_id] = itertools.count(1)
+        
+        # Resolve search keys (JAN lookups) concurrently, then fetch products and
+        # prices once per distinct key instead of two round-trips per item
+        logger.debug("Processing %d items with up to %d workers", len(product_info_list), DETAILED_BATCH_MAX_WORKERS)
+        with ThreadPoolExecutor(max_workers=DETAILED_BATCH_MAX_WORKERS) as executor:
+            resolved = list(executor.map(
+                lambda product_info: _resolve_detailed_batch_key(product_info, use_jan_code),
+                product_info_list
+            ))
+            # Items whose JAN lookup failed are reported as errors and not searched
+            keys = [key for key, _, lookup_error in resolved if lookup_error is None]
+            for _ in range(len(resolved) - len(keys)):
+                batch_search_status[batch_id]['processed'] = next(_batch_progress_counters[batch_id])
+            # Progress advances per key as its fetches finish, not only after the whole network phase
+            on_key_done = _detailed_batch_progress(batch_id, keys)
+            products_future = executor.submit(
+                get_price_comparison().get_detailed_products_multi, keys, DETAILED_BATCH_MAX_WORKERS, on_key_done
+            )
+            prices_future = executor.submit(
+                get_price_comparison().compare_prices_multi, keys, DETAILED_BATCH_MAX_WORKERS, on_key_done
+            )
+            products_by_key = products_future.result()
+            prices_by_key = prices_future.result()
             
-            for product_info in chunk:
-                try:
-                    # For direct search, use the exact model number provided by the user
-                    keywords = [product_info]  # Use the exact input as the only keyword
-                    jan_code = None
-                    
-                    # Check if it looks like a model number
-                    is_model_number = bool(re.match(r'^[A-Za-z0-9]+-?[A-Za-z0-9]+', str(product_info)))
-                    
-                    # Check if it's already a JAN code (8 or 13 digits)
-                    is_jan_code = bool(re.match(r'^[0-9]{8}$|^[0-9]{13}$', str(product_info)))
-                    
-                    # If it's already a JAN code, use it directly
-                    if is_jan_code:
-                        print(f"Input is already a JAN code: {product_info}")
-                        jan_code = product_info
-                        keywords = [jan_code]
-                        
-                        # Get detailed product information using JAN code
-                        detailed_products = price_comparison.get_detailed_products_direct(jan_code)
-                        
-                    # If it's a model number and JAN code lookup is enabled, try to get a JAN code
-                    elif is_model_number and use_jan_code:
-                        jan_code = perplexity_client.get_jan_code(product_info)
-                        if jan_code:
-                            # If JAN code is found, it becomes the ONLY search term
-                            print(f"Found JAN code for {product_info}: {jan_code}")
-                            # Use only the JAN code for search to ensure consistency across platforms
-                            keywords = [jan_code]
-                            
-                            # Get detailed product information using JAN code
-                            detailed_products = price_comparison.get_detailed_products_direct(jan_code)
-                            
-                            # If no products found with JAN code, fall back to model number
-                            if not detailed_products or len(detailed_products) == 0:
-                                print(f"No products found with JAN code, falling back to model number")
-                                detailed_products = price_comparison.get_detailed_products_direct(product_info)
-                        else:
-                            # No JAN code found, use the model number
-                            print(f"No JAN code found for {product_info}, using model number directly")
-                            detailed_products = price_comparison.get_detailed_products_direct(product_info)
-                    else:
-                        # Not a model number or JAN code lookup disabled, use normal search
-                        print(f"Using normal search for {product_info} (not a model number or JAN lookup disabled)")
-                        detailed_products = price_comparison.get_detailed_products_direct(product_info)
-                    
-                    # 価格比較
-                    price_results = []
-                    try:
-                        # For price comparison, use the same keywords as for product search
-                        price_results = price_comparison.compare_prices_with_model_numbers(keywords)
-                    except Exception as e:
-                        print(f"Error in price comparison for '{product_info}': {e}")
-                        batch_search_status[batch_id]['has_errors'] = True
-                    
-                    # Convert product objects to dictionaries with JAN code metadata
-                    serializable_products = []
-                    for product in detailed_products:
-                        if hasattr(product, 'to_dict'):
-                            product_dict = product.to_dict()
-                            # Add metadata to indicate this product was found via JAN code
-                            if jan_code:
-                                if not product_dict.get('additional_info'):
-                                    product_dict['additional_info'] = {}
-                                product_dict['additional_info']['searched_by_jan'] = True
-                                product_dict['additional_info']['jan_code'] = jan_code
-                            serializable_products.append(product_dict)
-                        else:
-                            # If it's already a dictionary
-                            if isinstance(product, dict):
-                                product_dict = product
-                            else:
-                                # If it's another type of object with __dict__
-                                if hasattr(product, '__dict__'):
-                                    product_dict = product.__dict__
-                                else:
-                                    # Last resort: try to convert to a dictionary or create an empty one
-                                    try:
-                                        product_dict = dict(product)
-                                    except:
-                                        print(f"Warning: Could not convert {type(product)} to dictionary. Using empty dict.")
-                                        product_dict = {}
-                            # Add metadata to indicate this product was found via JAN code
-                            if jan_code:
-                                if not product_dict.get('additional_info'):
-                                    product_dict['additional_info'] = {}
-                                product_dict['additional_info']['searched_by_jan'] = True
-                                product_dict['additional_info']['jan_code'] = jan_code
-                            serializable_products.append(product_dict)
-                    
-                    result = {
-                        'product_info': product_info,
-                        'keywords': keywords,
-                        'jan_code': jan_code,  # Add JAN code to the result
-                        'price_comparison': price_results,
-                        'detailed_products': serializable_products,
-                        'error': None
-                    }
-                    
-                    results.append(result)
-                    batch_search_status[batch_id]['results'].append(result)
-                    
-                except Exception as e:
-                    print(f"Error processing '{product_info}': {e}")
-                    error_result = {
-                        'product_info': product_info,
-                        'keywords': [product_info],
-                        'price_comparison': [],
-                        'detailed_products': [],
-                        'error': str(e)
-                    }
-                    results.append(error_result)
-                    batch_search_status[batch_id]['results'].append(error_result)
-                    batch_search_status[batch_id]['has_errors'] = True
-                
-                # Update processed count
-                batch_search_status[batch_id]['processed'] += 1
-        
-        # Mark as completed
+            # Keep results in the same order as the input
+            results = list(executor.map(
+                lambda item: _build_detailed_batch_result(batch_id, item[0], *item[1], products_by_key, prices_by_key),
+                zip(product_info_list, resolved)
+            ))
+        
+        # Store the results list by reference and mark as completed
+        batch_search_status[batch_id]['results'] = results
+        batch_search_status[batch_id]['processed'] = len(results)
         batch_search_status[batch_id]['completed'] = True
+        _batch_progress_counters.pop(batch_id, None)
         batch_search_status[batch_id]['end_time'] = time.time()
-        
-        # Add batch ID to the response for status checking
-        response = {
-            'batch_id': batch_id,
-            'results': results
-        }
+        _schedule_status_expiry(batch_id)
         
         # Clean up old statuses (older than 1 hour)
         cleanup_old_statuses()
         
-        return jsonify(response)
+        # Add batch ID to the response for status checking; results are encoded
+        # one at a time so the whole payload is never built as a single string
+        return app.response_class(_stream_batch_response(batch_id, results), mimetype='application/json')
     except Exception as e:
-        print(f"Error in detailed batch search: {e}")
+        logger.exception("Error in detailed batch search")
         # If a batch ID was created, update its status to show failure
         if 'batch_id' in locals():
             batch_search_status[batch_id]['completed'] = True
             batch_search_status[batch_id]['has_errors'] = True
             batch_search_status[batch_id]['error'] = str(e)
+            _batch_progress_counters.pop(batch_id, None)
+            _schedule_status_expiry(batch_id)
             
-        return jsonify({'error': str(e)}), 500
+        return ojson({'error': str(e)}, 500)
+
+def _stream_json_array(prefix, items, convert=_identity):
+    """
+    prefix + [要素, ...] + "]}" を要素1件ずつJSONエンコードして返すジェネレータ
+
+    prefix は '{..., "key":[' までのバイト列
+    """
+    yield prefix
+    for index, item in enumerate(items):
+        if index:
+            yield b','
+        yield json_utils.dumps(convert(item))
+    yield b']}'
+
+def _not_modified(etag):
+    """
+    If-None-Match が ETag と一致すれば 304 レスポンスを返す（一致しなければ None）
+    """
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    response = app.response_class(status=304)
+    response.set_etag(etag, weak=True)
+    return response
+
+def _tee_to_cache(chunks, cache, key):
+    """
+    チャンクをそのまま返しつつ、最後まで送れた場合は連結したバイト列をキャッシュする
+    """
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    cache.set(key, b''.join(parts))
+
+def _stream_batch_response(batch_id, results):
+    """
+    {"batch_id": ..., "results": [...]} を結果1件ずつJSONエンコードして返すジェネレータ
+    """
+    return _stream_json_array(b'{"batch_id":' + json_utils.dumps(batch_id) + b',"results":[', results)
+
+def _schedule_status_expiry(batch_id):
+    """
+    完了したバッチのステータスを削除予定に登録する（開始から1時間後）
+    """
+    expiry_time = batch_search_status[batch_id]['start_time'] + BATCH_STATUS_TTL
+    with _status_expiry_lock:
+        heapq.heappush(_status_expiry_heap, (expiry_time, batch_id))
 
 def cleanup_old_statuses():
     """
     Clean up status entries older than 1 hour
     """
     current_time = time.time()
-    to_delete = []
     
-    for batch_id, status in batch_search_status.items():
-        if status.get('completed', False) and 'start_time' in status:
-            # If completed and older than 1 hour
-            if current_time - status['start_time'] > 3600:
-                to_delete.append(batch_id)
+    # Only pop expired entries from the heap instead of scanning every status
+    with _status_expiry_lock:
+        while _status_expiry_heap and _status_expiry_heap[0][0] < current_time:
+            _, batch_id = heapq.heappop(_status_expiry_heap)
+            batch_search_status.pop(batch_id, None)
     
-    for batch_id in to_delete:
-        del batch_search_status[batch_id]
+    logger.info("JAN code cache: %d found, %d not found", len(jan_code_lookup_cache), len(jan_code_miss_cache))
+
+# Number of concurrent Amazon lookups when building batch keyword context
+KEYWORD_PRODUCT_LOOKUP_MAX_WORKERS = int(os.getenv('KEYWORD_PRODUCT_LOOKUP_MAX_WORKERS', '10'))
+
+def _fetch_keyword_product_details(model_number):
+    """
+    キーワード生成用に型番の商品情報（タイトル・特徴・説明）をAmazonから取得する
+    """
+    try:
+        # Use existing search functionality (shared Amazon client) to get product info
+        product_info = amazon_api.search_items(model_number, limit=5)
+        
+        if not product_info:
+            # If no product info found, just use the model number
+            return {"model_number": model_number}
+        
+        # Extract relevant product information (ProductDetail or dictionary)
+        return keyword_product_info(model_number, product_info[0])
+    except Exception as e:
+        logger.warning("Error fetching product info for %s: %s", model_number, e)
+        # If error, just use the model number
+        return {"model_number": model_number}
 
 @app.route('/api/search/batch-keywords', methods=['POST'])
 def batch_keywords():
@@ -1109,10 +1458,10 @@ def batch_keywords():
         force_refresh = data.get('force_refresh', False)  # New parameter to bypass cache
         
         if not model_numbers:
-            return jsonify({'error': 'No model numbers provided'}), 400
+            return ojson_bytes(_ERR_NO_MODEL_NUMBERS, 400)
         
-        # Initialize the batch keyword generator
-        generator = BatchKeywordGenerator()
+        # Shared batch keyword generator (constructed once per process)
+        generator = get_batch_keyword_generator()
         
         # Clean model numbers
         cleaned_model_numbers = []
@@ -1122,44 +1471,11 @@ def batch_keywords():
                 cleaned_model_numbers.append(cleaned)
         
         if not cleaned_model_numbers:
-            return jsonify({'error': 'No valid model numbers provided'}), 400
+            return ojson_bytes(_ERR_NO_VALID_MODEL_NUMBERS, 400)
             
-        # First, fetch product information for each model number
-        product_info_list = []
-        for model_number in cleaned_model_numbers:
-            # Try to fetch product info from Amazon or other sources
-            try:
-                # Use existing search functionality to get product info
-                amazon_api = AmazonAPI()
-                product_info = amazon_api.search_items(model_number, limit=5)
-                
-                if product_info and len(product_info) > 0:
-                    # Extract relevant product information
-                    product = product_info[0]
-                    # Check if product is a ProductDetail object
-                    if hasattr(product, 'title'):
-                        product_details = {
-                            "model_number": model_number,
-                            "title": product.title,
-                            "features": getattr(product, 'features', []),
-                            "description": getattr(product, 'description', '')
-                        }
-                    else:
-                        # Handle dictionary format
-                        product_details = {
-                            "model_number": model_number,
-                            "title": product.get('title', ''),
-                            "features": product.get('features', []),
-                            "description": product.get('description', '')
-                        }
-                    product_info_list.append(product_details)
-                else:
-                    # If no product info found, just use the model number
-                    product_info_list.append({"model_number": model_number})
-            except Exception as e:
-                print(f"Error fetching product info for {model_number}: {str(e)}")
-                # If error, just use the model number
-                product_info_list.append({"model_number": model_number})
+        # First, fetch product information for each model number (in parallel, bounded for Amazon rate limits)
+        with ThreadPoolExecutor(max_workers=KEYWORD_PRODUCT_LOOKUP_MAX_WORKERS) as executor:
+            product_info_list = list(executor.map(_fetch_keyword_product_details, cleaned_model_numbers))
         
         # Now generate keywords based on the product information
         results = generator.batch_generate(product_info_list, custom_prompt, force_refresh)
@@ -1168,13 +1484,13 @@ def batch_keywords():
         enhanced_keywords = [item['keyword'] for item in results]
         
         # Return both the full results and just the keywords (for compatibility with different frontend implementations)
-        return jsonify({
+        return ojson({
             'results': results,  # Original format
             'keywords': enhanced_keywords  # Same format as enhance_keywords endpoint
         })
     except Exception as e:
-        print(f"Error in batch keywords: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        logger.exception("Error in batch keywords")
+        return ojson({'error': str(e)}, 500)
 
 @app.route('/api/search/find-best-model', methods=['POST'])
 def find_best_model():
@@ -1187,13 +1503,13 @@ def find_best_model():
         criteria_prompt = data.get('criteria_prompt')
         
         if not model_numbers:
-            return jsonify({'error': 'No model numbers provided'}), 400
+            return ojson_bytes(_ERR_NO_MODEL_NUMBERS, 400)
             
         if not criteria_prompt:
-            return jsonify({'error': 'No criteria prompt provided'}), 400
+            return ojson({'error': 'No criteria prompt provided'}, 400)
         
-        # Initialize the batch keyword generator
-        generator = BatchKeywordGenerator()
+        # Shared batch keyword generator (constructed once per process)
+        generator = get_batch_keyword_generator()
         
         # Clean model numbers
         cleaned_model_numbers = []
@@ -1203,7 +1519,7 @@ def find_best_model():
                 cleaned_model_numbers.append(cleaned)
         
         if not cleaned_model_numbers:
-            return jsonify({'error': 'No valid model numbers provided'}), 400
+            return ojson_bytes(_ERR_NO_VALID_MODEL_NUMBERS, 400)
             
         # Instead of fetching product information for each model number,
         # directly use Perplexity AI to find the best model
@@ -1215,18 +1531,18 @@ def find_best_model():
         result = generator.find_best_model(product_info_list, criteria_prompt)
         
         # Return just the best model number and reason
-        return jsonify({
+        return ojson({
             'best_model_number': result.get('best_model_number'),
             'reason': result.get('reason')
         })
     except Exception as e:
-        print(f"Error in find best model: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        logger.exception("Error in find best model")
+        return ojson({'error': str(e)}, 500)
 
 # Add a route to explicitly handle OPTIONS requests
 @app.route('/api/search/product', methods=['OPTIONS'])
 def handle_product_options():
-    response = jsonify({'status': 'ok'})
+    response = ojson({'status': 'ok'})
     return response
 
 @app.route('/api/search/product', methods=['POST'])
@@ -1240,65 +1556,64 @@ def search_product():
         use_jan_code = data.get('use_jan_code', True)  # Default to True
         
         if not product_info:
-            return jsonify({"error": "Product info is required"}), 400
+            return ojson_bytes(_ERR_PRODUCT_INFO_REQUIRED, 400)
         
-        print(f"Starting product search for: {product_info}")
+        logger.debug("Starting product search for: %s", product_info)
+        product_text = str(product_info)
+        product_text_lower = product_text.casefold()
         
         # Check if this is a laptop search to apply special handling
-        laptop_brands = ['hp', 'dell', 'lenovo', 'asus', 'acer', 'msi', 'fujitsu', 'toshiba', 'nec', 'vaio']
-        laptop_keywords = ['laptop', 'ノートパソコン', 'パソコン', 'PC', 'notebook', 'computer']
+        product_words = _LATIN_WORD_RE.findall(product_text_lower)
+        brand = next((word for word in product_words if word in _LAPTOP_BRANDS), None)
         
         is_laptop_search = False
-        if any(brand.lower() in product_info.lower() for brand in laptop_brands) and \
-           any(keyword.lower() in product_info.lower() for keyword in laptop_keywords):
+        if brand and (_LAPTOP_JA_KEYWORD in product_text_lower or not _LAPTOP_KEYWORDS.isdisjoint(product_words)):
             is_laptop_search = True
-            print(f"Detected laptop search: {product_info}")
+            logger.debug("Detected laptop search: %s", product_info)
         
         # Use direct search with the exact model number/product info
         keywords = [product_info]
         jan_code = None
         
-        # Check if it looks like a model number
-        is_model_number = bool(re.match(r'^[A-Za-z0-9]+-?[A-Za-z0-9]+', str(product_info)))
-        
-        # Check if it's already a JAN code (8 or 13 digits)
-        is_jan_code = bool(re.match(r'^[0-9]{8}$|^[0-9]{13}$', str(product_info)))
+        # Check if it's already a JAN code (8 or 13 digits) or looks like a model number
+        kind = _classify_product_info(product_text)
+        is_jan_input = kind == 'jan'
+        is_model_number = kind == 'model'
         
         # If it's already a JAN code, use it directly
-        if is_jan_code:
-            print(f"Input is already a JAN code: {product_info}")
+        if is_jan_input:
+            logger.debug("Input is already a JAN code: %s", product_info)
             jan_code = product_info
             keywords = [jan_code]
             
             # Get detailed product information using JAN code
-            detailed_products = price_comparison.get_detailed_products_direct(jan_code)
+            detailed_products = get_price_comparison().get_detailed_products_direct(jan_code)
             
         # If it's a model number and JAN code lookup is enabled, try to get a JAN code
         elif is_model_number and use_jan_code:
-            jan_code = perplexity_client.get_jan_code(product_info)
+            jan_code = _cached_jan_code(product_info)
             if jan_code:
                 # If JAN code is found, it becomes the ONLY search term
-                print(f"Found JAN code for {product_info}: {jan_code}")
+                logger.debug("Found JAN code for %s: %s", product_info, jan_code)
                 # Use only the JAN code for search to ensure consistency across platforms
                 keywords = [jan_code]
                 
                 # Get detailed product information using JAN code
-                detailed_products = price_comparison.get_detailed_products_direct(jan_code)
+                detailed_products = get_price_comparison().get_detailed_products_direct(jan_code)
                 
                 # If no products found with JAN code, fall back to model number
                 if not detailed_products or len(detailed_products) == 0:
-                    print(f"No products found with JAN code, falling back to model number")
-                    detailed_products = price_comparison.get_detailed_products_direct(product_info)
+                    logger.warning("No products found with JAN code %s, falling back to model number", jan_code)
+                    detailed_products = get_price_comparison().get_detailed_products_direct(product_info)
             else:
                 # No JAN code found, use the model number
-                print(f"No JAN code found for {product_info}, using model number directly")
-                detailed_products = price_comparison.get_detailed_products_direct(product_info)
+                logger.debug("No JAN code found for %s, using model number directly", product_info)
+                detailed_products = get_price_comparison().get_detailed_products_direct(product_info)
         # Special handling for laptop searches
         elif is_laptop_search:
-            print(f"Using specialized laptop search for: {product_info}")
+            logger.debug("Using specialized laptop search for: %s", product_info)
             
-            # Try to extract the brand and add it to keywords
-            brand = next((brand for brand in laptop_brands if brand.lower() in product_info.lower()), None)
+            # Use the detected brand to add keywords
             if brand:
                 # Create additional search terms focused on the laptop
                 enhanced_terms = [
@@ -1307,19 +1622,19 @@ def search_product():
                 ]
                 
                 # If Windows is mentioned, add a Windows-specific term
-                if 'windows' in product_info.lower():
+                if 'windows' in product_text_lower:
                     enhanced_terms.append(f"{brand} ノートパソコン windows")
                 
-                print(f"Enhanced laptop search terms: {enhanced_terms}")
+                logger.debug("Enhanced laptop search terms: %s", enhanced_terms)
                 
                 # Try each term until we get good results
                 for term in enhanced_terms:
-                    temp_products = price_comparison.get_detailed_products_direct(term)
+                    temp_products = get_price_comparison().get_detailed_products_direct(term)
                     
                     # If we got good results, use them and break
                     if temp_products and len(temp_products) >= 3:
                         detailed_products = temp_products
-                        print(f"Found {len(detailed_products)} products using term: {term}")
+                        logger.debug("Found %d products using term: %s", len(detailed_products), term)
                         keywords = [term]
                         break
                     elif not detailed_products or len(detailed_products) == 0:
@@ -1328,63 +1643,30 @@ def search_product():
                         keywords = [term]
             else:
                 # If no brand identified, use standard search
-                detailed_products = price_comparison.get_detailed_products_direct(product_info)
+                detailed_products = get_price_comparison().get_detailed_products_direct(product_info)
         else:
             # Not a model number or JAN code lookup disabled, use normal search
-            print(f"Using normal search for {product_info}")
-            detailed_products = price_comparison.get_detailed_products_direct(product_info)
+            logger.debug("Using normal search for %s", product_info)
+            detailed_products = get_price_comparison().get_detailed_products_direct(product_info)
         
         # If we still have no products, try a more generic search for laptops
         if is_laptop_search and (not detailed_products or len(detailed_products) == 0):
-            print("No products found with specific terms, trying generic laptop search")
-            # Extract brand for more generic search
-            brand = next((brand for brand in laptop_brands if brand.lower() in product_info.lower()), None)
+            logger.debug("No products found with specific terms, trying generic laptop search")
+            # Use the detected brand for a more generic search
             if brand:
                 generic_term = f"{brand} ノートパソコン"
-                detailed_products = price_comparison.get_detailed_products_direct(generic_term)
+                detailed_products = get_price_comparison().get_detailed_products_direct(generic_term)
                 if detailed_products and len(detailed_products) > 0:
-                    print(f"Found {len(detailed_products)} products using generic term: {generic_term}")
+                    logger.debug("Found %d products using generic term: %s", len(detailed_products), generic_term)
                     keywords = [generic_term]
         
-        print(f"Found {len(detailed_products)} total products for search: {product_info}")
+        logger.debug("Found %d total products for search: %s", len(detailed_products), product_info)
         
         # Convert product objects to dictionaries
-        serializable_products = []
-        for product in detailed_products:
-            if hasattr(product, 'to_dict'):
-                product_dict = product.to_dict()
-                # Add metadata to indicate this product was found via JAN code
-                if jan_code:
-                    if not product_dict.get('additional_info'):
-                        product_dict['additional_info'] = {}
-                    product_dict['additional_info']['searched_by_jan'] = True
-                    product_dict['additional_info']['jan_code'] = jan_code
-                serializable_products.append(product_dict)
-            else:
-                # If it's already a dictionary
-                if isinstance(product, dict):
-                    product_dict = product
-                else:
-                    # If it's another type of object with __dict__
-                    if hasattr(product, '__dict__'):
-                        product_dict = product.__dict__
-                    else:
-                        # Last resort: try to convert to a dictionary or create an empty one
-                        try:
-                            product_dict = dict(product)
-                        except:
-                            print(f"Warning: Could not convert {type(product)} to dictionary. Using empty dict.")
-                            product_dict = {}
-                # Add metadata to indicate this product was found via JAN code
-                if jan_code:
-                    if not product_dict.get('additional_info'):
-                        product_dict['additional_info'] = {}
-                    product_dict['additional_info']['searched_by_jan'] = True
-                    product_dict['additional_info']['jan_code'] = jan_code
-                serializable_products.append(product_dict)
+        serializable_products = _serialize_products(detailed_products, jan_code)
         
         # Return the results
-        return jsonify({
+        return ojson({
             'query': product_info,
             'keywords': keywords,
             'jan_code': jan_code,
@@ -1392,31 +1674,95 @@ def search_product():
         })
         
     except Exception as e:
-        print(f"Error in product search: {e}")
-        return jsonify({"error": str(e)}), 500
+        logger.exception("Error in product search")
+        return ojson({"error": str(e)}, 500)
 
 @app.route('/api/get-jan-code', methods=['POST'])
 def get_jan_code():
     """Get JAN code for a model number using Perplexity AI"""
     try:
-        data = request.json
+        data = _json_body()
         model_number = data.get('model_number', '')
         
         if not model_number:
-            return jsonify({"error": "Model number is required"}), 400
+            return ojson_bytes(_ERR_MODEL_NUMBER_REQUIRED, 400)
         
-        # Get JAN code from Perplexity AI
-        jan_code = perplexity_client.get_jan_code(model_number)
+        # Get JAN code from Perplexity AI (cached per model number)
+        jan_code, cache_hit = _lookup_jan_code(model_number)
         
         # Return the JAN code
-        return jsonify({
+        response = ojson({
             'model_number': model_number,
             'jan_code': jan_code
         })
+        response.headers['X-Cache'] = 'HIT' if cache_hit else 'MISS'
+        return response
         
     except Exception as e:
-        print(f"Error getting JAN code: {e}")
-        return jsonify({"error": str(e)}), 500
+        logger.exception("Error getting JAN code")
+        return ojson({"error": str(e)}, 500)
+
+# 画像解析結果を Perplexity に渡すプロンプト（固定部分を先頭に置き、プロンプトキャッシュが効くようにする）
+_IMAGE_PROMPT_TEMPLATE = """
+I have scanned a product image and need to identify it properly.
+
+Look carefully at the image. If you see:
+- A laptop or notebook computer, identify the brand (HP, Dell, Lenovo, etc.), model series, and specific model if visible
+- Any visible operating system logos like Windows or macOS
+- Screen size, color, and distinctive features
+- Text on the device or packaging that indicates specifications
+
+Based on this detailed analysis, please identify:
+1. The exact product name in Japanese (be specific - e.g. "HP Pavilion ノートパソコン" instead of just "ノートパソコン")
+2. The model number or series
+3. The JAN code (Japanese barcode)
+
+Reply in this exact JSON format with detailed and specific information:
+{{
+    "product_name": "Detailed product name in Japanese",
+    "model_number": "The model number or series",
+    "jan_code": "The JAN code (or 'unknown' if not found)",
+    "additional_keywords": ["laptop", "notebook", "computer", "brand name", "operating system"]
+}}
+
+Never return generic terms like '商品' or 'パソコン' alone. Always be as specific as possible about the exact product shown.
+
+Here's what I found:
+
+Detected Potential Model Numbers: {models}
+Detected Product Category: {category}
+"""
+
+def _analyze_with_perplexity(text_results, content_results):
+    """
+    Vision API の解析結果から Perplexity で商品名・型番・JANコードを推定する
+    """
+    detected_models = [result.get('model_number', '') for result in text_results or []]
+    prompt = _IMAGE_PROMPT_TEMPLATE.format(
+        models=', '.join(detected_models) if detected_models else 'None',
+        category=content_results if content_results else 'Unknown'
+    )
+    
+    # Call Perplexity API
+    perplexity_response = perplexity_client.complete(prompt)
+    
+    # Parse the JSON response
+    try:
+        # The response might contain explanatory text before or after the JSON
+        json_match = _JSON_OBJECT_RE.search(perplexity_response)
+        if json_match:
+            return json_utils.loads(json_match.group(0))
+    except Exception as json_error:
+        logger.warning("Error parsing Perplexity response JSON: %s", json_error)
+        logger.debug("Raw Perplexity response: %s", perplexity_response)
+    
+    # Fallback if no JSON is found or it could not be parsed
+    return {
+        "product_name": content_results if content_results else "Unknown product",
+        "model_number": detected_models[0] if detected_models else "Unknown",
+        "jan_code": "unknown",
+        "additional_keywords": []
+    }
 
 @app.route('/api/analyze-image-with-perplexity', methods=['POST'])
 def analyze_image_with_perplexity():
@@ -1426,171 +1772,30 @@ def analyze_image_with_perplexity():
     """
     try:
         if 'image' in request.files:
-            # Handle file upload
+            # Handle file upload: view the in-memory upload instead of copying it with read()
             image_file = request.files['image']
-            image_data = image_file.read()
-            
-            # First use Google Vision API to extract text and analyze content
-            image_search_engine = ImageSearchEngine()
-            text_results = image_search_engine.extract_model_numbers(image_data=image_data)
-            content_results = image_search_engine.analyze_image_content(image_data=image_data)
-            
-            # Combine the results for Perplexity analysis
-            detected_text = []
-            detected_models = []
-            
-            if text_results:
-                for result in text_results:
-                    detected_models.append(result.get('model_number', ''))
-                    
-            # Now use Perplexity to get better product information
-            prompt = f"""
-            I have scanned a product image and need to identify it properly. Here's what I found:
-            
-            Detected Potential Model Numbers: {', '.join(detected_models) if detected_models else 'None'}
-            Detected Product Category: {content_results if content_results else 'Unknown'}
-            
-            Look carefully at the image. If you see:
-            - A laptop or notebook computer, identify the brand (HP, Dell, Lenovo, etc.), model series, and specific model if visible
-            - Any visible operating system logos like Windows or macOS
-            - Screen size, color, and distinctive features
-            - Text on the device or packaging that indicates specifications
-            
-            Based on this detailed analysis, please identify:
-            1. The exact product name in Japanese (be specific - e.g. "HP Pavilion ノートパソコン" instead of just "ノートパソコン")
-            2. The model number or series
-            3. The JAN code (Japanese barcode)
-            
-            Reply in this exact JSON format with detailed and specific information:
-            {{
-                "product_name": "Detailed product name in Japanese",
-                "model_number": "The model number or series",
-                "jan_code": "The JAN code (or 'unknown' if not found)",
-                "additional_keywords": ["laptop", "notebook", "computer", "brand name", "operating system"] 
-            }}
-            
-            Never return generic terms like '商品' or 'パソコン' alone. Always be as specific as possible about the exact product shown.
-            """
-            
-            # Call Perplexity API
-            perplexity_response = perplexity_client.complete(prompt)
-            
-            # Parse the JSON response
+            image_data = _upload_buffer(image_file)
             try:
-                # The response might contain explanatory text before or after the JSON
-                import re
-                import json
-                
-                # Try to extract JSON using regex
-                json_match = re.search(r'\{.*\}', perplexity_response, re.DOTALL)
-                if json_match:
-                    json_str = json_match.group(0)
-                    product_info = json.loads(json_str)
-                else:
-                    # Fallback if no JSON is found
-                    product_info = {
-                        "product_name": content_results if content_results else "Unknown product",
-                        "model_number": detected_models[0] if detected_models else "Unknown",
-                        "jan_code": "unknown",
-                        "additional_keywords": []
-                    }
-            except Exception as json_error:
-                print(f"Error parsing Perplexity response JSON: {json_error}")
-                print(f"Raw Perplexity response: {perplexity_response}")
-                product_info = {
-                    "product_name": content_results if content_results else "Unknown product",
-                    "model_number": detected_models[0] if detected_models else "Unknown",
-                    "jan_code": "unknown",
-                    "additional_keywords": []
-                }
-            
-            return jsonify(product_info)
-            
-        elif 'image_url' in request.json:
-            # Handle image URL
-            image_url = request.json['image_url']
-            
-            # First use Google Vision API to extract text and analyze content
-            image_search_engine = ImageSearchEngine()
-            text_results = image_search_engine.extract_model_numbers(image_url=image_url)
-            content_results = image_search_engine.analyze_image_content(image_url=image_url)
-            
-            # Combine the results for Perplexity analysis
-            detected_text = []
-            detected_models = []
-            
-            if text_results:
-                for result in text_results:
-                    detected_models.append(result.get('model_number', ''))
-                    
-            # Now use Perplexity to get better product information
-            prompt = f"""
-            I have scanned a product image and need to identify it properly. Here's what I found:
-            
-            Detected Potential Model Numbers: {', '.join(detected_models) if detected_models else 'None'}
-            Detected Product Category: {content_results if content_results else 'Unknown'}
-            
-            Look carefully at the image. If you see:
-            - A laptop or notebook computer, identify the brand (HP, Dell, Lenovo, etc.), model series, and specific model if visible
-            - Any visible operating system logos like Windows or macOS
-            - Screen size, color, and distinctive features
-            - Text on the device or packaging that indicates specifications
-            
-            Based on this detailed analysis, please identify:
-            1. The exact product name in Japanese (be specific - e.g. "HP Pavilion ノートパソコン" instead of just "ノートパソコン")
-            2. The model number or series
-            3. The JAN code (Japanese barcode)
-            
-            Reply in this exact JSON format with detailed and specific information:
-            {{
-                "product_name": "Detailed product name in Japanese",
-                "model_number": "The model number or series",
-                "jan_code": "The JAN code (or 'unknown' if not found)",
-                "additional_keywords": ["laptop", "notebook", "computer", "brand name", "operating system"] 
-            }}
-            
-            Never return generic terms like '商品' or 'パソコン' alone. Always be as specific as possible about the exact product shown.
-            """
-            
-            # Call Perplexity API
-            perplexity_response = perplexity_client.complete(prompt)
-            
-            # Parse the JSON response
-            try:
-                # The response might contain explanatory text before or after the JSON
-                import re
-                import json
-                
-                # Try to extract JSON using regex
-                json_match = re.search(r'\{.*\}', perplexity_response, re.DOTALL)
-                if json_match:
-                    json_str = json_match.group(0)
-                    product_info = json.loads(json_str)
-                else:
-                    # Fallback if no JSON is found
-                    product_info = {
-                        "product_name": content_results if content_results else "Unknown product",
-                        "model_number": detected_models[0] if detected_models else "Unknown",
-                        "jan_code": "unknown",
-                        "additional_keywords": []
-                    }
-            except Exception as json_error:
-                print(f"Error parsing Perplexity response JSON: {json_error}")
-                print(f"Raw Perplexity response: {perplexity_response}")
-                product_info = {
-                    "product_name": content_results if content_results else "Unknown product",
-                    "model_number": detected_models[0] if detected_models else "Unknown",
-                    "jan_code": "unknown",
-                    "additional_keywords": []
-                }
-            
-            return jsonify(product_info)
+                # First use Google Vision API to extract text and analyze content (one annotate request)
+                text_results, content_results = get_image_search().analyze_product_image(image_data=image_data)
+            finally:
+                # Free the upload before waiting on Perplexity
+                if isinstance(image_data, memoryview):
+                    image_data.release()
+                del image_data
+                image_file.close()
         else:
-            return jsonify({"error": "No image or image URL provided"}), 400
+            # Handle image URL
+            image_url = _json_body().get('image_url')
+            if not image_url:
+                return ojson_bytes(_ERR_NO_IMAGE, 400)
+            text_results, content_results = get_image_search().analyze_product_image(image_url=image_url)
+        
+        return ojson(_analyze_with_perplexity(text_results, content_results))
             
     except Exception as e:
-        print(f"Error analyzing image with Perplexity: {e}")
-        return jsonify({"error": str(e)}), 500
+        logger.exception("Error analyzing image with Perplexity")
+        return ojson({"error": str(e)}, 500)
 
 # ============================================
 # Listing Management API Endpoints
@@ -1603,126 +1808,154 @@ def get_listings():
         status = request.args.get('status')
         category = request.args.get('category')
         
-        listings = listing_manager.get_all_listings(status=status, category=category)
+        listing_manager = get_listing_manager()
         
-        return jsonify({
-            'success': True,
-            'listings': [listing.to_dict() for listing in listings],
-            'count': len(listings)
-        })
+        # ETag from the listings version and the filters; unchanged listings answer 304 without loading them
+        version = listing_manager.get_listings_version()
+        etag = hashlib.blake2b(f"{version}|{status}|{category}".encode('utf-8'), digest_size=16).hexdigest()
+        not_modified = _not_modified(etag)
+        if not_modified is not None:
+            return not_modified
+        
+        cached_body = listings_response_cache.get(etag)
+        if cached_body is not None:
+            response = ojson_bytes(cached_body)
+        else:
+            listings = listing_manager.get_all_listings(status=status, category=category)
+            
+            # Encode listings one at a time instead of building the full list of dicts first
+            prefix = b'{"success":true,"count":' + json_utils.dumps(len(listings)) + b',"listings":['
+            response = app.response_class(
+                _tee_to_cache(
+                    _stream_json_array(prefix, listings, convert=operator.methodcaller('to_dict')),
+                    listings_response_cache, etag
+                ),
+                mimetype='application/json'
+            )
+        response.set_etag(etag, weak=True)
+        return response
     except Exception as e:
-        print(f"Error getting listings: {e}")
-        return jsonify({"error": str(e)}), 500
+        logger.exception("Error getting listings")
+        return ojson({"error": str(e)}, 500)
 
 @app.route('/api/listings/<listing_id>', methods=['GET'])
 def get_listing(listing_id):
     """Get a specific listing by ID"""
     try:
-        listing = listing_manager.get_listing(listing_id)
+        listing = get_listing_manager().get_listing(listing_id)
         if not listing:
-            return jsonify({"error": "Listing not found"}), 404
+            return ojson({"error": "Listing not found"}, 404)
         
-        return jsonify({
+        return ojson({
             'success': True,
             'listing': listing.to_dict()
         })
     except Exception as e:
-        print(f"Error getting listing: {e}")
-        return jsonify({"error": str(e)}), 500
+        logger.exception("Error getting listing")
+        return ojson({"error": str(e)}, 500)
+
+def _float_field(data, key, default=None):
+    """
+    リクエストの数値フィールドを1回の参照で float に変換（未指定・空文字は default）
+    """
+    value = data.get(key)
+    if value is None or value == '':
+        return default
+    return float(value)
 
 @app.route('/api/listings', methods=['POST'])
 def create_listing():
     """Create a new listing"""
     try:
-        data = request.json
+        data = _json_body()
         
-        result = listing_manager.create_listing(
+        result = get_listing_manager().create_listing(
             asin=data.get('asin'),
             jp_asin=data.get('jp_asin'),
             us_asin=data.get('us_asin'),
             title=data.get('title', ''),
-            jp_price=float(data.get('jp_price', 0)),
-            us_price=float(data.get('us_price', 0)),
-            listing_price=float(data.get('listing_price', 0)),
+            jp_price=_float_field(data, 'jp_price', 0.0),
+            us_price=_float_field(data, 'us_price', 0.0),
+            listing_price=_float_field(data, 'listing_price', 0.0),
             category=data.get('category'),
             manufacturer=data.get('manufacturer'),
-            weight=float(data.get('weight', 0)) if data.get('weight') else None,
+            weight=_float_field(data, 'weight') or None,
             dimensions=data.get('dimensions'),
             source_url=data.get('source_url'),
-            minimum_profit_threshold=float(data.get('minimum_profit_threshold', 3000)),
+            minimum_profit_threshold=_float_field(data, 'minimum_profit_threshold', 3000.0),
             validate=data.get('validate', True)
         )
         
         if result['success']:
-            return jsonify(result), 201
+            return ojson(result, 201)
         else:
-            return jsonify(result), 400
+            return ojson(result, 400)
     except Exception as e:
-        print(f"Error creating listing: {e}")
-        return jsonify({"error": str(e)}), 500
+        logger.exception("Error creating listing")
+        return ojson({"error": str(e)}, 500)
 
 @app.route('/api/listings/<listing_id>', methods=['PUT'])
 def update_listing(listing_id):
     """Update a listing"""
     try:
-        data = request.json
+        data = _json_body()
         
-        result = listing_manager.update_listing(listing_id, **data)
+        result = get_listing_manager().update_listing(listing_id, **data)
         
         if result['success']:
-            return jsonify(result)
+            return ojson(result)
         else:
-            return jsonify(result), 404
+            return ojson(result, 404)
     except Exception as e:
-        print(f"Error updating listing: {e}")
-        return jsonify({"error": str(e)}), 500
+        logger.exception("Error updating listing")
+        return ojson({"error": str(e)}, 500)
 
 @app.route('/api/listings/<listing_id>', methods=['DELETE'])
 def delete_listing(listing_id):
     """Delete a listing"""
     try:
-        result = listing_manager.delete_listing(listing_id)
+        result = get_listing_manager().delete_listing(listing_id)
         
         if result['success']:
-            return jsonify(result)
+            return ojson(result)
         else:
-            return jsonify(result), 404
+            return ojson(result, 404)
     except Exception as e:
-        print(f"Error deleting listing: {e}")
-        return jsonify({"error": str(e)}), 500
+        logger.exception("Error deleting listing")
+        return ojson({"error": str(e)}, 500)
 
 @app.route('/api/listings/bulk-update', methods=['POST'])
 def bulk_update_listings():
     """Bulk update listing status"""
     try:
-        data = request.json
+        data = _json_body()
         listing_ids = data.get('listing_ids', [])
         status = data.get('status')
         
         if not listing_ids or not status:
-            return jsonify({"error": "listing_ids and status are required"}), 400
+            return ojson_bytes(_ERR_LISTING_IDS_AND_STATUS_REQUIRED, 400)
         
-        result = listing_manager.bulk_update_status(listing_ids, status)
-        return jsonify(result)
+        result = get_listing_manager().bulk_update_status(listing_ids, status)
+        return ojson(result)
     except Exception as e:
-        print(f"Error bulk updating listings: {e}")
-        return jsonify({"error": str(e)}), 500
+        logger.exception("Error bulk updating listings")
+        return ojson({"error": str(e)}, 500)
 
 @app.route('/api/listings/bulk-delete', methods=['POST'])
 def bulk_delete_listings():
     """Bulk delete listings"""
     try:
-        data = request.json
+        data = _json_body()
         listing_ids = data.get('listing_ids', [])
         
         if not listing_ids:
-            return jsonify({"error": "listing_ids are required"}), 400
+            return ojson_bytes(_ERR_LISTING_IDS_REQUIRED, 400)
         
-        result = listing_manager.bulk_delete(listing_ids)
-        return jsonify(result)
+        result = get_listing_manager().bulk_delete(listing_ids)
+        return ojson(result)
     except Exception as e:
-        print(f"Error bulk deleting listings: {e}")
-        return jsonify({"error": str(e)}), 500
+        logger.exception("Error bulk deleting listings")
+        return ojson({"error": str(e)}, 500)
 
 # ============================================
 # Profit Calculation API
@@ -1732,11 +1965,11 @@ def bulk_delete_listings():
 def calculate_profit():
     """Calculate profit for a product"""
     try:
-        data = request.json
+        data = _json_body()
         
-        result = profit_calculator.calculate_profit(
-            us_price=float(data.get('us_price', 0)),
-            jp_listing_price=float(data.get('jp_listing_price', 0)),
+        result = get_profit_calculator().calculate_profit(
+            us_price=_float_field(data, 'us_price', 0.0),
+            jp_listing_price=_float_field(data, 'jp_listing_price', 0.0),
             weight_kg=data.get('weight_kg'),
             dimensions_cm=data.get('dimensions_cm'),
             international_shipping_cost=data.get('international_shipping_cost'),
@@ -1749,13 +1982,13 @@ def calculate_profit():
             calculate_shipping=data.get('calculate_shipping', True)
         )
         
-        return jsonify({
+        return ojson({
             'success': True,
             'result': result
         })
     except Exception as e:
-        print(f"Error calculating profit: {e}")
-        return jsonify({"error": str(e)}), 500
+        logger.exception("Error calculating profit")
+        return ojson({"error": str(e)}, 500)
 
 # ============================================
 # Shipping Calculation API
@@ -1765,176 +1998,138 @@ def calculate_profit():
 def calculate_shipping():
     """Calculate international shipping cost"""
     try:
-        data = request.json
+        data = _json_body()
         
-        result = shipping_calculator.calculate_shipping(
-            weight_kg=float(data.get('weight_kg', 0)),
+        result = get_shipping_calculator().calculate_shipping(
+            weight_kg=_float_field(data, 'weight_kg', 0.0),
             dimensions_cm=data.get('dimensions_cm', {}),
             destination_country=data.get('destination_country', 'JP'),
             source_country=data.get('source_country', 'US'),
             provider=data.get('provider')
         )
         
-        return jsonify({
+        return ojson({
             'success': True,
             'result': result
         })
     except Exception as e:
-        print(f"Error calculating shipping: {e}")
-        return jsonify({"error": str(e)}), 500
+        logger.exception("Error calculating shipping")
+        return ojson({"error": str(e)}, 500)
 
 # ============================================
 # US Amazon Price Comparison API
 # ============================================
 
+# US/JP比較で使う商品のフィールド
+_PRODUCT_FIELDS = ('price', 'title', 'image_url', 'url', 'description', 'availability', 'asin')
+
+def _fetch_jp_amazon_product(asin):
+    """
+    日本のAmazonの商品情報をASIN（PA-API）または検索で取得する
+
+    Returns:
+        tuple: (商品情報の辞書, キャッシュヒットかどうか)
+    """
+    jp_amazon = dict.fromkeys(_PRODUCT_FIELDS)
+    jp_amazon['asin'] = asin
+    cache_hit = False
+    
+    # Check if asin is a valid ASIN format (10 characters)
+    if is_asin(asin):
+        # Use PA-API get_items_by_asin for direct ASIN lookup
+        logger.debug("Using PA-API to get Japan Amazon product by ASIN: %s", asin)
+        # Concurrent lookups are coalesced into PA-API GetItems requests of up to 10 ASINs
+        jp_product, cache_hit = _cached_asin_lookup('jp', asin, get_paapi_batcher().get)
+        if jp_product:
+            jp_amazon.update(
+                (field, jp_product.get(field)) for field in ('price', 'title', 'image_url', 'url', 'availability')
+            )
+            jp_amazon['asin'] = jp_product.get('asin', asin)
+            logger.debug("Found JP product via PA-API: %s - ¥%s", jp_amazon['title'], jp_amazon['price'])
+            return jp_amazon, cache_hit
+        
+        # Fallback to search_items if get_items_by_asin fails
+        logger.warning("PA-API get_items_by_asin failed for %s, trying search_items", asin)
+        jp_products = amazon_api.search_items(asin, limit=1, use_paapi_for_asin=True)
+    else:
+        # Not a valid ASIN format, use search
+        logger.debug("Not a valid ASIN format, using search_items: %s", asin)
+        jp_products = amazon_api.search_items(asin, limit=1)
+    
+    if jp_products:
+        jp_product = _product_to_dict(jp_products[0])
+        jp_amazon.update((field, jp_product.get(field)) for field in _PRODUCT_FIELDS if field != 'asin')
+    
+    return jp_amazon, cache_hit
+
 @app.route('/api/compare/us-jp', methods=['POST'])
 def compare_us_jp_prices():
     """Compare prices between US and Japan Amazon"""
     try:
-        data = request.json
+        data = _json_body()
         asin = data.get('asin')
         us_asin = data.get('us_asin')
         
         if not asin:
-            return jsonify({"error": "ASIN is required"}), 400
-        
-        # Get Japan Amazon price using PA-API
-        # Check if asin is a valid ASIN format (10 characters)
-        jp_price = None
-        jp_title = None
-        jp_image_url = None
-        jp_url = None
-        jp_description = None
-        jp_availability = None
-        jp_product_asin = asin
-        
-        if len(asin) == 10 and asin.isalnum():
-            # Use PA-API get_items_by_asin for direct ASIN lookup
-            print(f"Using PA-API to get Japan Amazon product by ASIN: {asin}")
-            jp_product = amazon_api.get_items_by_asin(asin)
-            if jp_product:
-                jp_price = jp_product.get('price')
-                jp_title = jp_product.get('title')
-                jp_image_url = jp_product.get('image_url')
-                jp_url = jp_product.get('url')
-                jp_availability = jp_product.get('availability')
-                jp_product_asin = jp_product.get('asin', asin)
-                print(f"Found JP product via PA-API: {jp_title} - ¥{jp_price}")
-            else:
-                # Fallback to search_items if get_items_by_asin fails
-                print(f"PA-API get_items_by_asin failed, trying search_items")
-                jp_products = amazon_api.search_items(asin, limit=1, use_paapi_for_asin=True)
-                if jp_products:
-                    product = jp_products[0]
-                    if hasattr(product, 'to_dict'):
-                        product_dict = product.to_dict()
-                        jp_price = product_dict.get('price')
-                        jp_title = product_dict.get('title')
-                        jp_image_url = product_dict.get('image_url')
-                        jp_url = product_dict.get('url')
-                        jp_description = product_dict.get('description')
-                        jp_availability = product_dict.get('availability')
-                    elif isinstance(product, dict):
-                        jp_price = product.get('price')
-                        jp_title = product.get('title')
-                        jp_image_url = product.get('image_url')
-                        jp_url = product.get('url')
-                        jp_description = product.get('description')
-                        jp_availability = product.get('availability')
-                    else:
-                        jp_price = getattr(product, 'price', None)
-                        jp_title = getattr(product, 'title', None)
-                        jp_image_url = getattr(product, 'image_url', None)
-                        jp_url = getattr(product, 'url', None)
-                        jp_description = getattr(product, 'description', None)
-                        jp_availability = getattr(product, 'availability', None)
-        else:
-            # Not a valid ASIN format, use search
-            print(f"Not a valid ASIN format, using search_items")
-            jp_products = amazon_api.search_items(asin, limit=1)
-            if jp_products:
-                product = jp_products[0]
-                if hasattr(product, 'to_dict'):
-                    product_dict = product.to_dict()
-                    jp_price = product_dict.get('price')
-                    jp_title = product_dict.get('title')
-                    jp_image_url = product_dict.get('image_url')
-                    jp_url = product_dict.get('url')
-                    jp_description = product_dict.get('description')
-                    jp_availability = product_dict.get('availability')
-                elif isinstance(product, dict):
-                    jp_price = product.get('price')
-                    jp_title = product.get('title')
-                    jp_image_url = product.get('image_url')
-                    jp_url = product.get('url')
-                    jp_description = product.get('description')
-                    jp_availability = product.get('availability')
-                else:
-                    jp_price = getattr(product, 'price', None)
-                    jp_title = getattr(product, 'title', None)
-                    jp_image_url = getattr(product, 'image_url', None)
-                    jp_url = getattr(product, 'url', None)
-                    jp_description = getattr(product, 'description', None)
-                    jp_availability = getattr(product, 'availability', None)
+            return ojson_bytes(_ERR_ASIN_REQUIRED, 400)
         
-        # Get US Amazon price
+        # Get Japan and US Amazon products concurrently (independent network calls)
         us_asin_to_check = us_asin or asin
-        us_price = None
-        us_title = None
-        us_image_url = None
-        us_url = None
-        us_description = None
-        us_availability = None
-        us_product_asin = us_asin_to_check
+        us_future = search_executor.submit(
+            _cached_asin_lookup, 'us', us_asin_to_check, us_amazon_api.get_product_by_asin
+        )
+        jp_amazon, cache_hit = _fetch_jp_amazon_product(asin)
         
+        # Get US Amazon price
         # Try to use PA-API for US Amazon if we have US credentials configured
         # For now, use the existing method (which may use scraping)
-        print(f"Getting US Amazon product by ASIN: {us_asin_to_check}")
-        us_product = us_amazon_api.get_product_by_asin(us_asin_to_check)
+        logger.debug("Getting US Amazon product by ASIN: %s", us_asin_to_check)
+        us_product, us_cache_hit = us_future.result()
+        # Whether every upstream lookup was served from paapi_item_cache
+        cache_hit = cache_hit and us_cache_hit
+        us_product_dict = _product_to_dict(us_product) if us_product else {}
+        us_amazon = {field: us_product_dict.get(field) for field in _PRODUCT_FIELDS}
+        us_amazon['asin'] = us_amazon['asin'] or us_asin_to_check
+        us_price = us_amazon['price']
         if us_product:
-            us_price = us_product.price if us_product else None
-            us_title = us_product.title if us_product else None
-            us_image_url = us_product.image_url if hasattr(us_product, 'image_url') else None
-            us_url = us_product.url if hasattr(us_product, 'url') else None
-            us_description = us_product.description if hasattr(us_product, 'description') else None
-            us_availability = us_product.availability if hasattr(us_product, 'availability') else None
-            us_product_asin = us_product.asin if hasattr(us_product, 'asin') and us_product.asin else us_asin_to_check
-            print(f"Found US product: {us_title} - ${us_price}")
+            logger.debug("Found US product: %s - $%s", us_amazon['title'], us_price)
         
         # Get exchange rate (default to 150.0 if not provided)
-        exchange_rate = float(data.get('exchange_rate', 150.0))
+        exchange_rate = _float_field(data, 'exchange_rate', 150.0)
+        
+        # Convert US price to JPY once (used for the difference and the response)
+        us_price_jpy = us_price * exchange_rate if us_price else None
         
         # Calculate price difference
         price_difference = None
         price_difference_percent = None
-        if jp_price and us_price:
-            # Convert US price to JPY
-            us_price_jpy = us_price * exchange_rate
+        jp_price = jp_amazon['price']
+        if jp_price and us_price_jpy:
             price_difference = jp_price - us_price_jpy
             price_difference_percent = (price_difference / us_price_jpy * 100) if us_price_jpy > 0 else 0
         
-        return jsonify({
+        response = ojson({
             'success': True,
             'jp_amazon': {
-                'asin': jp_product_asin,
-                'title': jp_title,
+                'asin': jp_amazon['asin'],
+                'title': jp_amazon['title'],
                 'price': jp_price,
                 'price_currency': 'JPY',
-                'image_url': jp_image_url,
-                'url': jp_url,
-                'description': jp_description,
-                'availability': jp_availability
+                'image_url': jp_amazon['image_url'],
+                'url': jp_amazon['url'],
+                'description': jp_amazon['description'],
+                'availability': jp_amazon['availability']
             },
             'us_amazon': {
-                'asin': us_product_asin,
-                'title': us_title,
+                'asin': us_amazon['asin'],
+                'title': us_amazon['title'],
                 'price': us_price,
                 'price_currency': 'USD',
-                'price_jpy': us_price * exchange_rate if us_price else None,
-                'image_url': us_image_url,
-                'url': us_url,
-                'description': us_description,
-                'availability': us_availability
+                'price_jpy': us_price_jpy,
+                'image_url': us_amazon['image_url'],
+                'url': us_amazon['url'],
+                'description': us_amazon['description'],
+                'availability': us_amazon['availability']
             },
             'price_difference': {
                 'amount_jpy': price_difference,
@@ -1942,14 +2137,26 @@ def compare_us_jp_prices():
                 'exchange_rate_used': exchange_rate
             }
         })
+        response.headers['X-Cache'] = 'HIT' if cache_hit else 'MISS'
+        return response
     except Exception as e:
-        print(f"Error comparing US-JP prices: {e}")
-        return jsonify({"error": str(e)}), 500
+        logger.exception("Error comparing US-JP prices")
+        return ojson({"error": str(e)}, 500)
 
 # ============================================
 # Amazon PA-API GetItems Endpoint
 # ============================================
 
+# GetItems のデフォルト値（リクエストごとに作らない）
+_DEFAULT_GET_ITEMS_RESOURCES = (
+    "Images.Primary.Small",
+    "ItemInfo.Title",
+    "ItemInfo.Features",
+    "Offers.Summaries.HighestPrice",
+    "ParentASIN",
+)
+_DEFAULT_LANGS = ("en_US",)
+
 @app.route('/api/amazon/get-items', methods=['POST'])
 def get_amazon_items():
     """
@@ -1973,33 +2180,27 @@ def get_amazon_items():
     }
     """
     try:
-        data = request.json
+        data = _json_body()
         
         if not data:
-            return jsonify({"error": "Request body is required"}), 400
+            return ojson_bytes(_ERR_REQUEST_BODY_REQUIRED, 400)
         
         # Validate required fields
         if "ItemIds" not in data:
-            return jsonify({"error": "ItemIds is required"}), 400
+            return ojson_bytes(_ERR_ITEM_IDS_REQUIRED, 400)
         
         if not data.get("ItemIds"):
-            return jsonify({"error": "ItemIds cannot be empty"}), 400
+            return ojson_bytes(_ERR_ITEM_IDS_EMPTY, 400)
         
         # Use default values if not provided
         request_data = {
             "ItemIds": data.get("ItemIds", []),
             "ItemIdType": data.get("ItemIdType", "ASIN"),
-            "LanguagesOfPreference": data.get("LanguagesOfPreference", ["en_US"]),
+            "LanguagesOfPreference": data.get("LanguagesOfPreference", _DEFAULT_LANGS),
             "Marketplace": data.get("Marketplace", "www.amazon.com"),
-            "PartnerTag": data.get("PartnerTag", amazon_partner_tag),
+            "PartnerTag": data.get("PartnerTag", AMAZON_PARTNER_TAG),
             "PartnerType": data.get("PartnerType", "Associates"),
-            "Resources": data.get("Resources", [
-                "Images.Primary.Small",
-                "ItemInfo.Title",
-                "ItemInfo.Features",
-                "Offers.Summaries.HighestPrice",
-                "ParentASIN"
-            ])
+            "Resources": data.get("Resources", _DEFAULT_GET_ITEMS_RESOURCES)
         }
         
         # Call the get_items_by_request method
@@ -2007,18 +2208,16 @@ def get_amazon_items():
         
         # Check if there's an error in the result
         if "error" in result:
-            return jsonify(result), 400
+            return ojson(result, 400)
         
-        return jsonify({
+        return ojson({
             "success": True,
             **result
         })
         
     except Exception as e:
-        print(f"Error in get_amazon_items endpoint: {e}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({"error": str(e)}), 500
+        logger.exception("Error in get_amazon_items endpoint")
+        return ojson({"error": str(e)}, 500)
 
 # ============================================
 # Stock Monitoring API
@@ -2028,40 +2227,40 @@ def get_amazon_items():
 def check_listing_stock(listing_id):
     """Manually check stock for a specific listing"""
     try:
-        result = stock_monitor.check_listing(listing_id)
-        return jsonify(result)
+        result = get_stock_monitor().check_listing(listing_id)
+        return ojson(result)
     except Exception as e:
-        print(f"Error checking listing stock: {e}")
-        return jsonify({"error": str(e)}), 500
+        logger.exception("Error checking listing stock")
+        return ojson({"error": str(e)}, 500)
 
 @app.route('/api/monitor/check-all', methods=['POST'])
 def check_all_listings_stock():
     """Manually trigger check for all active listings"""
     try:
-        result = stock_monitor.check_all_listings()
-        return jsonify({
+        result = get_stock_monitor().check_all_listings()
+        return ojson({
             'success': True,
             'result': result
         })
     except Exception as e:
-        print(f"Error checking all listings: {e}")
-        return jsonify({"error": str(e)}), 500
+        logger.exception("Error checking all listings")
+        return ojson({"error": str(e)}, 500)
 
 @app.route('/api/monitor/status', methods=['GET'])
 def get_monitor_status():
     """Get stock monitoring status"""
     try:
-        return jsonify({
+        return ojson({
             'success': True,
-            'monitoring': stock_monitor.monitoring,
-            'check_interval_hours': stock_monitor.check_interval_hours,
-            'auto_stop_on_out_of_stock': stock_monitor.auto_stop_on_out_of_stock,
-            'auto_update_prices': stock_monitor.auto_update_prices,
-            'auto_stop_low_profit': stock_monitor.auto_stop_low_profit
+            'monitoring': get_stock_monitor().monitoring,
+            'check_interval_hours': get_stock_monitor().check_interval_hours,
+            'auto_stop_on_out_of_stock': get_stock_monitor().auto_stop_on_out_of_stock,
+            'auto_update_prices': get_stock_monitor().auto_update_prices,
+            'auto_stop_low_profit': get_stock_monitor().auto_stop_low_profit
         })
     except Exception as e:
-        print(f"Error getting monitor status: {e}")
-        return jsonify({"error": str(e)}), 500
+        logger.exception("Error getting monitor status")
+        return ojson({"error": str(e)}, 500)
 
 # ============================================
 # Blacklist Management API
@@ -2071,9 +2270,9 @@ def get_monitor_status():
 def check_blacklist():
     """Check if a product is blacklisted"""
     try:
-        data = request.json
+        data = _json_body()
         
-        result = listing_manager.blacklist_manager.check_product(
+        result = get_listing_manager().blacklist_manager.check_product(
             asin=data.get('asin', ''),
             title=data.get('title', ''),
             manufacturer=data.get('manufacturer', ''),
@@ -2081,70 +2280,83 @@ def check_blacklist():
             brand=data.get('brand', '')
         )
         
-        return jsonify({
+        return ojson({
             'success': True,
             'result': result
         })
     except Exception as e:
-        print(f"Error checking blacklist: {e}")
-        return jsonify({"error": str(e)}), 500
+        logger.exception("Error checking blacklist")
+        return ojson({"error": str(e)}, 500)
 
 @app.route('/api/blacklist', methods=['GET'])
 def get_blacklist():
     """Get all blacklist entries"""
     try:
-        entries = listing_manager.blacklist_manager.get_all_entries()
-        return jsonify({
-            'success': True,
-            'entries': entries,
-            'count': len(entries)
-        })
+        blacklist_manager = get_listing_manager().blacklist_manager
+        
+        # Unchanged blacklist answers 304, or reuses the body serialized for this version
+        etag = hashlib.blake2b(blacklist_manager.get_entries_version().encode('utf-8'), digest_size=16).hexdigest()
+        not_modified = _not_modified(etag)
+        if not_modified is not None:
+            return not_modified
+        
+        body = blacklist_response_cache.get(etag)
+        if body is None:
+            entries = blacklist_manager.get_all_entries()
+            body = json_utils.dumps({
+                'success': True,
+                'entries': entries,
+                'count': len(entries)
+            })
+            blacklist_response_cache.set(etag, body)
+        
+        response = ojson_bytes(body)
+        response.set_etag(etag, weak=True)
+        return response
     except Exception as e:
-        print(f"Error getting blacklist: {e}")
-        return jsonify({"error": str(e)}), 500
+        logger.exception("Error getting blacklist")
+        return ojson({"error": str(e)}, 500)
 
 @app.route('/api/blacklist', methods=['POST'])
 def add_blacklist_entry():
     """Add a blacklist entry"""
     try:
-        data = request.json or {}
+        data = _json_body()
         entry_type = data.get('type')
         value = data.get('value')
         reason = data.get('reason', '')
         severity = data.get('severity', 'high')
 
         if not entry_type or not value:
-            return jsonify({"error": "type and value are required"}), 400
+            return ojson({"error": "type and value are required"}, 400)
 
-        entry = listing_manager.blacklist_manager.create_entry(
+        entry = get_listing_manager().blacklist_manager.create_entry(
             entry_type=entry_type,
             value=value,
             reason=reason,
             severity=severity,
             auto_detected=False
         )
-        listing_manager.blacklist_manager.persist()
 
-        return jsonify({
+        return ojson({
             'success': True,
             'entry': entry.to_dict()
-        }), 201
+        }, 201)
     except ValueError as e:
-        return jsonify({"error": str(e)}), 400
+        return ojson({"error": str(e)}, 400)
     except Exception as e:
-        print(f"Error adding blacklist entry: {e}")
-        return jsonify({"error": str(e)}), 500
+        logger.exception("Error adding blacklist entry")
+        return ojson({"error": str(e)}, 500)
 
 @app.route('/api/blacklist/<entry_id>', methods=['DELETE'])
 def delete_blacklist_entry(entry_id):
     """Delete a blacklist entry"""
     try:
-        removed = listing_manager.blacklist_manager.remove_entry(entry_id)
+        removed = get_listing_manager().blacklist_manager.remove_entry(entry_id)
         if not removed:
-            return jsonify({"error": "Entry not found"}), 404
+            return ojson({"error": "Entry not found"}, 404)
 
-        listing_manager.blacklist_manager.persist()
-        return jsonify({'success': True})
+        return ojson({'success': True})
     except Exception as e:
-        print(f"Error deleting blacklist entry: {e}")
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        logger.exception("Error deleting blacklist entry")
+        return ojson({"error": str(e)}, 500)
\ No newline at end of file
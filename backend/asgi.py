@@ -0,0 +1,19 @@
+"""
+ASGI entrypoint
+
+uvicorn asgi:asgi_app --workers 4 --loop uvloop --http httptools
+
+The Flask handlers are synchronous, so each request runs on a thread from
+a2wsgi's pool (WSGI_THREADS, default 32); requests in one worker are served
+concurrently instead of one at a time.
+"""
+import os
+
+from a2wsgi import WSGIMiddleware
+
+from app import app
+
+WSGI_THREADS = int(os.getenv('WSGI_THREADS', '32'))
+
+# Flask のハンドラはそのまま、スレッドプール上で ASGI サーバー (uvicorn) から呼び出す
+asgi_app = WSGIMiddleware(app, workers=WSGI_THREADS)
@@ -25,9 +25,21 @@ import os
 import re
 import sys
 import json
+import time
+import hashlib
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from src.tools.batch_keyword_generator import BatchKeywordGenerator
 from src.api.amazon_api import AmazonAPI
+from src.utils import json_utils
+from src.utils.helpers import keyword_product_info
+
+# Maximum number of concurrent Amazon lookups (search_items is blocking I/O)
+LOOKUP_MAX_WORKERS = int(os.getenv('BATCH_SEARCH_MAX_WORKERS', '20'))
+
+# Amazon search results are kept on disk so repeated runs skip the lookup
+SEARCH_CACHE_DIR = os.path.join("cache", "amazon_search")
+SEARCH_CACHE_TTL = 86400  # 24 hours
 
 def parse_arguments():
     parser = argparse.ArgumentParser(description='Batch Keyword Generator for Product Model Numbers')
@@ -50,7 +62,8 @@ def read_model_numbers(file_path):
     """Read model numbers from a file"""
     try:
         with open(file_path, 'r', encoding='utf-8') as f:
-            return [line.strip() for line in f if line.strip()]
+            # Read once and strip each line a single time
+            return [line for line in map(str.strip, f.read().splitlines()) if line]
     except Exception as e:
         print(f"Error reading input file: {e}")
         sys.exit(1)
@@ -64,6 +77,63 @@ def read_custom_prompt(file_path):
         print(f"Error reading custom prompt file: {e}")
         sys.exit(1)
 
+def _search_cache_file(model_number):
+    """Path of the cached Amazon search result for a model number"""
+    # hashlib (not hash()) so the file name is stable across runs
+    digest = hashlib.blake2b(model_number.encode('utf-8'), digest_size=16).hexdigest()
+    return os.path.join(SEARCH_CACHE_DIR, f"{digest}.json")
+
+def read_cached_product_info(model_number):
+    """Return the cached product info for a model number if it is still fresh, otherwise None"""
+    cache_file = _search_cache_file(model_number)
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Error reading cache: {e}")
+        return None
+    if time.time() - cached.get('timestamp', 0) >= SEARCH_CACHE_TTL:
+        return None
+    return cached.get('product')
+
+def write_cached_product_info(model_number, product_details):
+    """Save product info for a model number to the disk cache"""
+    try:
+        os.makedirs(SEARCH_CACHE_DIR, exist_ok=True)
+        with open(_search_cache_file(model_number), 'w', encoding='utf-8') as f:
+            json.dump({"product": product_details, "timestamp": time.time()}, f, ensure_ascii=False)
+    except Exception as e:
+        print(f"Error writing cache: {e}")
+
+def fetch_product_info(amazon_api, model_number):
+    """Fetch product title, features and description for a model number from Amazon"""
+    cached = read_cached_product_info(model_number)
+    if cached is not None:
+        print(f"Using cached product info for {model_number}")
+        return cached
+    
+    print(f"Fetching product info for {model_number}...")
+    try:
+        # Search for products using the model number
+        product_info = amazon_api.search_items(model_number, limit=5)
+        if not product_info:
+            # If no product info found, just use the model number
+            print(f"No product info found for {model_number}")
+            return {"model_number": model_number}
+        
+        print(f"Found {len(product_info)} products on Amazon for model number: {model_number}")
+        # Extract relevant product information (ProductDetail or dictionary)
+        product_details = keyword_product_info(model_number, product_info[0])
+        print(f"Found product info for {model_number}")
+        write_cached_product_info(model_number, product_details)
+        return product_details
+    except Exception as e:
+        print(f"Error fetching product info for {model_number}: {str(e)}")
+        # If error, just use the model number
+        return {"model_number": model_number}
+
 def main():
     """
     Main function to run the batch keyword generator from command line
@@ -89,83 +159,55 @@ def main():
     print(f"Processing {len(model_numbers)} model numbers...")
     
     # Initialize the batch keyword generator
-    generator = BatchKeywordGenerator()
+    try:
+        generator = BatchKeywordGenerator()
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
     
     # Clean model numbers
-    cleaned_model_numbers = []
-    for model_number in model_numbers:
-        cleaned = generator.clean_model_number(model_number)
-        if cleaned:
-            cleaned_model_numbers.append(cleaned)
+    cleaned_model_numbers = [cleaned for cleaned in map(generator.clean_model_number, model_numbers) if cleaned]
             
     if not cleaned_model_numbers:
         print("Error: No valid model numbers found after cleaning")
         sys.exit(1)
         
+    # Drop duplicates (including inputs that clean to the same model number), keeping the first occurrence
+    cleaned_count = len(cleaned_model_numbers)
+    cleaned_model_numbers = list(dict.fromkeys(cleaned_model_numbers))
+    
     print(f"Found {len(cleaned_model_numbers)} valid model numbers after cleaning")
+    if len(cleaned_model_numbers) < cleaned_count:
+        print(f"Skipped {cleaned_count - len(cleaned_model_numbers)} duplicate model numbers")
     
     # First, try to fetch product information for each model number
-    product_info_list = []
     amazon_api = AmazonAPI()
     
-    for model_number in cleaned_model_numbers:
-        print(f"Fetching product info for {model_number}...")
-        try:
-            # Search for products using the model number
-            product_info = amazon_api.search_items(model_number, limit=5)
-            if product_info:
-                print(f"Found {len(product_info)} products on Amazon for model number: {model_number}")
-                # Extract relevant product information
-                if product_info and len(product_info) > 0:
-                    product = product_info[0]
-                    # Check if product is a ProductDetail object
-                    if hasattr(product, 'title'):
-                        product_details = {
-                            "model_number": model_number,
-                            "title": product.title,
-                            "features": getattr(product, 'features', []),
-                            "description": getattr(product, 'description', '')
-                        }
-                    else:
-                        # Handle dictionary format
-                        product_details = {
-                            "model_number": model_number,
-                            "title": product.get('title', ''),
-                            "features": product.get('features', []),
-                            "description": product.get('description', '')
-                        }
-                    product_info_list.append(product_details)
-                    print(f"Found product info for {model_number}")
-                else:
-                    # If no product info found, just use the model number
-                    product_info_list.append({"model_number": model_number})
-                    print(f"No product info found for {model_number}")
-            else:
-                # If no product info found, just use the model number
-                product_info_list.append({"model_number": model_number})
-                print(f"No product info found for {model_number}")
-        except Exception as e:
-            print(f"Error fetching product info for {model_number}: {str(e)}")
-            # If error, just use the model number
-            product_info_list.append({"model_number": model_number})
+    # Lookups are network-bound, so run them concurrently (map keeps the input order)
+    with ThreadPoolExecutor(max_workers=LOOKUP_MAX_WORKERS) as executor:
+        product_info_list = list(executor.map(
+            lambda model_number: fetch_product_info(amazon_api, model_number),
+            cleaned_model_numbers
+        ))
     
-    # Generate keywords based on the product information
+    # Generate keywords based on the product information, writing each result as it arrives
     print("Generating keywords...")
-    results = generator.batch_generate(product_info_list, custom_prompt)
-    
-    # Print results to console
     print("\n=== Generated Keywords ===")
-    for result in results:
-        print(f"Model: {result['model_number']}")
-        print(f"Keyword: {result['keyword']}")
-        print("---")
-    
-    # Write results to output file
     try:
-        with open(args.output, 'w', encoding='utf-8') as f:
-            json.dump(results, f, ensure_ascii=False, indent=2)
+        with open(args.output, 'wb') as f:
+            f.write(b'[')
+            for index, result in enumerate(generator.iter_bulk_generate(product_info_list, custom_prompt, k=10)):
+                # Print results to console
+                print(f"Model: {result['model_number']}")
+                print(f"Keyword: {result['keyword']}")
+                print("---")
+                
+                f.write(b',\n' if index else b'\n')
+                f.write(json_utils.dumps(result, indent=True))
+                f.flush()
+            f.write(b'\n]\n')
         print(f"\nResults written to {args.output}")
-    except Exception as e:
+    except OSError as e:
         print(f"Error writing output file: {e}")
         sys.exit(1)
 
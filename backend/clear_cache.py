@@ -1,9 +1,32 @@
 import os
-import json
 import time
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+# File types handled by the cleanup and number of worker threads
+CACHE_FILE_SUFFIXES = (".json", ".pkl")
+CLEANUP_MAX_WORKERS = 16
+
+def _remove_if_expired(entry, current_time, max_age_seconds):
+    """
+    Delete one cache file if it is too old
+    
+    Returns:
+        int: Size of the deleted file, or None if it was kept
+    """
+    try:
+        st = entry.stat()
+        # Every cache writer stores its 'timestamp' at write time, so the file's mtime is
+        # never older than the timestamp inside it; mtime alone decides expiry
+        if current_time - st.st_mtime > max_age_seconds:
+            os.remove(entry.path)
+            print(f"Deleted old cache file: {entry.path}")
+            return st.st_size
+    except Exception as e:
+        print(f"Error processing cache file {entry.path}: {e}")
+    return None
+
 def clear_old_cache(max_age_days=7):
     """
     Clear cache files older than max_age_days
@@ -20,78 +43,38 @@ def clear_old_cache(max_age_days=7):
     # Cache directories to check
     cache_dirs = [
         Path("cache"),
-        Path("cache/amazon")
+        Path("cache/amazon"),
+        Path("cache/amazon_search")
     ]
     
     # Create directories if they don't exist
     for cache_dir in cache_dirs:
         cache_dir.mkdir(parents=True, exist_ok=True)
     
-    # Track statistics
-    total_files = 0
-    deleted_files = 0
-    freed_space = 0
-    
-    # Process each cache directory
+    # Collect cache files with one directory read per directory (DirEntry.stat() reuses the scan)
+    entries = []
     for cache_dir in cache_dirs:
         if not cache_dir.exists():
             continue
             
         print(f"Processing cache directory: {cache_dir}")
-        
-        # Process JSON cache files
-        for cache_file in cache_dir.glob("*.json"):
-            total_files += 1
-            
-            try:
-                # Check file modification time
-                file_mtime = os.path.getmtime(cache_file)
-                file_age = current_time - file_mtime
-                
-                # If file is older than max_age_days, delete it
-                if file_age > max_age_seconds:
-                    file_size = os.path.getsize(cache_file)
-                    os.remove(cache_file)
-                    deleted_files += 1
-                    freed_space += file_size
-                    print(f"Deleted old cache file: {cache_file}")
-                else:
-                    # Check if the file contains a timestamp
-                    try:
-                        with open(cache_file, 'r', encoding='utf-8') as f:
-                            data = json.load(f)
-                            if 'timestamp' in data:
-                                cache_time = data.get('timestamp', 0)
-                                if current_time - cache_time > max_age_seconds:
-                                    file_size = os.path.getsize(cache_file)
-                                    os.remove(cache_file)
-                                    deleted_files += 1
-                                    freed_space += file_size
-                                    print(f"Deleted old cache file based on timestamp: {cache_file}")
-                    except:
-                        # If we can't read the file as JSON, skip it
-                        pass
-            except Exception as e:
-                print(f"Error processing cache file {cache_file}: {e}")
-        
-        # Process pickle files
-        for cache_file in cache_dir.glob("*.pkl"):
-            total_files += 1
-            
-            try:
-                # Check file modification time
-                file_mtime = os.path.getmtime(cache_file)
-                file_age = current_time - file_mtime
-                
-                # If file is older than max_age_days, delete it
-                if file_age > max_age_seconds:
-                    file_size = os.path.getsize(cache_file)
-                    os.remove(cache_file)
-                    deleted_files += 1
-                    freed_space += file_size
-                    print(f"Deleted old cache file: {cache_file}")
-            except Exception as e:
-                print(f"Error processing cache file {cache_file}: {e}")
+        with os.scandir(cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith(CACHE_FILE_SUFFIXES) and entry.is_file():
+                    entries.append(entry)
+    
+    # Check and delete files concurrently (the work is per-file I/O)
+    with ThreadPoolExecutor(max_workers=CLEANUP_MAX_WORKERS) as executor:
+        freed_sizes = list(executor.map(
+            lambda entry: _remove_if_expired(entry, current_time, max_age_seconds),
+            entries
+        ))
+    
+    # Track statistics
+    total_files = len(entries)
+    deleted_sizes = [size for size in freed_sizes if size is not None]
+    deleted_files = len(deleted_sizes)
+    freed_space = sum(deleted_sizes)
     
     # Print summary
     print(f"Cache cleanup complete:")
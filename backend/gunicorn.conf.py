@@ -0,0 +1,36 @@
+"""
+Gunicorn configuration
+
+gunicorn -c gunicorn.conf.py
+
+GUNICORN_WORKER_CLASS=gevent (default) serves the WSGI app with gevent workers;
+gunicorn monkey-patches the worker before loading the app, so the requests-based
+API clients yield while waiting on the network and each worker handles up to
+GUNICORN_WORKER_CONNECTIONS requests at once.
+GUNICORN_WORKER_CLASS=uvicorn serves the ASGI app (asgi.py) with uvicorn workers;
+requests run on that app's thread pool (WSGI_THREADS).
+
+One worker by default (same as run.py): batch search status, progress counters
+and the response/ETag caches live in process memory, so with several workers a
+status poll can land on a worker that never saw the batch. Each worker is already
+concurrent (gevent or the thread pool); only raise WEB_CONCURRENCY once that state
+is moved to shared storage.
+"""
+import os
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', '1'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+
+if os.getenv('GUNICORN_WORKER_CLASS', 'gevent') == 'uvicorn':
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    wsgi_app = 'asgi:asgi_app'
+else:
+    worker_class = 'gevent'
+    worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '1000'))
+    wsgi_app = 'app:app'
+
+def post_worker_init(worker):
+    # Each worker tries to start the stock monitor; the file lock lets only one run it
+    from app import start_stock_monitor
+    start_stock_monitor()
@@ -1,4 +1,15 @@
-from app import app
+import os
+
+import uvicorn
 
 if __name__ == '__main__':
-    app.run(debug=False, host='0.0.0.0', port=5000) 
\ No newline at end of file
+    from app import start_stock_monitor
+    start_stock_monitor()
+    uvicorn.run(
+        'asgi:asgi_app',
+        host=os.getenv('HOST', '0.0.0.0'),
+        port=int(os.getenv('PORT', '5000')),
+        workers=int(os.getenv('WEB_CONCURRENCY', '1')),
+        loop=os.getenv('UVICORN_LOOP', 'auto'),
+        http=os.getenv('UVICORN_HTTP', 'auto'),
+    )
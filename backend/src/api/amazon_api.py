@@ -1,7 +1,12 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry, make_headers
 import urllib.parse
 import hashlib
 from src.models.product import ProductDetail
+from src.api.rate_limiter import TokenBucket
+from src.utils import json_utils
+from src.utils.helpers import is_asin
 import json
 import time
 from datetime import datetime
@@ -16,6 +21,11 @@ import logging
 import re
 import pickle
 import os.path
+import functools
+import itertools
+import operator
+import queue
+import threading
 from pathlib import Path
 
 # Import the Amazon Product Advertising API SDK
@@ -23,18 +33,48 @@ try:
     from amazon_paapi.models.condition import Condition
     from amazon_paapi.models.merchant import Merchant
     from amazon_paapi.models.sort_by import SortBy
-    from amazon_paapi.errors.exceptions import ItemsNotFound
+    from amazon_paapi.errors.exceptions import ItemsNotFound, TooManyRequests
     AMAZON_SDK_AVAILABLE = True
 except ImportError:
     print("Amazon PAAPI SDK not available, using fallback implementation")
     AMAZON_SDK_AVAILABLE = False
     ItemsNotFound = Exception  # Fallback exception class
+    TooManyRequests = Exception
+
+# PA-API GetItems accepts up to 10 ItemIds per request
+MAX_ASINS_PER_REQUEST = 10
+
+# Frequently read PA-API Item / offer listing attributes
+_ITEM_TITLE = operator.attrgetter('item_info.title.display_value')
+_ITEM_IMAGE_URL = operator.attrgetter('images.primary.large.url')
+_LISTING_PRICE = operator.attrgetter('price.amount')
+_LISTING_AVAILABILITY = operator.attrgetter('availability.type')
+
+# PA-API request pacing (token bucket shared by all PA-API calls of a client)
+PAAPI_REQUESTS_PER_SECOND = float(os.getenv('PAAPI_REQUESTS_PER_SECOND', '1.0'))
+PAAPI_BURST = int(os.getenv('PAAPI_BURST', '1'))
 
 # Constants for retry logic
 MAX_RETRIES = 2
 RETRY_DELAY_BASE = 1.0  # Base delay in seconds
 RETRY_DELAY_MAX = 5.0  # Maximum delay in seconds
 
+# Model numbers (alphanumerics and hyphens) used to pick the direct-search path
+_MODEL_RE = re.compile(r'^[A-Za-z0-9\-]+$')
+# Leading model-number-like token in a keyword string
+_MODEL_NUM_RE = re.compile(r'^[A-Za-z0-9]+-?[A-Za-z0-9]+')
+# ASIN in an Amazon product URL
+_DP_ASIN_RE = re.compile(r'/dp/([A-Z0-9]{10})')
+
+_SEARCH_URL_PREFIX = "https://www.amazon.co.jp/s?k="
+
+# Affiliate tag query suffixes, built once
+_TAG_QUERY_SUFFIX = f"?tag={AMAZON_PARTNER_TAG}"
+_TAG_PARAM_SUFFIX = f"&tag={AMAZON_PARTNER_TAG}"
+
+# How long the cache writer waits after a change so that bursts are saved once (seconds)
+CACHE_SAVE_DELAY = 2.0
+
 # List of rotating User-Agents
 USER_AGENTS = [
     'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
@@ -43,20 +83,93 @@ USER_AGENTS = [
     'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:90.0) Gecko/20100101 Firefox/90.0'
 ]
 
+def _fallback_url(product_info):
+    """
+    商品が見つからなかった場合のAmazon URL（ASIN長の型番は商品ページ、それ以外は検索ページ）
+    """
+    if _MODEL_RE.match(product_info):
+        # Try direct product URL with clean code (no hyphens)
+        clean_code = product_info.replace('-', '')
+        if len(clean_code) == 10:  # ASIN length
+            url = f"https://www.amazon.co.jp/dp/{clean_code}"
+        else:
+            # Try both with and without hyphens in the search
+            url = f"{_SEARCH_URL_PREFIX}{urllib.parse.quote(product_info)}+OR+{urllib.parse.quote(clean_code)}"
+    else:
+        # Regular search URL
+        url = _SEARCH_URL_PREFIX + urllib.parse.quote(product_info)
+    
+    # Add affiliate tag if available
+    if AMAZON_PARTNER_TAG:
+        url = _with_partner_tag(url)
+    return url
+
+@functools.lru_cache(maxsize=2048)
+def _expand_keywords(keywords, direct_search):
+    """
+    検索キーワードを展開（型番は表記ゆれを OR で結合）
+    """
+    # For direct search with model numbers, don't expand keywords
+    if direct_search and _MODEL_RE.match(keywords):
+        return f'"{keywords}"'  # Just use the exact model number with quotes
+    
+    # For product codes, try to format them in different ways to improve search results
+    if _MODEL_RE.match(keywords):
+        # Create variations of the product code for better search results
+        variations = [
+            f'"{keywords}"',                     # Original with quotes
+            f'"{keywords.replace("-", "")}"',    # Without hyphens
+            f'"{" ".join(keywords.split("-"))}"' # Spaces instead of hyphens
+        ]
+        return " OR ".join(variations)
+    
+    # For regular keywords, just add quotes
+    return f'"{keywords}"'
+
+@functools.lru_cache(maxsize=4096)
+def _norm_key(keywords):
+    """検索キャッシュのキー（小文字化・前後の空白除去）"""
+    return keywords.lower().strip()
+
+def _with_partner_tag(url):
+    """
+    URLにアフィリエイトタグを付与（既に付いている場合はそのまま）
+    """
+    if '&tag=' in url or '?tag=' in url:
+        return url
+    return url + (_TAG_PARAM_SUFFIX if '?' in url else _TAG_QUERY_SUFFIX)
+
 class AmazonAPI:
     def __init__(self):
         """
         Initialize the Amazon API client
         """
+        # Shared keep-alive session; the pool is sized for concurrent lookups (batch_search, request threads)
         self.session = requests.Session()
+        # Retries are handled by our own backoff loops, not by urllib3
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=Retry(total=0))
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        # Only advertise encodings urllib3 can decode here (br needs brotli installed)
+        self.session.headers.update(make_headers(accept_encoding=True))
         self.default_image = "https://placehold.co/300x300/eee/999?text=No+Image"
         
         # Initialize cache
         self.cache_dir = Path("cache/amazon")
         self.cache_dir.mkdir(parents=True, exist_ok=True)
         self.cache_expiry = 3600 * 24  # 24 hours in seconds
+        self.cache_capacity = 5000  # Least recently used entries are evicted beyond this
+        # search_cache is shared by request threads, batch pools and the stock monitor
+        self._cache_lock = threading.Lock()
         self.load_cache()
         
+        # Background writer so requests never wait on save_cache
+        self._save_queue = queue.SimpleQueue()
+        threading.Thread(target=self._cache_writer, name='amazon-cache-writer', daemon=True).start()
+        
+        # Client-side pacing for PA-API so bursts wait here instead of failing with 429
+        self._paapi_bucket = TokenBucket(rate=PAAPI_REQUESTS_PER_SECOND, capacity=PAAPI_BURST)
+        
         # Initialize Amazon PAAPI client
         try:
             # Check if the amazon_paapi library is available
@@ -74,7 +187,7 @@ class AmazonAPI:
                     secret=AMAZON_SECRET_KEY,
                     tag=AMAZON_PARTNER_TAG,
                     country='JP',  # Country code for Japan
-                    throttling=1.0  # Add a throttling parameter to avoid hitting rate limits
+                    throttling=0  # Rate limiting is done by self._paapi_bucket (thread-safe)
                 )
                 print(f"Successfully initialized Amazon PAAPI client")
         except Exception as e:
@@ -84,57 +197,148 @@ class AmazonAPI:
             traceback.print_exc()
             self.client = None
     
+    def _paapi_call(self, method, *args, tokens=1, **kwargs):
+        """
+        PA-API の呼び出し（トークンバケットで流量制御、スロットリング時は後続も待機させる）
+        """
+        self._paapi_bucket.acquire(tokens)
+        try:
+            return method(*args, **kwargs)
+        except TooManyRequests:
+            # Drain the bucket so every caller backs off, not only this one
+            self._paapi_bucket.penalize(self._paapi_bucket.capacity + tokens)
+            raise
+    
     def load_cache(self):
         """Load the search cache from disk"""
         self.search_cache = {}
-        cache_file = self.cache_dir / "search_cache.pkl"
+        cache_file = self.cache_dir / "search_cache.json"
+        legacy_cache_file = self.cache_dir / "search_cache.pkl"
         
-        if os.path.exists(cache_file):
-            try:
+        try:
+            if os.path.exists(cache_file):
                 with open(cache_file, 'rb') as f:
+                    cached_data = json_utils.loads(f.read())
+            elif os.path.exists(legacy_cache_file):
+                # One-time migration from the old pickle cache
+                with open(legacy_cache_file, 'rb') as f:
                     cached_data = pickle.load(f)
-                    # Only keep cache entries that haven't expired
-                    current_time = time.time()
-                    self.search_cache = {
-                        k: v for k, v in cached_data.items() 
-                        if current_time - v['timestamp'] < self.cache_expiry
-                    }
-                print(f"Loaded {len(self.search_cache)} items from Amazon search cache")
-            except Exception as e:
-                print(f"Error loading Amazon search cache: {e}")
-                # Start with a fresh cache if there was an error
-                self.search_cache = {}
+            else:
+                return
+            
+            # Entries are kept least-recently-used first, so only the expired head needs to be dropped
+            with self._cache_lock:
+                self.search_cache = cached_data
+                self._prune_expired_head()
+                self._evict_over_capacity()
+            print(f"Loaded {len(self.search_cache)} items from Amazon search cache")
+        except Exception as e:
+            print(f"Error loading Amazon search cache: {e}")
+            # Start with a fresh cache if there was an error
+            self.search_cache = {}
+            return
+        
+        if not os.path.exists(cache_file):
+            # Rewrite the migrated entries in the new format and drop the pickle file
+            self.save_cache()
+            if os.path.exists(cache_file):
+                os.remove(legacy_cache_file)
     
     def save_cache(self):
         """Save the search cache to disk"""
-        cache_file = self.cache_dir / "search_cache.pkl"
+        cache_file = self.cache_dir / "search_cache.json"
         try:
-            with open(cache_file, 'wb') as f:
-                pickle.dump(self.search_cache, f)
+            # Snapshot under the lock, serialize outside it so lookups are not blocked
+            with self._cache_lock:
+                snapshot = dict(self.search_cache)
+            # Cached results are plain product dicts, so JSON (orjson) is enough
+            data = json_utils.dumps(snapshot)
+            # Write to a temp file and swap it in so readers never see a partial file
+            tmp_file = cache_file.with_name(cache_file.name + ".tmp")
+            with open(tmp_file, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_file, cache_file)
         except Exception as e:
             print(f"Error saving Amazon search cache: {e}")
     
+    def _cache_writer(self):
+        """
+        Save the search cache in the background, coalescing bursts of changes into one write
+        """
+        while True:
+            self._save_queue.get()
+            time.sleep(CACHE_SAVE_DELAY)
+            # Drop the signals that arrived while waiting; this save covers them
+            try:
+                while True:
+                    self._save_queue.get_nowait()
+            except queue.Empty:
+                pass
+            self.save_cache()
+    
+    def prune_cache(self):
+        """
+        Drop expired entries from the front of the search cache
+        
+        search_cache is kept in least-recently-used order (writes and hits move a key to the
+        end), so expired entries collect at the front and this stops at the first live entry
+        instead of scanning every entry. An expired entry behind a live one is still never
+        served, and is dropped once it reaches the front or is evicted.
+        """
+        with self._cache_lock:
+            self._prune_expired_head()
+    
+    def _prune_expired_head(self):
+        """Drop the expired head of search_cache (caller holds _cache_lock)"""
+        expire_before = time.time() - self.cache_expiry
+        for oldest_key, oldest_entry in self.search_cache.items():
+            if oldest_entry['timestamp'] > expire_before:
+                break
+        else:
+            self.search_cache.clear()
+            return
+        # Everything before the first live entry is expired
+        for expired_key in list(itertools.takewhile(lambda key: key != oldest_key, self.search_cache)):
+            del self.search_cache[expired_key]
+    
+    def _evict_over_capacity(self):
+        """Evict least recently used entries beyond cache_capacity (caller holds _cache_lock)"""
+        excess = len(self.search_cache) - self.cache_capacity
+        if excess > 0:
+            for evicted_key in list(itertools.islice(self.search_cache, excess)):
+                del self.search_cache[evicted_key]
+    
     def get_cached_search(self, keywords):
         """Get cached search results if available"""
-        cache_key = keywords.lower().strip()
-        if cache_key in self.search_cache:
-            cache_entry = self.search_cache[cache_key]
+        cache_key = _norm_key(keywords)
+        with self._cache_lock:
+            cache_entry = self.search_cache.get(cache_key)
+            if cache_entry is None:
+                return None
             # Check if the cache entry has expired
-            if time.time() - cache_entry['timestamp'] < self.cache_expiry:
-                print(f"Using cached Amazon search results for '{keywords}'")
-                return cache_entry['results']
-        return None
+            if time.time() - cache_entry['timestamp'] >= self.cache_expiry:
+                # Expired entries collect at the front; drop the expired head now
+                self._prune_expired_head()
+                return None
+            # Mark as most recently used
+            self.search_cache[cache_key] = self.search_cache.pop(cache_key)
+        print(f"Using cached Amazon search results for '{keywords}'")
+        return cache_entry['results']
     
     def cache_search_results(self, keywords, results):
         """Cache search results"""
-        cache_key = keywords.lower().strip()
-        self.search_cache[cache_key] = {
-            'results': results,
-            'timestamp': time.time()
-        }
-        # Save cache periodically (every 10 new entries)
-        if len(self.search_cache) % 10 == 0:
-            self.save_cache()
+        cache_key = _norm_key(keywords)
+        with self._cache_lock:
+            # Move the key to the end (most recently used)
+            self.search_cache.pop(cache_key, None)
+            self.search_cache[cache_key] = {
+                'results': results,
+                'timestamp': time.time()
+            }
+            # Evict the least recently used entries beyond the capacity
+            self._evict_over_capacity()
+        # Saved by the background writer
+        self._save_queue.put_nowait(None)
 
     def get_price(self, product_info, direct_search=True):
         """
@@ -146,7 +350,7 @@ class AmazonAPI:
         """
         try:
             # Check if this is a model number
-            is_model_number = re.match(r'^[A-Za-z0-9\-]+$', product_info)
+            is_model_number = _MODEL_RE.match(product_info)
             
             # Use the Amazon Product Advertising API to get real product data
             amazon_results = self._search_amazon_products(product_info, limit=5, direct_search=direct_search and is_model_number)
@@ -176,24 +380,7 @@ class AmazonAPI:
                     }
             else:
                 # Create a better search URL for the fallback
-                # For product codes, try to create a direct product URL first
-                fallback_url = ""
-                if re.match(r'^[A-Za-z0-9\-]+$', product_info):
-                    # Try direct product URL with clean code (no hyphens)
-                    clean_code = product_info.replace('-', '')
-                    if len(clean_code) == 10:  # ASIN length
-                        fallback_url = f"https://www.amazon.co.jp/dp/{clean_code}"
-                    else:
-                        # Try both with and without hyphens in the search
-                        fallback_url = f"https://www.amazon.co.jp/s?k={urllib.parse.quote(product_info)}+OR+{urllib.parse.quote(clean_code)}"
-                else:
-                    # Regular search URL
-                    fallback_url = f"https://www.amazon.co.jp/s?k={urllib.parse.quote(product_info)}"
-                
-                # Add affiliate tag if available
-                if AMAZON_PARTNER_TAG and '&tag=' not in fallback_url and '?tag=' not in fallback_url:
-                    separator = '&' if '?' in fallback_url else '?'
-                    fallback_url = f"{fallback_url}{separator}tag={AMAZON_PARTNER_TAG}"
+                fallback_url = _fallback_url(product_info)
                 
                 # Return a placeholder with the improved URL
                 return {
@@ -209,7 +396,7 @@ class AmazonAPI:
             # Return a fallback response
             return {
                 'price': 0,
-                'url': f"https://www.amazon.co.jp/s?k={urllib.parse.quote(product_info)}",
+                'url': _SEARCH_URL_PREFIX + urllib.parse.quote(product_info),
                 'availability': False,
                 'title': f"{product_info} (Amazon)",
                 'shop': "Amazon.co.jp",
@@ -228,7 +415,7 @@ class AmazonAPI:
             print(f"DEBUG: Fetching Amazon product details for: {product_info}")
             
             # Check if this is a model number
-            is_model_number = re.match(r'^[A-Za-z0-9\-]+$', product_info)
+            is_model_number = _MODEL_RE.match(product_info)
             
             # Search for products on Amazon
             amazon_results = self._search_amazon_products(product_info, limit=5, direct_search=direct_search and is_model_number)
@@ -285,7 +472,7 @@ class AmazonAPI:
         """
         try:
             # Check if this is a model number
-            is_model_number = re.match(r'^[A-Za-z0-9\-]+$', product_info)
+            is_model_number = _MODEL_RE.match(product_info)
             
             # Search for products on Amazon
             amazon_results = self._search_amazon_products(product_info, limit=5, direct_search=direct_search and is_model_number)
@@ -338,7 +525,7 @@ class AmazonAPI:
         """
         try:
             # Validate ASIN format (10 characters, alphanumeric)
-            if not re.match(r'^[A-Z0-9]{10}$', asin.upper()):
+            if not is_asin(asin):
                 print(f"Invalid ASIN format: {asin}")
                 return None
             
@@ -355,15 +542,15 @@ class AmazonAPI:
             for attempt in range(MAX_RETRIES):
                 try:
                     if attempt > 0:
-                        delay = min(RETRY_DELAY_MAX, RETRY_DELAY_BASE * (2 ** attempt))
-                        delay = delay * (0.5 + random.random() * 1.5)
+                        # Full jitter: spreads concurrent PA-API retries instead of bunching them up
+                        delay = random.uniform(0, min(RETRY_DELAY_MAX, RETRY_DELAY_BASE * (1 << attempt)))
                         print(f"Waiting {delay:.2f} seconds before retry {attempt + 1}/{MAX_RETRIES}")
                         time.sleep(delay)
                     
                     # Try with include_unavailable=True on first attempt, False on retry
                     include_unavailable = (attempt == 0)
                     print(f"Fetching product via PA-API get_items (attempt {attempt + 1}/{MAX_RETRIES}, include_unavailable={include_unavailable})")
-                    items_result = self.client.get_items([asin], include_unavailable=include_unavailable)
+                    items_result = self._paapi_call(self.client.get_items, [asin], include_unavailable=include_unavailable)
                     
                     if not items_result:
                         print(f"No items found in PA-API response for ASIN {asin}")
@@ -383,66 +570,9 @@ class AmazonAPI:
                         continue
                     
                     # Extract product information
-                    product_asin = item.asin
-                    
-                    # Extract title
-                    title = "Amazon Product"
-                    if hasattr(item, 'item_info') and hasattr(item.item_info, 'title') and hasattr(item.item_info.title, 'display_value'):
-                        title = item.item_info.title.display_value
+                    product_data = self._item_to_product(item)
                     
-                    # Extract price
-                    price = 0
-                    if hasattr(item, 'offers') and hasattr(item.offers, 'listings') and item.offers.listings:
-                        listing = item.offers.listings[0]
-                        if hasattr(listing, 'price') and hasattr(listing.price, 'amount'):
-                            price = int(float(listing.price.amount))
-                    
-                    # Extract image URL
-                    image_url = self.default_image
-                    if hasattr(item, 'images') and hasattr(item.images, 'primary') and hasattr(item.images.primary, 'large'):
-                        image_url = item.images.primary.large.url
-                    
-                    # Extract product URL
-                    detail_page_url = f"https://www.amazon.co.jp/dp/{product_asin}?tag={AMAZON_PARTNER_TAG}"
-                    if hasattr(item, 'detail_page_url'):
-                        detail_page_url = item.detail_page_url
-                    
-                    # Add affiliate tag if not present
-                    if '&tag=' not in detail_page_url and '?tag=' not in detail_page_url:
-                        separator = '&' if '?' in detail_page_url else '?'
-                        detail_page_url = f"{detail_page_url}{separator}tag={AMAZON_PARTNER_TAG}"
-                    
-                    # Extract availability
-                    availability = False
-                    if hasattr(item, 'offers') and hasattr(item.offers, 'listings') and item.offers.listings:
-                        listing = item.offers.listings[0]
-                        if hasattr(listing, 'availability') and hasattr(listing.availability, 'type'):
-                            availability = listing.availability.type == 'Now'
-                    
-                    # Extract features/description
-                    description = None
-                    features = []
-                    if hasattr(item, 'item_info') and hasattr(item.item_info, 'features'):
-                        if hasattr(item.item_info.features, 'display_values'):
-                            features = item.item_info.features.display_values
-                        elif hasattr(item.item_info.features, 'values'):
-                            features = item.item_info.features.values
-                        if features:
-                            description = ' '.join(features[:5])  # Join first 5 features as description
-                    
-                    product_data = {
-                        "asin": product_asin,
-                        "title": title,
-                        "price": price,
-                        "url": detail_page_url,
-                        "image_url": image_url,
-                        "source": "amazon",
-                        "availability": availability,
-                        "description": description,
-                        "features": features
-                    }
-                    
-                    print(f"Successfully fetched product via PA-API: {title[:50]}...")
+                    print(f"Successfully fetched product via PA-API: {product_data['title'][:50]}...")
                     return product_data
                 
                 except ItemsNotFound as e:
@@ -501,6 +631,108 @@ class AmazonAPI:
             traceback.print_exc()
             return None
     
+    def _extract_item_fields(self, item) -> dict:
+        """
+        PA-API の Item から共通の商品フィールドを取り出す
+        """
+        asin = item.asin
+        
+        # Missing parts of the response raise AttributeError; fall back to the defaults
+        try:
+            title = _ITEM_TITLE(item)
+        except AttributeError:
+            title = "Amazon Product"
+        
+        try:
+            image_url = _ITEM_IMAGE_URL(item)
+        except AttributeError:
+            image_url = self.default_image
+        
+        # Add affiliate tag if not present
+        detail_page_url = _with_partner_tag(
+            getattr(item, 'detail_page_url', None) or f"https://www.amazon.co.jp/dp/{asin}" + _TAG_QUERY_SUFFIX
+        )
+        
+        # Price and availability come from the first offer listing
+        price = 0
+        availability = False
+        try:
+            listing = item.offers.listings[0]
+        except (AttributeError, IndexError, TypeError):
+            listing = None
+        if listing is not None:
+            try:
+                price = int(float(_LISTING_PRICE(listing)))
+            except AttributeError:
+                pass
+            try:
+                availability = _LISTING_AVAILABILITY(listing) == 'Now'
+            except AttributeError:
+                pass
+        
+        return {
+            "asin": asin,
+            "title": title,
+            "price": price,
+            "url": detail_page_url,
+            "image_url": image_url,
+            "source": "amazon",
+            "availability": availability
+        }
+    
+    def _item_to_product(self, item) -> dict:
+        """
+        PA-API の Item を商品辞書に変換
+        """
+        product_data = self._extract_item_fields(item)
+        
+        # Extract features/description
+        description = None
+        features = []
+        try:
+            features = item.item_info.features.display_values
+        except AttributeError:
+            try:
+                features = item.item_info.features.values
+            except AttributeError:
+                pass
+        if features:
+            description = ' '.join(features[:5])  # Join first 5 features as description
+        
+        product_data["description"] = description
+        product_data["features"] = features
+        return product_data
+
+    def get_items_by_asins(self, asins) -> dict:
+        """
+        複数のASINを PA-API GetItems でまとめて取得（10件ごとに1リクエスト）
+
+        Args:
+            asins (list): ASINのリスト（不正な値は除外、大文字に正規化、重複除去）
+
+        Returns:
+            dict: ASIN -> 商品辞書（見つからなかったASINは含まない）
+        """
+        if not self.client:
+            return {}
+        
+        asins = list(dict.fromkeys(asin.upper() for asin in asins if is_asin(asin)))
+        products = {}
+        for start in range(0, len(asins), MAX_ASINS_PER_REQUEST):
+            chunk = asins[start:start + MAX_ASINS_PER_REQUEST]
+            try:
+                items_result = self._paapi_call(self.client.get_items, chunk, include_unavailable=True)
+            except ItemsNotFound:
+                continue
+            
+            items_list = items_result if isinstance(items_result, list) else (items_result.items if hasattr(items_result, 'items') else [])
+            for item in items_list or []:
+                # Skip items with None ASIN (unavailable items)
+                if getattr(item, 'asin', None) is None:
+                    continue
+                products[item.asin.upper()] = self._item_to_product(item)
+        return products
+    
     def search_items(self, keywords, limit=5, **kwargs):
         """
         Search for items using the Amazon Product Advertising API
@@ -525,12 +757,12 @@ class AmazonAPI:
             print(f"Searching Amazon for: {keywords} (limit: {limit})")
             
             # Check if this is an ASIN (10 characters, alphanumeric)
-            is_asin = bool(re.match(r'^[A-Z0-9]{10}$', str(keywords).upper()))
+            is_asin_keyword = is_asin(keywords)
             use_paapi_for_asin = kwargs.get('use_paapi_for_asin', True)
             skip_paapi_retry = kwargs.get('skip_paapi_retry', False)
             
             # If it's an ASIN and we should use PA-API, use get_items_by_asin
-            if is_asin and use_paapi_for_asin and self.client and not skip_paapi_retry:
+            if is_asin_keyword and use_paapi_for_asin and self.client and not skip_paapi_retry:
                 print(f"Detected ASIN '{keywords}', using PA-API get_items")
                 product = self.get_items_by_asin(keywords.upper())
                 if product:
@@ -551,10 +783,10 @@ class AmazonAPI:
             direct_search = kwargs.get('direct_search', False)
             
             # Check if the keywords look like a model number (contains alphanumeric with dashes)
-            is_model_number = bool(re.match(r'^[A-Za-z0-9]+-?[A-Za-z0-9]+', str(keywords)))
+            is_model_number = bool(_MODEL_NUM_RE.match(str(keywords)))
             
             # For model numbers (but not ASINs), prioritize scraping as PAAPI often fails for these
-            if is_model_number and not is_asin:
+            if is_model_number and not is_asin_keyword:
                 print(f"Detected model number pattern in '{keywords}', prioritizing scraping")
                 # Try scraping first for model numbers
                 scraped_results = self._scrape_amazon_search(keywords, limit)
@@ -616,7 +848,7 @@ class AmazonAPI:
                         
                         # Execute the search
                         print(f"Executing Amazon PAAPI search (attempt {attempt + 1}/{MAX_RETRIES})")
-                        search_result = self.client.search_items(**search_params)
+                        search_result = self._paapi_call(self.client.search_items, **search_params)
                         
                         # Check if we have search results
                         if not search_result or not hasattr(search_result, 'items') or not search_result.items:
@@ -627,53 +859,7 @@ class AmazonAPI:
                         results = []
                         for item in search_result.items:
                             try:
-                                # Extract ASIN
-                                asin = item.asin
-                                
-                                # Extract title
-                                title = "Amazon Product"
-                                if hasattr(item, 'item_info') and hasattr(item.item_info, 'title') and hasattr(item.item_info.title, 'display_value'):
-                                    title = item.item_info.title.display_value
-                                
-                                # Extract price
-                                price = 0
-                                if hasattr(item, 'offers') and hasattr(item.offers, 'listings') and item.offers.listings:
-                                    listing = item.offers.listings[0]
-                                    if hasattr(listing, 'price') and hasattr(listing.price, 'amount'):
-                                        price = int(float(listing.price.amount))
-                                
-                                # Extract image URL
-                                image_url = self.default_image
-                                if hasattr(item, 'images') and hasattr(item.images, 'primary') and hasattr(item.images.primary, 'large'):
-                                    image_url = item.images.primary.large.url
-                                
-                                # Extract product URL
-                                detail_page_url = f"https://www.amazon.co.jp/dp/{asin}?tag={AMAZON_PARTNER_TAG}"
-                                if hasattr(item, 'detail_page_url'):
-                                    detail_page_url = item.detail_page_url
-                                
-                                # Add affiliate tag if not present
-                                if '&tag=' not in detail_page_url and '?tag=' not in detail_page_url:
-                                    separator = '&' if '?' in detail_page_url else '?'
-                                    detail_page_url = f"{detail_page_url}{separator}tag={AMAZON_PARTNER_TAG}"
-                                
-                                # Extract availability
-                                availability = False
-                                if hasattr(item, 'offers') and hasattr(item.offers, 'listings') and item.offers.listings:
-                                    listing = item.offers.listings[0]
-                                    if hasattr(listing, 'availability') and hasattr(listing.availability, 'type'):
-                                        availability = listing.availability.type == 'Now'
-                                
-                                # Create product data dictionary
-                                product_data = {
-                                    "asin": asin,
-                                    "title": title,
-                                    "price": price,
-                                    "url": detail_page_url,
-                                    "image_url": image_url,
-                                    "source": "amazon",
-                                    "availability": availability
-                                }
+                                product_data = self._extract_item_fields(item)
                                 
                                 results.append(product_data)
                             except Exception as e:
@@ -735,7 +921,7 @@ class AmazonAPI:
                     print(f"Error using PAAPI search: {e}")
             
             # If PAAPI failed or is not available, try direct product access for product codes
-            if re.match(r'^[A-Za-z0-9\-]+$', keywords):
+            if _MODEL_RE.match(keywords):
                 print(f"Trying direct product access for product code: {keywords}")
                 direct_results = self._try_direct_product_access(keywords)
                 if direct_results:
@@ -768,14 +954,14 @@ class AmazonAPI:
             clean_code = product_code.replace('-', '')
             
             # If the clean code is 10 characters (ASIN length), try direct access
-            if len(clean_code) == 10 and re.match(r'^[A-Z0-9]{10}$', clean_code, re.IGNORECASE):
+            if is_asin(clean_code):
                 print(f"Product code {product_code} appears to be an ASIN, trying direct access")
                 
                 # Try to use the PAAPI client first
                 if self.client:
                     try:
                         # Get item information using the ASIN
-                        response = self.client.get_items([clean_code])
+                        response = self._paapi_call(self.client.get_items, [clean_code])
                         
                         # Check if we have results
                         if response and hasattr(response, 'items') and response.items:
@@ -785,53 +971,7 @@ class AmazonAPI:
                             results = []
                             for item in response.items:
                                 try:
-                                    # Extract ASIN
-                                    asin = item.asin
-                                    
-                                    # Extract title
-                                    title = "Amazon Product"
-                                    if hasattr(item, 'item_info') and hasattr(item.item_info, 'title') and hasattr(item.item_info.title, 'display_value'):
-                                        title = item.item_info.title.display_value
-                                    
-                                    # Extract price
-                                    price = 0
-                                    if hasattr(item, 'offers') and hasattr(item.offers, 'listings') and item.offers.listings:
-                                        listing = item.offers.listings[0]
-                                        if hasattr(listing, 'price') and hasattr(listing.price, 'amount'):
-                                            price = int(float(listing.price.amount))
-                                    
-                                    # Extract image URL
-                                    image_url = self.default_image
-                                    if hasattr(item, 'images') and hasattr(item.images, 'primary') and hasattr(item.images.primary, 'large'):
-                                        image_url = item.images.primary.large.url
-                                    
-                                    # Extract product URL
-                                    detail_page_url = f"https://www.amazon.co.jp/dp/{asin}?tag={AMAZON_PARTNER_TAG}"
-                                    if hasattr(item, 'detail_page_url'):
-                                        detail_page_url = item.detail_page_url
-                                    
-                                    # Add affiliate tag if not present
-                                    if '&tag=' not in detail_page_url and '?tag=' not in detail_page_url:
-                                        separator = '&' if '?' in detail_page_url else '?'
-                                        detail_page_url = f"{detail_page_url}{separator}tag={AMAZON_PARTNER_TAG}"
-                                    
-                                    # Extract availability
-                                    availability = False
-                                    if hasattr(item, 'offers') and hasattr(item.offers, 'listings') and item.offers.listings:
-                                        listing = item.offers.listings[0]
-                                        if hasattr(listing, 'availability') and hasattr(listing.availability, 'type'):
-                                            availability = listing.availability.type == 'Now'
-                                    
-                                    # Create product data dictionary
-                                    product_data = {
-                                        "asin": asin,
-                                        "title": title,
-                                        "price": price,
-                                        "url": detail_page_url,
-                                        "image_url": image_url,
-                                        "source": "amazon",
-                                        "availability": availability
-                                    }
+                                    product_data = self._extract_item_fields(item)
                                     
                                     results.append(product_data)
                                 except Exception as e:
@@ -864,7 +1004,6 @@ class AmazonAPI:
                         'User-Agent': user_agent,
                         'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
                         'Accept-Language': 'ja-JP,ja;q=0.9,en-US;q=0.8,en;q=0.7',
-                        'Accept-Encoding': 'gzip, deflate, br',
                         'DNT': '1',
                         'Connection': 'keep-alive',
                         'Upgrade-Insecure-Requests': '1',
@@ -876,7 +1015,7 @@ class AmazonAPI:
                     }
                     
                     # Make the request
-                    response = requests.get(product_url, headers=headers, timeout=10)
+                    response = self.session.get(product_url, headers=headers, timeout=10)
                     
                     if response.status_code == 200:
                         # Parse the HTML
@@ -931,7 +1070,7 @@ class AmazonAPI:
                             image_url = self.default_image
                         
                         # Create the product URL with affiliate tag
-                        product_url = f"https://www.amazon.co.jp/dp/{clean_code}?tag={AMAZON_PARTNER_TAG}"
+                        product_url = f"https://www.amazon.co.jp/dp/{clean_code}" + _TAG_QUERY_SUFFIX
                         
                         # Create a product data dictionary
                         product_data = {
@@ -966,24 +1105,7 @@ class AmazonAPI:
         print(f"Generating fallback products for '{keywords}'")
         
         # Create a better search URL for the fallback
-        # For product codes, try to create a direct product URL first
-        fallback_url = ""
-        if re.match(r'^[A-Za-z0-9\-]+$', keywords):
-            # Try direct product URL with clean code (no hyphens)
-            clean_code = keywords.replace('-', '')
-            if len(clean_code) == 10:  # ASIN length
-                fallback_url = f"https://www.amazon.co.jp/dp/{clean_code}"
-            else:
-                # Try both with and without hyphens in the search
-                fallback_url = f"https://www.amazon.co.jp/s?k={urllib.parse.quote(keywords)}+OR+{urllib.parse.quote(clean_code)}"
-        else:
-            # Regular search URL
-            fallback_url = f"https://www.amazon.co.jp/s?k={urllib.parse.quote(keywords)}"
-        
-        # Add affiliate tag if available
-        if AMAZON_PARTNER_TAG and '&tag=' not in fallback_url and '?tag=' not in fallback_url:
-            separator = '&' if '?' in fallback_url else '?'
-            fallback_url = f"{fallback_url}{separator}tag={AMAZON_PARTNER_TAG}"
+        fallback_url = _fallback_url(keywords)
         
         # Create a single fallback product
         fallback_product = {
@@ -1007,23 +1129,10 @@ class AmazonAPI:
             keywords (str): The search keywords
             direct_search (bool): If True, only use the exact model number without variations
         """
-        # For direct search with model numbers, don't expand keywords
-        if direct_search and re.match(r'^[A-Za-z0-9\-]+$', keywords):
+        direct_search = bool(direct_search)
+        if direct_search and _MODEL_RE.match(keywords):
             print(f"Direct search enabled. Using exact model number: {keywords}")
-            return f'"{keywords}"'  # Just use the exact model number with quotes
-        
-        # For product codes, try to format them in different ways to improve search results
-        if re.match(r'^[A-Za-z0-9\-]+$', keywords):
-            # Create variations of the product code for better search results
-            variations = [
-                f'"{keywords}"',                     # Original with quotes
-                f'"{keywords.replace("-", "")}"',    # Without hyphens
-                f'"{" ".join(keywords.split("-"))}"' # Spaces instead of hyphens
-            ]
-            return " OR ".join(variations)
-        
-        # For regular keywords, just add quotes
-        return f'"{keywords}"'
+        return _expand_keywords(keywords, direct_search)
     
     def _scrape_amazon_search(self, keywords, limit=5):
         """
@@ -1031,8 +1140,7 @@ class AmazonAPI:
         """
         try:
             # Encode the search query
-            encoded_query = urllib.parse.quote(keywords)
-            base_url = f"https://www.amazon.co.jp/s?k={encoded_query}"
+            base_url = _SEARCH_URL_PREFIX + urllib.parse.quote(keywords)
             
             results = []
             
@@ -1054,7 +1162,6 @@ class AmazonAPI:
                         'User-Agent': user_agent,
                         'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
                         'Accept-Language': 'ja-JP,ja;q=0.9,en-US;q=0.8,en;q=0.7',
-                        'Accept-Encoding': 'gzip, deflate, br',
                         'DNT': '1',
                         'Connection': 'keep-alive',
                         'Upgrade-Insecure-Requests': '1',
@@ -1066,7 +1173,7 @@ class AmazonAPI:
                     }
                     
                     # Make the request
-                    response = requests.get(base_url, headers=headers, timeout=10)
+                    response = self.session.get(base_url, headers=headers, timeout=10)
                     
                     if response.status_code == 503:
                         print(f"Amazon returned 503 on attempt {attempt + 1}/{MAX_RETRIES}")
@@ -1122,7 +1229,7 @@ class AmazonAPI:
                                 link_elem = item.select_one('a[href*="/dp/"]')
                                 if link_elem and link_elem.has_attr('href'):
                                     url = link_elem['href']
-                                    asin_match = re.search(r'/dp/([A-Z0-9]{10})', url)
+                                    asin_match = _DP_ASIN_RE.search(url)
                                     if asin_match:
                                         asin = asin_match.group(1)
                             
@@ -1161,7 +1268,7 @@ class AmazonAPI:
                                 image_url = img_elem['src']
                             
                             # Get the product URL
-                            product_url = f"https://www.amazon.co.jp/dp/{asin}?tag={AMAZON_PARTNER_TAG}"
+                            product_url = f"https://www.amazon.co.jp/dp/{asin}" + _TAG_QUERY_SUFFIX
                             link_elem = item.select_one('a.a-link-normal[href]')
                             if link_elem and link_elem.has_attr('href'):
                                 href = link_elem['href']
@@ -1169,11 +1276,9 @@ class AmazonAPI:
                                     product_url = f"https://www.amazon.co.jp{href}"
                                 elif href.startswith('http'):
                                     product_url = href
-                                
-                                # Add affiliate tag if not present
-                            if '&tag=' not in product_url and '?tag=' not in product_url:
-                                    separator = '&' if '?' in product_url else '?'
-                                    product_url = f"{product_url}{separator}tag={AMAZON_PARTNER_TAG}"
+                            
+                            # Add affiliate tag if not present
+                            product_url = _with_partner_tag(product_url)
                             
                             # Create a product data dictionary
                             product_data = {
@@ -1264,7 +1369,7 @@ class AmazonAPI:
                 for item_id in item_ids:
                     # Clean ASIN (remove hyphens, convert to uppercase)
                     clean_asin = str(item_id).replace('-', '').upper()
-                    if re.match(r'^[A-Z0-9]{10}$', clean_asin):
+                    if is_asin(clean_asin):
                         validated_asins.append(clean_asin)
                     else:
                         print(f"Warning: Invalid ASIN format: {item_id}, skipping")
@@ -1309,8 +1414,11 @@ class AmazonAPI:
             # The amazon-paapi library handles resources automatically, but we can specify languages
             try:
                 # Call get_items with the ASINs
-                items_result = self.client.get_items(
+                items_result = self._paapi_call(
+                    self.client.get_items,
                     item_ids,
+                    # The SDK sends one GetItems request per 10 ASINs
+                    tokens=-(-len(item_ids) // MAX_ASINS_PER_REQUEST),
                     languages_of_preference=languages_of_preference if languages_of_preference else None,
                     include_unavailable=False
                 )
@@ -0,0 +1,76 @@
+import queue
+import threading
+from concurrent.futures import Future
+
+# PA-API GetItems accepts up to 10 ItemIds per request
+MAX_BATCH_SIZE = 10
+# How long to wait for more ASINs before flushing a partial batch (seconds)
+BATCH_WINDOW = 0.02
+
+class PAAPIBatcher:
+    """
+    Coalesces concurrent get-by-ASIN lookups into PA-API GetItems requests
+
+    Callers submit ASINs; a background thread collects up to MAX_BATCH_SIZE of
+    them (or whatever arrives within BATCH_WINDOW) and resolves every caller's
+    future from a single request.
+    """
+    def __init__(self, api, max_batch_size=MAX_BATCH_SIZE, window=BATCH_WINDOW):
+        self.api = api
+        self.max_batch_size = max_batch_size
+        self.window = window
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, asin):
+        """
+        ASINの取得を予約する
+
+        Returns:
+            Future: 商品辞書、見つからなかった場合は None
+        """
+        self._ensure_started()
+        future = Future()
+        self._queue.put((asin.upper(), future))
+        return future
+
+    def get(self, asin):
+        """
+        ASINの商品情報を取得（まとめて取得できなかった場合は通常の取得にフォールバック）
+        """
+        product = self.submit(asin).result()
+        if product is None:
+            # Not returned by GetItems: use the per-ASIN path with its retries and search fallback
+            return self.api.get_items_by_asin(asin)
+        return product
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='paapi-batcher', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # Collect more requests until the batch is full or the window closes
+            while len(batch) < self.max_batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=self.window))
+                except queue.Empty:
+                    break
+            self._flush(batch)
+
+    def _flush(self, batch):
+        asins = list(dict.fromkeys(asin for asin, _ in batch))
+        try:
+            products = self.api.get_items_by_asins(asins)
+            print(f"PA-API GetItems batch: {len(products)}/{len(asins)} ASINs found")
+        except Exception as e:
+            print(f"Error in PA-API GetItems batch {asins}: {e}")
+            products = {}
+        for asin, future in batch:
+            future.set_result(products.get(asin))
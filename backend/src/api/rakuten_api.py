@@ -1,6 +1,7 @@
 import requests
 from src.config.settings import RAKUTEN_API_ENDPOINT, RAKUTEN_APP_ID, RAKUTEN_AFFILIATE_ID
 from src.models.product import ProductDetail
+from src.utils.helpers import is_jan_code as looks_like_jan_code
 import urllib.parse
 import hashlib
 import json  # Add this for debugging
@@ -237,7 +238,7 @@ class RakutenAPI:
             start_time = time.time()  # Add time import at the top of the file if not already there
             
             # Check if the product_info is a JAN code (8 or 13 digits)
-            is_jan_code = bool(re.match(r'^[0-9]{8}$|^[0-9]{13}$', str(product_info)))
+            is_jan_code = looks_like_jan_code(product_info)
             
             # Search for products on Rakuten with optimized API call
             items = self._search_rakuten_products(product_info)
@@ -334,7 +335,7 @@ class RakutenAPI:
         """
         try:
             # Check if the product_info is a JAN code (8 or 13 digits)
-            is_jan_code = bool(re.match(r'^[0-9]{8}$|^[0-9]{13}$', str(product_info)))
+            is_jan_code = looks_like_jan_code(product_info)
             if is_jan_code:
                 print(f"DEBUG: Searching Rakuten prices by JAN code: {product_info}")
             
@@ -451,7 +452,7 @@ class RakutenAPI:
             print(f"DEBUG: Searching Rakuten products for: {keyword}")
             
             # Check if the keyword is a JAN code (8 or 13 digits)
-            is_jan_code = bool(re.match(r'^[0-9]{8}$|^[0-9]{13}$', str(keyword)))
+            is_jan_code = looks_like_jan_code(keyword)
             
             # Determine minimum expected price based on keyword for better filtering
             min_price_filter = 500  # Default minimum price
@@ -579,7 +580,7 @@ class RakutenAPI:
         products = []
         
         # Check if the keyword is a JAN code
-        is_jan_code = bool(re.match(r'^[0-9]{8}$|^[0-9]{13}$', str(keyword)))
+        is_jan_code = looks_like_jan_code(keyword)
         
         # Determine minimum expected price based on keyword
         min_price_filter = 500  # Default minimum price
@@ -825,7 +826,7 @@ class RakutenAPI:
         results = []
         
         # Check if the keyword is a JAN code (8 or 13 digits)
-        is_jan_code = bool(re.match(r'^[0-9]{8}$|^[0-9]{13}$', str(keyword)))
+        is_jan_code = looks_like_jan_code(keyword)
         
         # Create a hash of the keyword to generate consistent IDs
         keyword_hash = hashlib.md5(keyword.encode()).hexdigest()
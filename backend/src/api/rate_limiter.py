@@ -0,0 +1,43 @@
+import threading
+import time
+
+class TokenBucket:
+    """
+    Thread-safe token bucket used to pace PA-API requests
+
+    acquire() reserves a token and sleeps until it is available, so concurrent
+    callers are spaced out at `rate` requests per second with bursts of up to
+    `capacity`. penalize() removes tokens after a throttling error so the
+    following requests back off together instead of each retrying on its own.
+    """
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens=1):
+        """
+        トークンを取得する（足りない場合は補充されるまで待機）
+        """
+        with self._lock:
+            self._refill()
+            # Reserve now (the balance may go negative) and wait outside the lock
+            self._tokens -= tokens
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+
+    def penalize(self, tokens):
+        """
+        スロットリングエラー時にトークンを差し引く
+        """
+        with self._lock:
+            self._refill()
+            self._tokens -= tokens
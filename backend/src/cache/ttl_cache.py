@@ -0,0 +1,59 @@
+import time
+import threading
+from collections import OrderedDict
+
+class TTLCache:
+    """
+    Thread-safe in-memory LRU cache whose entries expire after a fixed TTL
+    """
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Get a value from the cache
+
+        Args:
+            key: The cache key
+            default: Value returned when the key is missing or expired
+
+        Returns:
+            The cached value, or default
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """
+        Store a value in the cache, evicting the least recently used entry when full
+
+        Args:
+            key: The cache key
+            value: The value to cache
+        """
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        """Remove every entry from the cache"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
@@ -2,7 +2,8 @@ from src.api.amazon_api import amazon_api
 from src.api.rakuten_api import rakuten_api
 from src.api.yahoo_api import yahoo_api
 from src.config.settings import PRICE_THRESHOLD
-from concurrent.futures import ThreadPoolExecutor
+from src.utils.helpers import is_jan_code as looks_like_jan_code
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import re
 
 class PriceComparisonEngine:
@@ -88,19 +89,28 @@ class PriceComparisonEngine:
         print(f"DEBUG: Getting detailed products for: '{product_info}'")
         all_products = []
         
-        # 各APIから詳細情報を取得
-        for api_name, api in self.apis.items():
-            try:
-                if hasattr(api, 'get_product_details'):
-                    print(f"DEBUG: Fetching products from {api_name} API")
-                    products = api.get_product_details(product_info)
+        # 各APIから詳細情報を並列に取得
+        detail_apis = {
+            api_name: api for api_name, api in self.apis.items()
+            if hasattr(api, 'get_product_details')
+        }
+        with ThreadPoolExecutor(max_workers=max(len(detail_apis), 1)) as executor:
+            future_to_api = {}
+            for api_name, api in detail_apis.items():
+                print(f"DEBUG: Fetching products from {api_name} API")
+                future_to_api[executor.submit(api.get_product_details, product_info)] = api_name
+            
+            for future in future_to_api:
+                api_name = future_to_api[future]
+                try:
+                    products = future.result()
                     if products:
                         print(f"DEBUG: Found {len(products)} products from {api_name}")
                         all_products.extend(products)
                     else:
                         print(f"DEBUG: No products found from {api_name}")
-            except Exception as e:
-                print(f"Error getting product details from {api_name}: {e}")
+                except Exception as e:
+                    print(f"Error getting product details from {api_name}: {e}")
                 
         # 価格で昇順ソート
         sorted_products = sorted(all_products, key=lambda x: x.price if hasattr(x, 'price') else (x.get('price', float('inf')) if isinstance(x, dict) else float('inf')))
@@ -129,7 +139,7 @@ class PriceComparisonEngine:
         product_info = str(product_info).strip()
         
         # Check if this looks like a JAN code (13 digits or 8 digits)
-        is_jan_code = bool(re.match(r'^[0-9]{8}$|^[0-9]{13}$', product_info))
+        is_jan_code = looks_like_jan_code(product_info)
         
         # Check if this is a common generic category that doesn't need strict filtering
         common_categories = ['laptop', 'ノートパソコン', 'パソコン', 'タブレット', 'スマホ', 'スマートフォン', 
@@ -275,6 +285,54 @@ class PriceComparisonEngine:
         
         return sorted_products
 
+    def get_detailed_products_multi(self, keys, max_workers=16, on_done=None):
+        """
+        複数のキーワードの詳細商品情報をまとめて取得（同じキーワードは1回だけ検索）
+
+        on_done(key) はキーワードごとの取得が終わるたびに（失敗時も）呼ばれる
+
+        Returns:
+            dict: キーワード -> 商品リスト（取得に失敗したキーワードは含まない）
+        """
+        return self._run_multi(self.get_detailed_products_direct, keys, max_workers, 'detailed products', on_done)
+
+    def compare_prices_multi(self, keys, max_workers=16, on_done=None):
+        """
+        複数のキーワードの価格比較をまとめて実行（同じキーワードは1回だけ検索）
+
+        on_done(key) はキーワードごとの比較が終わるたびに（失敗時も）呼ばれる
+
+        Returns:
+            dict: キーワード -> 価格比較結果（失敗したキーワードは含まない）
+        """
+        return self._run_multi(
+            lambda key: self.compare_prices_with_model_numbers([key]), keys, max_workers, 'price comparison', on_done
+        )
+
+    def _run_multi(self, fetch, keys, max_workers, label, on_done=None):
+        """
+        キーワードごとの検索を並列に実行し、キーワードをキーとする辞書で返す
+        """
+        unique_keys = list(dict.fromkeys(keys))
+        results = {}
+        if not unique_keys:
+            return results
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(unique_keys)))) as executor:
+            future_to_key = {executor.submit(fetch, key): key for key in unique_keys}
+            # Handle keys as they finish so on_done reports progress during the fetch
+            for future in as_completed(future_to_key):
+                key = future_to_key[future]
+                try:
+                    results[key] = future.result()
+                except Exception as e:
+                    print(f"Error getting {label} for '{key}': {e}")
+                if on_done is not None:
+                    on_done(key)
+
+        print(f"DEBUG: Fetched {label} for {len(results)}/{len(unique_keys)} unique keys")
+        return results
+
     def _get_multiple_prices(self, api_name, api, product_info):
         """
         各APIから複数の価格情報を取得
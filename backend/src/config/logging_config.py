@@ -0,0 +1,31 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+_listener = None
+
+def configure_logging(level=None):
+    """
+    ルートロガーを一度だけ設定する
+
+    リクエスト処理スレッドはキューに積むだけで、stderr への書き込みは
+    QueueListener のスレッドが行う。
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s [%(name)s] %(message)s'))
+
+    root = logging.getLogger()
+    root.setLevel((level or os.getenv('LOG_LEVEL', 'INFO')).upper())
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
@@ -2,6 +2,7 @@
 SQLite Database Module
 Handles database initialization, connection, and schema management
 """
+import os
 import sqlite3
 import json
 from pathlib import Path
@@ -9,6 +10,10 @@ from typing import Optional, Dict, Any, List
 from datetime import datetime
 from contextlib import contextmanager
 
+# SQLITE_DURABLE=1 fsyncs every commit (synchronous=FULL); by default WAL commits only
+# fsync at checkpoints, which is still atomic but may lose the last commits on power loss
+SQLITE_SYNCHRONOUS = 'FULL' if os.getenv('SQLITE_DURABLE', '0') == '1' else 'NORMAL'
+
 class Database:
     """
     SQLite database manager
@@ -23,6 +28,7 @@ class Database:
         """Get database connection with context manager"""
         conn = sqlite3.connect(str(self.db_path))
         conn.row_factory = sqlite3.Row  # Enable column access by name
+        conn.execute(f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}")
         try:
             yield conn
             conn.commit()
@@ -37,6 +43,10 @@ class Database:
         with self.get_connection() as conn:
             cursor = conn.cursor()
             
+            # WAL: writers append to the log instead of rewriting pages through a rollback journal
+            # (the mode is stored in the database file, so setting it once is enough)
+            cursor.execute("PRAGMA journal_mode = WAL")
+            
             # Listings table
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS listings (
@@ -4,8 +4,10 @@ Blacklist Model for Prohibited/Restricted Products
 from typing import List, Optional, Dict, Any
 from enum import Enum
 from pathlib import Path
+import functools
 import json
 import os
+import re
 import uuid
 from datetime import datetime
 from src.database.db import get_db
@@ -65,6 +67,31 @@ class BlacklistEntry:
             metadata=data.get('metadata', {})
         )
 
+def _any_substring_re(values) -> re.Pattern:
+    """Pattern that matches if any of the values occurs in a string"""
+    # Longest first; an empty alternation would match everything, so (?!) never matches
+    return re.compile('|'.join(map(re.escape, sorted(set(values), key=len, reverse=True))) or '(?!)')
+
+class _BlacklistIndex:
+    """
+    Lookup structures built from the blacklist entries
+    
+    ASINs are exact matches, so they get a dict (first entry wins, like the list scan).
+    Manufacturer and keyword rules are substring matches in either direction, so the
+    checks use these as one-pass prefilters and only walk the entry list on a hit.
+    """
+    def __init__(self, entries: Dict[str, List['BlacklistEntry']]):
+        self.asins: Dict[str, BlacklistEntry] = {}
+        for entry in entries[BlacklistType.ASIN.value]:
+            self.asins.setdefault(entry.value, entry)
+        
+        manufacturer_values = [entry.value for entry in entries[BlacklistType.MANUFACTURER.value]]
+        self.manufacturer_re = _any_substring_re(manufacturer_values)
+        # "name in value" for any value becomes one substring test on the joined values
+        self.manufacturer_values = '\x00'.join(manufacturer_values)
+        
+        self.keyword_re = _any_substring_re(entry.value for entry in entries[BlacklistType.KEYWORD.value])
+
 class BlacklistManager:
     """
     Manages blacklist entries and provides checking functionality using SQLite
@@ -78,12 +105,22 @@ class BlacklistManager:
             BlacklistType.BRAND.value: []
         }
         self.db = get_db()
+        # Bumped on every change to the in-memory entries; part of the check_product cache key
+        self._version = 0
+        self._check_cached = functools.lru_cache(maxsize=16384)(self._check_product_uncached)
+        # Lookup structures over the entries, rebuilt when _version changes
+        self._index = None
+        self._index_version = None
         self._load_default_blacklist()
         self._load_from_database()
     
     def _load_from_database(self):
         """Load blacklist entries from database"""
         rows = self.db.fetch_all("SELECT * FROM blacklist_entries")
+        existing_values = {
+            entry_type: {e.value for e in entries}
+            for entry_type, entries in self.entries.items()
+        }
         for row in rows:
             entry = BlacklistEntry(
                 entry_id=row['entry_id'],
@@ -96,9 +133,10 @@ class BlacklistManager:
             )
             # Only add if not already in memory (check by value, not object identity)
             entry_type = entry.entry_type.value
-            existing_values = [e.value for e in self.entries[entry_type]]
-            if entry.value not in existing_values:
+            if entry.value not in existing_values[entry_type]:
                 self.entries[entry_type].append(entry)
+                existing_values[entry_type].add(entry.value)
+                self._version += 1
     
     def _load_default_blacklist(self):
         """Load default blacklist entries based on real-world Amazon restrictions"""
@@ -280,6 +318,7 @@ class BlacklistManager:
         existing_values = [e.value for e in self.entries[entry_type]]
         if entry.value not in existing_values:
             self.entries[entry_type].append(entry)
+            self._version += 1
             # Save to database (check if exists first to avoid UNIQUE constraint violation)
             try:
                 with self.db.get_connection() as conn:
@@ -340,6 +379,7 @@ class BlacklistManager:
             for entry in entry_list:
                 if entry.entry_id == entry_id:
                     entry_list.remove(entry)
+                    self._version += 1
                     removed = True
                     break
             if removed:
@@ -354,19 +394,26 @@ class BlacklistManager:
         
         return removed
     
+    def _get_index(self) -> '_BlacklistIndex':
+        """Lookup structures for the current entries (rebuilt after any change)"""
+        if self._index_version != self._version:
+            self._index = _BlacklistIndex(self.entries)
+            self._index_version = self._version
+        return self._index
+    
     def check_asin(self, asin: str) -> Optional[BlacklistEntry]:
         """Check if ASIN is blacklisted"""
-        asin_lower = asin.lower()
-        for entry in self.entries[BlacklistType.ASIN.value]:
-            if entry.value == asin_lower:
-                return entry
-        return None
+        return self._get_index().asins.get(asin.lower())
     
     def check_manufacturer(self, manufacturer: str) -> Optional[BlacklistEntry]:
         """Check if manufacturer is blacklisted"""
         if not manufacturer:
             return None
         manufacturer_lower = manufacturer.lower()
+        index = self._get_index()
+        # Skip the scan when no entry is contained in the name and the name is in no entry
+        if not index.manufacturer_re.search(manufacturer_lower) and manufacturer_lower not in index.manufacturer_values:
+            return None
         for entry in self.entries[BlacklistType.MANUFACTURER.value]:
             if entry.value in manufacturer_lower or manufacturer_lower in entry.value:
                 return entry
@@ -377,6 +424,9 @@ class BlacklistManager:
         if not text:
             return []
         text_lower = text.lower()
+        # One scan over the text first; most titles match no keyword at all
+        if not self._get_index().keyword_re.search(text_lower):
+            return []
         matches = []
         for entry in self.entries[BlacklistType.KEYWORD.value]:
             if entry.value in text_lower:
@@ -404,7 +454,21 @@ class BlacklistManager:
         """
         Comprehensive product blacklist check
         Returns dict with is_blocked flag and reasons
+        
+        Results are cached per blacklist version; the returned dict is shared, so don't mutate it.
         """
+        return self._check_cached(self._version, asin, title, manufacturer, category, brand)
+    
+    def _check_product_uncached(
+        self,
+        version: int,
+        asin: str,
+        title: str,
+        manufacturer: str,
+        category: str,
+        brand: str
+    ) -> Dict[str, Any]:
+        """Run the blacklist rules for check_product (version only keys the cache)"""
         reasons = []
         severity = "low"
         
@@ -458,6 +522,15 @@ class BlacklistManager:
             }
         }
     
+    def get_entries_version(self) -> str:
+        """
+        Return a token that changes whenever a blacklist entry is added or removed
+        
+        Read from the database so it stays consistent across worker processes.
+        """
+        row = self.db.fetch_one("SELECT COUNT(*) AS count, MAX(updated_at) AS last_updated FROM blacklist_entries")
+        return f"{row['count']}:{row['last_updated'] or ''}"
+    
     def get_all_entries(self) -> List[Dict[str, Any]]:
         """Get all blacklist entries from database"""
         rows = self.db.fetch_all("SELECT * FROM blacklist_entries ORDER BY created_at DESC")
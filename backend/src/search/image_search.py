@@ -2,12 +2,33 @@ import requests
 import base64
 import json
 import io
+import hashlib
+from ..cache.ttl_cache import TTLCache
 from ..config.settings import GOOGLE_CLOUD_API_KEY, GOOGLE_VISION_API_ENDPOINT
 
+# 型番抽出用のVision API機能
+TEXT_DETECTION_FEATURES = [
+    {"type": "TEXT_DETECTION", "maxResults": 10}
+]
+
+# 画像内容の分析用のVision API機能
+CONTENT_ANALYSIS_FEATURES = [
+    {"type": "LABEL_DETECTION", "maxResults": 20},
+    {"type": "OBJECT_LOCALIZATION", "maxResults": 10},
+    {"type": "LOGO_DETECTION", "maxResults": 5},
+    {"type": "IMAGE_PROPERTIES", "maxResults": 5},
+    {"type": "WEB_DETECTION", "maxResults": 5}
+]
+
+# 型番抽出と内容分析を1回のリクエストで行うためのVision API機能
+PRODUCT_ANALYSIS_FEATURES = TEXT_DETECTION_FEATURES + CONTENT_ANALYSIS_FEATURES
+
 class ImageSearchEngine:
     def __init__(self):
         self.api_key = GOOGLE_CLOUD_API_KEY
         self.endpoint = GOOGLE_VISION_API_ENDPOINT
+        # 同じ画像の再アップロードでVision APIを再度呼ばないためのキャッシュ
+        self.annotation_cache = TTLCache(maxsize=2048, ttl=24 * 60 * 60)
 
     def search_similar_images(self, image_data=None, image_url=None):
         """
@@ -66,6 +87,65 @@ class ImageSearchEngine:
             print(f"Error in image search: {e}")
             return self._get_fallback_results()
 
+    def _annotate_image(self, features, image_data=None, image_url=None):
+        """
+        Google Cloud Vision API で画像を解析し、最初のレスポンスを返す（失敗時はNone）
+        画像データの解析結果は内容のハッシュ単位でキャッシュする
+        image_data は bytes のほか memoryview などのバッファも受け付ける
+
+        画像データの場合は features に関係なく PRODUCT_ANALYSIS_FEATURES（全機能）を
+        1回だけ要求するので、型番抽出・内容分析・まとめての解析が同じキャッシュを共有する
+        """
+        cache_key = None
+        if image_data:
+            features = PRODUCT_ANALYSIS_FEATURES
+            cache_key = hashlib.blake2b(image_data, digest_size=16).hexdigest()
+            cached = self.annotation_cache.get(cache_key)
+            if cached is not None:
+                print(f"Using cached Vision API result for image {cache_key}")
+                return cached
+        
+        # Google Cloud Vision APIリクエストの準備
+        request_data = {
+            "requests": [
+                {
+                    "features": features
+                }
+            ]
+        }
+        
+        # 画像データまたはURLを設定
+        if image_data:
+            # Base64エンコードされた画像データを使用
+            request_data["requests"][0]["image"] = {
+                "content": base64.b64encode(image_data).decode('utf-8')
+            }
+        else:
+            # 画像URLを使用
+            request_data["requests"][0]["image"] = {
+                "source": {
+                    "imageUri": image_url
+                }
+            }
+        
+        # APIリクエストを送信
+        api_url = f"{self.endpoint}?key={self.api_key}"
+        print(f"Sending request to Google Vision API ({', '.join(feature['type'] for feature in features)})")
+        response = requests.post(api_url, json=request_data)
+        
+        if response.status_code != 200:
+            print(f"Error in Google Vision API: {response.status_code} - {response.text}")
+            return None
+            
+        result = response.json()
+        if not result.get('responses'):
+            return None
+            
+        annotation = result['responses'][0]
+        if cache_key is not None:
+            self.annotation_cache.set(cache_key, annotation)
+        return annotation
+
     def extract_model_numbers(self, image_data=None, image_url=None):
         """
         画像からモデル番号を抽出
@@ -74,53 +154,12 @@ class ImageSearchEngine:
             if not image_data and not image_url:
                 raise ValueError("Either image_data or image_url must be provided")
                 
-            # Google Cloud Vision APIリクエストの準備
-            request_data = {
-                "requests": [
-                    {
-                        "features": [
-                            {
-                                "type": "TEXT_DETECTION",
-                                "maxResults": 10
-                            }
-                        ]
-                    }
-                ]
-            }
-            
-            # 画像データまたはURLを設定
-            if image_data:
-                # Base64エンコードされた画像データを使用
-                request_data["requests"][0]["image"] = {
-                    "content": base64.b64encode(image_data).decode('utf-8')
-                }
-            else:
-                # 画像URLを使用
-                request_data["requests"][0]["image"] = {
-                    "source": {
-                        "imageUri": image_url
-                    }
-                }
-            
-            # APIリクエストを送信
-            api_url = f"{self.endpoint}?key={self.api_key}"
-            print(f"Sending request to Google Vision API for text detection: {api_url}")
-            
             try:
-                response = requests.post(api_url, json=request_data)
-                
-                if response.status_code != 200:
-                    print(f"Error in Google Vision API: {response.status_code} - {response.text}")
+                annotation = self._annotate_image(TEXT_DETECTION_FEATURES, image_data, image_url)
+                if annotation is None:
                     return []
-                    
-                result = response.json()
                 
-                # レスポンスからテキストを抽出
-                if 'responses' in result and len(result['responses']) > 0:
-                    text_annotations = result['responses'][0].get('textAnnotations', [])
-                    return self._extract_model_numbers_from_text(text_annotations)
-                
-                return []
+                return self._model_numbers_from_annotation(annotation)
             except Exception as e:
                 print(f"Exception during Google Vision API request: {e}")
                 # Return empty list instead of failing
@@ -130,6 +169,58 @@ class ImageSearchEngine:
             print(f"Error in extract_model_numbers: {e}")
             return []
     
+    def analyze_product_image(self, image_data=None, image_url=None):
+        """
+        型番抽出と内容分析を1回のVision APIリクエストで行う
+
+        Returns:
+            tuple: (extract_model_numbers と同じ型番リスト, analyze_image_content と同じ検索キーワード)
+        """
+        try:
+            if not image_data and not image_url:
+                raise ValueError("Either image_data or image_url must be provided")
+            
+            annotation = self._annotate_image(PRODUCT_ANALYSIS_FEATURES, image_data, image_url)
+            if annotation is None:
+                return [], self._get_fallback_generic_term()
+            
+            return (
+                self._model_numbers_from_annotation(annotation),
+                self._content_term_from_annotation(annotation)
+            )
+        except Exception as e:
+            print(f"Error in analyze_product_image: {e}")
+            return [], self._get_fallback_generic_term()
+    
+    def _model_numbers_from_annotation(self, annotation):
+        """
+        Vision APIのレスポンスからテキストを取り出して型番を抽出
+        """
+        # レスポンスからテキストを抽出
+        text_annotations = annotation.get('textAnnotations', [])
+        return self._extract_model_numbers_from_text(text_annotations)
+    
+    def _content_term_from_annotation(self, annotation):
+        """
+        Vision APIのレスポンスから画像内容を表す検索キーワードを生成
+        """
+        # レスポンスからより詳細な情報を抽出
+        # ラベル検出結果
+        labels = annotation.get('labelAnnotations', [])
+        
+        # オブジェクト検出結果
+        objects = annotation.get('localizedObjectAnnotations', [])
+        
+        # ロゴ検出結果
+        logos = annotation.get('logoAnnotations', [])
+        
+        # Web検出結果
+        web_detection = annotation.get('webDetection', {})
+        web_entities = web_detection.get('webEntities', [])
+        
+        # 詳細な情報を元に検索キーワードを生成
+        return self._generate_detailed_search_term(labels, objects, logos, web_entities)
+    
     def _extract_model_numbers_from_text(self, text_annotations):
         """
         テキスト注釈からモデル番号を抽出
@@ -183,85 +274,13 @@ class ImageSearchEngine:
             if not image_data and not image_url:
                 raise ValueError("Either image_data or image_url must be provided")
                 
-            # Google Cloud Vision APIリクエストの準備 - 検出機能を増やす
-            request_data = {
-                "requests": [
-                    {
-                        "features": [
-                            {
-                                "type": "LABEL_DETECTION",
-                                "maxResults": 20
-                            },
-                            {
-                                "type": "OBJECT_LOCALIZATION",
-                                "maxResults": 10
-                            },
-                            {
-                                "type": "LOGO_DETECTION",
-                                "maxResults": 5
-                            },
-                            {
-                                "type": "IMAGE_PROPERTIES",
-                                "maxResults": 5
-                            },
-                            {
-                                "type": "WEB_DETECTION",
-                                "maxResults": 5
-                            }
-                        ]
-                    }
-                ]
-            }
-            
-            # 画像データまたはURLを設定
-            if image_data:
-                # Base64エンコードされた画像データを使用
-                request_data["requests"][0]["image"] = {
-                    "content": base64.b64encode(image_data).decode('utf-8')
-                }
-            else:
-                # 画像URLを使用
-                request_data["requests"][0]["image"] = {
-                    "source": {
-                        "imageUri": image_url
-                    }
-                }
-            
-            # APIリクエストを送信
-            api_url = f"{self.endpoint}?key={self.api_key}"
-            print(f"Sending request to Google Vision API for image analysis: {api_url}")
-            
             try:
-                response = requests.post(api_url, json=request_data)
-                
-                if response.status_code != 200:
-                    print(f"Error in Google Vision API: {response.status_code} - {response.text}")
+                annotation = self._annotate_image(CONTENT_ANALYSIS_FEATURES, image_data, image_url)
+                if annotation is None:
                     # Return a fallback term instead of failing
                     return self._get_fallback_generic_term()
-                    
-                result = response.json()
-                
-                # レスポンスからより詳細な情報を抽出
-                if 'responses' in result and len(result['responses']) > 0:
-                    response = result['responses'][0]
-                    
-                    # ラベル検出結果
-                    labels = response.get('labelAnnotations', [])
-                    
-                    # オブジェクト検出結果
-                    objects = response.get('localizedObjectAnnotations', [])
-                    
-                    # ロゴ検出結果
-                    logos = response.get('logoAnnotations', [])
-                    
-                    # Web検出結果
-                    web_detection = response.get('webDetection', {})
-                    web_entities = web_detection.get('webEntities', [])
-                    
-                    # 詳細な情報を元に検索キーワードを生成
-                    return self._generate_detailed_search_term(labels, objects, logos, web_entities)
                 
-                return self._get_fallback_generic_term()
+                return self._content_term_from_annotation(annotation)
             except Exception as e:
                 print(f"Exception during Google Vision API request: {e}")
                 # Return a fallback term instead of failing
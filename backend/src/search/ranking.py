@@ -0,0 +1,38 @@
+"""
+Vectorized top-k selection for large product batches
+"""
+import numpy as np
+
+# これより少ない件数では heapq.nsmallest の方が速い
+VECTORIZE_THRESHOLD = 256
+
+def top_k_indices(prices, rankings, k):
+    """
+    価格（昇順、0は最後）とランキング（降順）で上位k件のインデックスを返す
+
+    Args:
+        prices: 各商品の価格（価格なしは0）
+        rankings: 各商品のランキング（なしは0）
+        k: 取得する件数
+
+    Returns:
+        numpy.ndarray: 選択された商品のインデックス（順位順）
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    rankings = np.asarray(rankings, dtype=np.float64)
+    prices = np.where(prices == 0, np.inf, prices)
+
+    n = len(prices)
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.intp)
+
+    # k番目の価格以下の候補だけを並べ替える（全件ソートを避ける）
+    if k < n:
+        kth_price = np.partition(prices, k - 1)[k - 1]
+        candidates = np.flatnonzero(prices <= kth_price)
+    else:
+        candidates = np.arange(n)
+
+    # lexsort は安定なので、同順位は元の順序を保つ
+    order = np.lexsort((-rankings[candidates], prices[candidates]))
+    return candidates[order[:k]]
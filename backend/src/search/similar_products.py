@@ -1,11 +1,18 @@
 from src.api.perplexity_client import perplexity_client
 from src.utils.helpers import clean_text, validate_product_info
 from src.comparison.price_compare import PriceComparisonEngine
+from src.cache.ttl_cache import TTLCache
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+# AI APIへの同時リクエスト数の上限（レート制限に合わせて調整）
+MAX_CONCURRENT_REQUESTS = int(os.getenv('KEYWORD_MAX_CONCURRENCY', '16'))
 
 class ProductSearchEngine:
     def __init__(self):
         self.ai_client = perplexity_client
         self.price_comparison = PriceComparisonEngine()
+        self.keyword_cache = TTLCache(maxsize=65536, ttl=24 * 60 * 60)
 
     def search(self, search_term):
         """
@@ -176,26 +183,48 @@ class ProductSearchEngine:
         unique_keywords = list(dict.fromkeys(keywords))
         return unique_keywords[:3]  # 上位3つのキーワードを返す
 
-    def batch_generate_keywords(self, product_info_list):
+    def _cached_search_keywords(self, product_info):
+        """
+        generate_search_keywords の結果をキャッシュして返す（空の結果はキャッシュしない）
+        """
+        keywords = self.keyword_cache.get(product_info)
+        if keywords is None:
+            keywords = self.generate_search_keywords(product_info)
+            if keywords:
+                self.keyword_cache.set(product_info, keywords)
+        return list(keywords)
+
+    def _generate_keywords_entry(self, product_info):
+        """
+        1件の商品情報からキーワードを生成（失敗時は元の語をそのまま使用）
+        """
+        try:
+            keywords = self._cached_search_keywords(product_info)
+            return {
+                'product_info': product_info,
+                'keywords': keywords,
+                'error': None
+            }
+        except Exception as e:
+            print(f"Error generating keywords for '{product_info}': {e}")
+            # Return the original term as fallback
+            return {
+                'product_info': product_info,
+                'keywords': [product_info],
+                'error': str(e)
+            }
+
+    def batch_generate_keywords(self, product_info_list, max_workers=MAX_CONCURRENT_REQUESTS):
         """
         複数の商品情報から一括でキーワードを生成
+        AI APIへの同時リクエスト数は max_workers までに制限する
         """
-        results = []
-        for product_info in product_info_list:
-            try:
-                keywords = self.generate_search_keywords(product_info)
-                results.append({
-                    'product_info': product_info,
-                    'keywords': keywords,
-                    'error': None
-                })
-            except Exception as e:
-                print(f"Error generating keywords for '{product_info}': {e}")
-                # Return the original term as fallback
-                results.append({
-                    'product_info': product_info,
-                    'keywords': [product_info],
-                    'error': str(e)
-                })
-        
-        return results 
\ No newline at end of file
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(self._generate_keywords_entry, product_info_list))
+
+    def batch_find_model_numbers(self, keywords, max_workers=MAX_CONCURRENT_REQUESTS):
+        """
+        複数のキーワードから関連する型番を並列に検索
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(self.find_model_numbers, keywords))
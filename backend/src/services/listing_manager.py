@@ -275,6 +275,16 @@ class ListingManager:
         rows = self.db.fetch_all(query, tuple(params))
         return [self._listing_from_row(row) for row in rows]
     
+    def get_listings_version(self) -> str:
+        """
+        Return a token that changes whenever any listing is created, updated or deleted
+        
+        Every write path stamps updated_at (or changes the row count), and the token is
+        read from the database so it stays consistent across worker processes.
+        """
+        row = self.db.fetch_one("SELECT COUNT(*) AS count, MAX(updated_at) AS last_updated FROM listings")
+        return f"{row['count']}:{row['last_updated'] or ''}"
+    
     def update_listing(
         self,
         listing_id: str,
@@ -4,14 +4,25 @@ Stock Monitoring Service
 """
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
+import os
 import time
 import threading
+from concurrent.futures import ThreadPoolExecutor
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
 from src.models.listing import ProductListing
 from src.api.amazon_api import amazon_api
 from src.api.us_amazon_api import us_amazon_api
 from src.services.listing_manager import ListingManager
 from src.services.profit_calculator import ProfitCalculator
 
+# Listings checked concurrently (each check waits on the JP/US Amazon APIs)
+CHECK_MAX_WORKERS = int(os.getenv('STOCK_CHECK_MAX_WORKERS', '8'))
+# How often a worker that lost the monitor lock tries to take it over (seconds)
+LOCK_RETRY_SECONDS = int(os.getenv('STOCK_MONITOR_LOCK_RETRY_SECONDS', '60'))
+
 class StockMonitor:
     """
     Monitors stock status and prices for product listings
@@ -24,31 +35,88 @@ class StockMonitor:
         check_interval_hours: int = 24,
         auto_stop_on_out_of_stock: bool = True,
         auto_update_prices: bool = True,
-        auto_stop_low_profit: bool = True
+        auto_stop_low_profit: bool = True,
+        max_workers: int = CHECK_MAX_WORKERS
     ):
         self.listing_manager = listing_manager
         self.check_interval_hours = check_interval_hours
         self.auto_stop_on_out_of_stock = auto_stop_on_out_of_stock
         self.auto_update_prices = auto_update_prices
         self.auto_stop_low_profit = auto_stop_low_profit
+        self.max_workers = max_workers
         self.profit_calculator = ProfitCalculator()
         self.monitoring = False
         self.monitor_thread: Optional[threading.Thread] = None
         self.last_check_time: Dict[str, datetime] = {}
+        self._lock_file = None
+        self._lock_waiter: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
     
-    def start_monitoring(self):
-        """Start automatic monitoring in background thread"""
+    def start_monitoring(self, lock_path: Optional[str] = None) -> bool:
+        """
+        Start automatic monitoring in background thread
+        
+        When lock_path is given, only the process holding an exclusive lock on
+        that file runs the loop, so multiple server workers don't each start one.
+        Workers that don't get the lock keep retrying in the background, so
+        monitoring resumes if the worker holding it exits.
+        Returns True if this process started monitoring.
+        """
         if self.monitoring:
-            return
+            return True
+        self._stopped.clear()
+        
+        if lock_path and not self._acquire_lock(lock_path):
+            print("Stock monitoring is owned by another worker")
+            self._wait_for_lock(lock_path)
+            return False
         
+        self._start_loop()
+        return True
+    
+    def _start_loop(self):
         self.monitoring = True
         self.monitor_thread = threading.Thread(target=self._monitoring_loop, daemon=True)
         self.monitor_thread.start()
         print("Stock monitoring started")
     
+    def _wait_for_lock(self, lock_path: str):
+        """Retry the monitor lock every LOCK_RETRY_SECONDS and start monitoring once it is ours"""
+        if self._lock_waiter and self._lock_waiter.is_alive():
+            return
+        
+        def wait():
+            while not self._stopped.wait(LOCK_RETRY_SECONDS):
+                if self.monitoring:
+                    return
+                if self._acquire_lock(lock_path):
+                    print("Took over stock monitoring lock")
+                    self._start_loop()
+                    return
+        
+        self._lock_waiter = threading.Thread(target=wait, name='stock-monitor-lock', daemon=True)
+        self._lock_waiter.start()
+    
+    def _acquire_lock(self, lock_path: str) -> bool:
+        """Take a non-blocking exclusive lock held for the lifetime of the process"""
+        if fcntl is None:
+            return True
+        
+        os.makedirs(os.path.dirname(lock_path) or '.', exist_ok=True)
+        lock_file = open(lock_path, 'w')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        
+        self._lock_file = lock_file
+        return True
+    
     def stop_monitoring(self):
         """Stop automatic monitoring"""
         self.monitoring = False
+        self._stopped.set()
         if self.monitor_thread:
             self.monitor_thread.join(timeout=5)
         print("Stock monitoring stopped")
@@ -63,11 +131,7 @@ class StockMonitor:
                 print(f"Monitoring {len(active_listings)} active listings...")
                 
                 # Check each listing
-                for listing in active_listings:
-                    try:
-                        self.check_listing(listing.listing_id)
-                    except Exception as e:
-                        print(f"Error checking listing {listing.listing_id}: {e}")
+                self._check_listings([listing.listing_id for listing in active_listings])
                 
                 # Wait for next check interval
                 time.sleep(self.check_interval_hours * 3600)
@@ -75,6 +139,21 @@ class StockMonitor:
                 print(f"Error in monitoring loop: {e}")
                 time.sleep(60)  # Wait 1 minute before retrying
     
+    def _check_listing_safe(self, listing_id: str) -> Optional[Dict[str, Any]]:
+        """Check a listing, returning None instead of raising on error"""
+        try:
+            return self.check_listing(listing_id)
+        except Exception as e:
+            print(f"Error checking listing {listing_id}: {e}")
+            return None
+    
+    def _check_listings(self, listing_ids: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """Check listings concurrently (up to max_workers at a time), results in input order"""
+        if not listing_ids:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(listing_ids))) as executor:
+            return list(executor.map(self._check_listing_safe, listing_ids))
+    
     def check_listing(self, listing_id: str) -> Dict[str, Any]:
         """
         Check a single listing for stock and price updates
@@ -241,21 +320,19 @@ class StockMonitor:
             'errors': 0
         }
         
-        for listing in active_listings:
-            try:
-                check_result = self.check_listing(listing.listing_id)
-                results['checked'] += 1
+        for check_result in self._check_listings([listing.listing_id for listing in active_listings]):
+            if check_result is None:
+                results['errors'] += 1
+                continue
+            results['checked'] += 1
+            
+            if check_result.get('success'):
+                if check_result.get('updates'):
+                    results['updated'] += 1
                 
-                if check_result.get('success'):
-                    if check_result.get('updates'):
-                        results['updated'] += 1
-                    
-                    if 'auto_stopped_reason' in check_result.get('updates', {}):
-                        results['auto_stopped'] += 1
-                else:
-                    results['errors'] += 1
-            except Exception as e:
-                print(f"Error checking listing {listing.listing_id}: {e}")
+                if 'auto_stopped_reason' in check_result.get('updates', {}):
+                    results['auto_stopped'] += 1
+            else:
                 results['errors'] += 1
         
         return results
@@ -3,18 +3,72 @@ import re
 import requests
 import sys
 import json
-from dotenv import load_dotenv
 import time
+from concurrent.futures import ThreadPoolExecutor
+from src.config.settings import PERPLEXITY_API_KEY
 
-# Load environment variables
-load_dotenv()
+# Maximum number of bulk keyword requests in flight at once
+BULK_MAX_WORKERS = 4
+
+# clean_model_number のパターン（呼び出しごとに re のキャッシュを引かない）
+_LEADING_NUMBER_RE = re.compile(r'^\d+[\s\.:]?\s*')
+_MODEL_PREFIX_RE = re.compile(r'^型番[:：]?\s*')
+_PROMPT_PHRASES = ('下記の商品', '検索キーワード', 'プロンプト', '出力は商品名', 'メーカー名')
+
+# キーワード生成プロンプトの固定部分（商品ごとに変わるのは間に入る型番・商品情報だけ）
+_PRODUCT_INFO_PROMPT_PREFIX = """
+                下記の商品情報から重要なキーワードを組み合わせて表現を変えて
+                類似品を検索しやすいように検索キーワードを作成してください。
+                商品の情報や特徴を組み合わせて重要な検索キーワードを１個抽出してください。
+                出力は商品名＋商品の特徴＋サイズや重量は近いものでお願いします。
+                既存のメーカーを選定しないように、メーカー名、型番は記載しないようにお願いします。
+                英語の場合は日本語に翻訳してください。
+                情報が少ない場合は、型番から製品の種類を推測し、一般的な用途や特徴を考慮してキーワードを生成してください。
+                単に型番をそのまま返すのではなく、その型番が表す可能性のある製品の一般名称や特徴を推測してください。
+                
+                """
+_MODEL_NUMBER_PROMPT_PREFIX = """
+                下記の商品名、型番、仕様情報から重要なキーワードを組み合わせて表現を変えて
+                類似品を検索しやすいように検索キーワードを作成してください。
+                商品の情報や特徴を組み合わせて重要な検索キーワードを１個抽出してください。
+                出力は商品名＋商品の特徴＋サイズや重量は近いものでお願いします。
+                既存のメーカーを選定しないように、メーカー名、型番は記載しないようにお願いします。
+                英語の場合は日本語に翻訳してください。
+                情報が少ない場合は、型番から製品の種類を推測し、一般的な用途や特徴を考慮してキーワードを生成してください。
+                単に型番をそのまま返すのではなく、その型番が表す可能性のある製品の一般名称や特徴を推測してください。
+                
+                型番 """
+_KEYWORD_PROMPT_SUFFIX = """
+                
+                最適な検索キーワードを1つだけ出力してください。余計な説明は不要です。
+                """
+_KEYWORD_SYSTEM_PROMPT = "あなたは製品型番から最適な検索キーワードを生成する専門家です。型番を見て、その製品が何であるかを推測し、具体的な特徴や用途を含む日本語のキーワードを1つ生成してください。単に型番をそのまま返すのではなく、その製品を表す一般的な名称や特徴を提供してください。例えば「EA628W-25B」という型番からは「25mm幅 耐久性 防水テープ」のようなキーワードを生成します。"
+
+_BULK_PROMPT_PREFIX = """
+        下記の各商品について、商品情報から重要なキーワードを組み合わせて表現を変えて
+        類似品を検索しやすいように検索キーワードを作成してください。
+        商品の情報や特徴を組み合わせて重要な検索キーワードを商品ごとに１個抽出してください。
+        出力は商品名＋商品の特徴＋サイズや重量は近いものでお願いします。
+        既存のメーカーを選定しないように、メーカー名、型番は記載しないようにお願いします。
+        英語の場合は日本語に翻訳してください。
+        情報が少ない場合は、型番から製品の種類を推測し、一般的な用途や特徴を考慮してキーワードを生成してください。
+        単に型番をそのまま返すのではなく、その型番が表す可能性のある製品の一般名称や特徴を推測してください。
+        
+        """
+_BULK_PROMPT_SUFFIX = """
+        
+        回答形式：
+        [{"model_number": "型番", "keyword": "検索キーワード"}, ...]
+        
+        JSON配列だけを出力してください。余計な説明は不要です。
+        """
+_BULK_KEYWORD_SYSTEM_PROMPT = "あなたは製品型番から最適な検索キーワードを生成する専門家です。各型番について、その製品が何であるかを推測し、具体的な特徴や用途を含む日本語のキーワードを1つずつ生成してください。回答はJSON形式で提供してください。"
 
 class BatchKeywordGenerator:
-    def __init__(self):
-        self.api_key = os.environ.get('PERPLEXITY_API_KEY')
+    def __init__(self, api_key=None):
+        self.api_key = api_key or PERPLEXITY_API_KEY
         if not self.api_key:
-            print("Error: PERPLEXITY_API_KEY environment variable is not set.")
-            sys.exit(1)
+            raise ValueError("PERPLEXITY_API_KEY environment variable is not set.")
         
         self.endpoint = "https://api.perplexity.ai/chat/completions"
         self.headers = {
@@ -35,17 +89,38 @@ class BatchKeywordGenerator:
         model_number = str(model_number).strip()
         
         # Remove numbering at the beginning (e.g., "1 EA628W-25B" -> "EA628W-25B")
-        model_number = re.sub(r'^\d+[\s\.:]?\s*', '', model_number)
+        model_number = _LEADING_NUMBER_RE.sub('', model_number)
         
         # Remove "型番:" prefix if present
-        model_number = re.sub(r'^型番[:：]?\s*', '', model_number)
+        model_number = _MODEL_PREFIX_RE.sub('', model_number)
         
         # Remove any text that looks like part of a prompt
-        if any(phrase in model_number for phrase in ['下記の商品', '検索キーワード', 'プロンプト', '出力は商品名', 'メーカー名']):
+        if any(phrase in model_number for phrase in _PROMPT_PHRASES):
             return ""
             
         return model_number.strip()
 
+    def _product_context(self, product_info):
+        """
+        Build the prompt context (model number, title, features, description) for a product info dictionary
+        """
+        context = ""
+        
+        # Build context from product info
+        if "model_number" in product_info:
+            context += f"型番: {product_info['model_number']}\n"
+        
+        if "title" in product_info and product_info["title"]:
+            context += f"商品名: {product_info['title']}\n"
+        
+        if "features" in product_info and product_info["features"]:
+            context += "特徴:\n" + "\n".join([f"- {feature}" for feature in product_info["features"]]) + "\n"
+        
+        if "description" in product_info and product_info["description"]:
+            context += f"説明: {product_info['description']}\n"
+        
+        return context
+
     def generate_keyword(self, model_number, custom_prompt=None):
         """
         Generate a search keyword for a single model number or product information
@@ -60,24 +135,8 @@ class BatchKeywordGenerator:
         # Check if model_number is a simple string or a detailed product info
         if isinstance(model_number, dict):
             # It's a product info dictionary
-            product_info = model_number
-            model_number_str = product_info.get("model_number", "")
-            context = ""
-            
-            # Build context from product info
-            if "model_number" in product_info:
-                context += f"型番: {product_info['model_number']}\n"
-            
-            if "title" in product_info and product_info["title"]:
-                context += f"商品名: {product_info['title']}\n"
-            
-            if "features" in product_info and product_info["features"]:
-                context += "特徴:\n" + "\n".join([f"- {feature}" for feature in product_info["features"]]) + "\n"
-            
-            if "description" in product_info and product_info["description"]:
-                context += f"説明: {product_info['description']}\n"
-            
-            cleaned_model = context
+            model_number_str = model_number.get("model_number", "")
+            cleaned_model = self._product_context(model_number)
         else:
             # It's just a model number string
             cleaned_model = self.clean_model_number(model_number)
@@ -92,35 +151,9 @@ class BatchKeywordGenerator:
         else:
             if isinstance(model_number, dict):
                 # Use the rich context with default instructions
-                prompt = f"""
-                下記の商品情報から重要なキーワードを組み合わせて表現を変えて
-                類似品を検索しやすいように検索キーワードを作成してください。
-                商品の情報や特徴を組み合わせて重要な検索キーワードを１個抽出してください。
-                出力は商品名＋商品の特徴＋サイズや重量は近いものでお願いします。
-                既存のメーカーを選定しないように、メーカー名、型番は記載しないようにお願いします。
-                英語の場合は日本語に翻訳してください。
-                情報が少ない場合は、型番から製品の種類を推測し、一般的な用途や特徴を考慮してキーワードを生成してください。
-                単に型番をそのまま返すのではなく、その型番が表す可能性のある製品の一般名称や特徴を推測してください。
-                
-                {cleaned_model}
-                
-                最適な検索キーワードを1つだけ出力してください。余計な説明は不要です。
-                """
+                prompt = _PRODUCT_INFO_PROMPT_PREFIX + cleaned_model + _KEYWORD_PROMPT_SUFFIX
             else:
-                prompt = f"""
-                下記の商品名、型番、仕様情報から重要なキーワードを組み合わせて表現を変えて
-                類似品を検索しやすいように検索キーワードを作成してください。
-                商品の情報や特徴を組み合わせて重要な検索キーワードを１個抽出してください。
-                出力は商品名＋商品の特徴＋サイズや重量は近いものでお願いします。
-                既存のメーカーを選定しないように、メーカー名、型番は記載しないようにお願いします。
-                英語の場合は日本語に翻訳してください。
-                情報が少ない場合は、型番から製品の種類を推測し、一般的な用途や特徴を考慮してキーワードを生成してください。
-                単に型番をそのまま返すのではなく、その型番が表す可能性のある製品の一般名称や特徴を推測してください。
-                
-                型番 {cleaned_model}
-                
-                最適な検索キーワードを1つだけ出力してください。余計な説明は不要です。
-                """
+                prompt = _MODEL_NUMBER_PROMPT_PREFIX + cleaned_model + _KEYWORD_PROMPT_SUFFIX
         
         try:
             response = requests.post(
@@ -131,7 +164,7 @@ class BatchKeywordGenerator:
                     "messages": [
                         {
                             "role": "system",
-                            "content": "あなたは製品型番から最適な検索キーワードを生成する専門家です。型番を見て、その製品が何であるかを推測し、具体的な特徴や用途を含む日本語のキーワードを1つ生成してください。単に型番をそのまま返すのではなく、その製品を表す一般的な名称や特徴を提供してください。例えば「EA628W-25B」という型番からは「25mm幅 耐久性 防水テープ」のようなキーワードを生成します。"
+                            "content": _KEYWORD_SYSTEM_PROMPT
                         },
                         {
                             "role": "user",
@@ -288,6 +321,162 @@ class BatchKeywordGenerator:
         
         return results
         
+    def _keyword_cache_file(self, model_number, custom_prompt=None):
+        """
+        Path of the keyword cache file for a model number and prompt
+        """
+        cache_key = f"{model_number}-{hash(str(custom_prompt))}"
+        return os.path.join("cache", f"keyword_{hash(cache_key)}.json")
+
+    def _read_cached_keyword(self, cache_file):
+        """
+        Return the cached result (without timestamp) if it is less than 24 hours old, otherwise None
+        """
+        if not os.path.exists(cache_file):
+            return None
+        try:
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                cached_result = json.load(f)
+        except Exception as e:
+            print(f"Error reading cache: {e}")
+            return None
+        if time.time() - cached_result.get('timestamp', 0) >= 86400:  # 24 hours
+            return None
+        cached_result.pop('timestamp', None)
+        return cached_result
+
+    def _write_cached_keyword(self, cache_file, model_number, keyword):
+        """
+        Save a generated keyword to the cache and return the result without timestamp
+        """
+        result = {
+            "model_number": model_number.strip(),
+            "keyword": keyword,
+            "timestamp": time.time()
+        }
+        with open(cache_file, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        del result['timestamp']
+        return result
+
+    def _request_bulk_keywords(self, products):
+        """
+        Generate keywords for several products with a single Perplexity request
+        
+        Returns:
+            Dictionary of model_number -> keyword (products missing from the reply are omitted)
+        """
+        product_list = "\n".join(self._product_context(product) for product in products)
+        prompt = _BULK_PROMPT_PREFIX + product_list + _BULK_PROMPT_SUFFIX
+        
+        try:
+            response = requests.post(
+                self.endpoint,
+                headers=self.headers,
+                json={
+                    "model": "sonar",
+                    "messages": [
+                        {
+                            "role": "system",
+                            "content": _BULK_KEYWORD_SYSTEM_PROMPT
+                        },
+                        {
+                            "role": "user",
+                            "content": prompt
+                        }
+                    ],
+                    "max_tokens": 100 * len(products)
+                },
+                timeout=60
+            )
+            
+            if response.status_code != 200:
+                print(f"API error: {response.status_code} - {response.text}")
+                return {}
+            
+            ai_response = response.json()["choices"][0]["message"]["content"].strip()
+            # Extract the JSON array from the response (in case there's additional text)
+            json_match = re.search(r'\[.*\]', ai_response, re.DOTALL)
+            entries = json.loads(json_match.group() if json_match else ai_response)
+            return {
+                str(entry.get("model_number", "")).strip(): str(entry.get("keyword", "")).strip()
+                for entry in entries
+                if isinstance(entry, dict) and entry.get("keyword")
+            }
+        except Exception as e:
+            print(f"Error in bulk API call: {e}")
+            return {}
+
+    def bulk_generate(self, model_numbers, custom_prompt=None, k=10, force_refresh=False):
+        """
+        Generate search keywords with one Perplexity request per k products
+        
+        Args:
+            model_numbers: List of model numbers or product information dictionaries
+            custom_prompt: Optional custom prompt template (per-model, so it falls back to batch_generate)
+            k: Number of products per request
+            force_refresh: If True, bypass cache and generate new keywords
+        
+        Returns:
+            List of dictionaries with model_number and keyword (same format as batch_generate)
+        """
+        return list(self.iter_bulk_generate(model_numbers, custom_prompt, k, force_refresh))
+
+    def iter_bulk_generate(self, model_numbers, custom_prompt=None, k=10, force_refresh=False):
+        """
+        Same as bulk_generate, but yields each result in input order as soon as its chunk is done
+        """
+        if custom_prompt:
+            # Custom prompts are written for one {model_number}; keep the per-model requests
+            yield from self.batch_generate(model_numbers, custom_prompt, force_refresh)
+            return
+        
+        os.makedirs("cache", exist_ok=True)
+        
+        # Normalize the input and answer what we can from the cache
+        items = []
+        pending = []
+        for item in model_numbers:
+            if not item:
+                continue
+            product = dict(item) if isinstance(item, dict) else {}
+            model_number = self.clean_model_number(product.get("model_number", "") if product else item)
+            if not model_number.strip():
+                continue
+            product["model_number"] = model_number
+            
+            cache_file = self._keyword_cache_file(model_number)
+            cached_result = None if force_refresh else self._read_cached_keyword(cache_file)
+            if cached_result is None:
+                pending.append((len(items), product))
+            items.append((product, cache_file, cached_result))
+        
+        # One request per chunk of k products, with the chunks sent concurrently
+        chunks = [pending[i:i + k] for i in range(0, len(pending), k)]
+        with ThreadPoolExecutor(max_workers=max(1, min(len(chunks), BULK_MAX_WORKERS))) as executor:
+            # map yields the chunk replies in submission order, which is also the input order
+            replies = zip(chunks, executor.map(
+                lambda chunk: self._request_bulk_keywords([product for _, product in chunk]),
+                chunks
+            ))
+            keywords_by_index = {}
+            for index, (product, cache_file, cached_result) in enumerate(items):
+                if cached_result is not None:
+                    yield cached_result
+                    continue
+                
+                if index not in keywords_by_index:
+                    chunk, keywords = next(replies)
+                    for chunk_index, chunk_product in chunk:
+                        keywords_by_index[chunk_index] = keywords.get(chunk_product["model_number"].strip())
+                
+                model_number = product["model_number"]
+                keyword = keywords_by_index.pop(index)
+                if not keyword:
+                    # Not in the bulk reply: fall back to a single request for this product
+                    keyword = self.generate_keyword(product)
+                yield self._write_cached_keyword(cache_file, model_number, keyword)
+        
     def find_best_model(self, model_numbers, criteria_prompt):
         """
         Find the best model number that meets the criteria specified in the prompt
@@ -482,7 +671,11 @@ def main():
             sys.exit(1)
     
     # Generate keywords
-    generator = BatchKeywordGenerator()
+    try:
+        generator = BatchKeywordGenerator()
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
     results = generator.batch_generate(model_numbers, custom_prompt)
     
     # Write results to output file
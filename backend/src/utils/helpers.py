@@ -28,4 +28,62 @@ def validate_product_info(product_info):
     if len(product_info.strip()) < 2:
         return False
         
-    return True 
\ No newline at end of file
+    return True 
+# 画像形式ごとのファイル先頭シグネチャ
+_IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+    (b'BM', 'bmp'),
+)
+
+def sniff_image_type(data):
+    """
+    バイト列の先頭から画像形式を判定（画像でなければNone）
+    """
+    if not data:
+        return None
+        
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'webp'
+        
+    for signature, image_type in _IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return image_type
+            
+    return None
+
+def is_jan_code(value):
+    """
+    JANコード（8桁または13桁の半角数字）かどうかを判定
+    """
+    text = str(value)
+    return len(text) in (8, 13) and text.isascii() and text.isdigit()
+
+def is_asin(value):
+    """
+    ASIN（10桁の半角英数字、大文字小文字は問わない）かどうかを判定
+    """
+    text = str(value)
+    return len(text) == 10 and text.isascii() and text.isalnum()
+
+def keyword_product_info(model_number, product):
+    """
+    キーワード生成用の商品情報（型番・タイトル・特徴・説明）を取り出す
+
+    product は ProductDetail または商品辞書
+    """
+    if isinstance(product, dict):
+        return {
+            "model_number": model_number,
+            "title": product.get('title', ''),
+            "features": product.get('features', []),
+            "description": product.get('description', '')
+        }
+    return {
+        "model_number": model_number,
+        "title": product.title,
+        "features": getattr(product, 'features', []),
+        "description": getattr(product, 'description', '')
+    }
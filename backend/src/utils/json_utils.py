@@ -0,0 +1,30 @@
+import decimal
+
+import orjson
+
+JSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+def _default(obj):
+    """
+    orjson が直接扱えない型の変換
+    """
+    if hasattr(obj, 'to_dict'):
+        return obj.to_dict()
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps(obj, indent=False):
+    """
+    オブジェクトをJSONのバイト列に変換（indent=True で2スペースのインデント付き）
+    """
+    option = JSON_OPTIONS | orjson.OPT_INDENT_2 if indent else JSON_OPTIONS
+    return orjson.dumps(obj, default=_default, option=option)
+
+def loads(data):
+    """
+    JSON（bytes/str）をPythonオブジェクトに変換
+    """
+    return orjson.loads(data)